@@ -1,121 +1,143 @@
+import ast
+import json
 import logging
 import os
 import platform
 import subprocess
-from abc import abstractmethod
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
 
+import numpy as np
 import onnx
-import open_clip
 import torch
+from huggingface_hub import snapshot_download
 from onnx2torch import convert
 from onnxruntime.tools.onnx_model_utils import fix_output_shapes, make_input_shape_fixed
 from tinynn.converter import TFLiteConverter
 
+CONSTANTS_PATH = Path(__file__).parents[2] / "immich_ml" / "models" / "constants.py"
+RECOGNITION_BATCH_SIZES = (1, 4, 8)
+INPUT_NAMES = ("input_tensor", "attention_mask")
+TORCH_INT_TYPES = {np.dtype(np.int32): torch.int32, np.dtype(np.int64): torch.int64}
 
-class ExportBase(torch.nn.Module):
-    input_shape: tuple[int, ...]
 
-    def __init__(self, device: torch.device, name: str):
+def load_model_names() -> dict[str, set[str]]:
+    # parsed instead of imported so this environment doesn't need the service's dependencies
+    names: dict[str, set[str]] = {}
+    for node in ast.parse(CONSTANTS_PATH.read_text()).body:
+        if isinstance(node, ast.Assign) and isinstance(target := node.targets[0], ast.Name):
+            if target.id in ("_OPENCLIP_MODELS", "_MCLIP_MODELS", "_INSIGHTFACE_MODELS"):
+                names[target.id] = ast.literal_eval(node.value)
+    return names
+
+
+class ExportBase(torch.nn.Module):
+    def __init__(
+        self,
+        onnx_model_path: Path,
+        input_shapes: tuple[tuple[int, ...], ...],
+        device: torch.device,
+        name: str,
+        optimize: int = 5,
+    ):
         super().__init__()
         self.device = device
         self.name = name
-        self.optimize = 5
+        self.optimize = optimize
         self.nchw_transpose = False
+        self.input_shapes = input_shapes
+
+        self.onnx_model = onnx.load_model(onnx_model_path)
+        graph_inputs = self.onnx_model.graph.input
+        if len(graph_inputs) != len(input_shapes):
+            raise ValueError(f"{onnx_model_path} has {len(graph_inputs)} inputs, expected {len(input_shapes)}")
+        for graph_input, shape in zip(graph_inputs, input_shapes):
+            make_input_shape_fixed(self.onnx_model.graph, graph_input.name, shape)
+        fix_output_shapes(self.onnx_model)
+        self.input_dtypes = [
+            onnx.helper.tensor_dtype_to_np_dtype(graph_input.type.tensor_type.elem_type) for graph_input in graph_inputs
+        ]
 
-    @abstractmethod
-    def forward(self, input_tensor: torch.Tensor) -> torch.Tensor | tuple[torch.Tensor]:
-        pass
-
-    def dummy_input(self) -> torch.FloatTensor:
-        return torch.rand((1, 3, 224, 224), device=self.device)
-
-
-class ArcFace(ExportBase):
-    input_shape = (1, 3, 112, 112)
-
-    def __init__(self, onnx_model_path: str, device: torch.device):
-        name, _ = os.path.splitext(os.path.basename(onnx_model_path))
-        super().__init__(device, name)
-        onnx_model = onnx.load_model(onnx_model_path)
-        make_input_shape_fixed(onnx_model.graph, onnx_model.graph.input[0].name, self.input_shape)
-        fix_output_shapes(onnx_model)
-        self.model = convert(onnx_model).to(device)
+        self.model = convert(self.onnx_model).eval().to(device)
         if self.device.type == "cuda":
             self.model = self.model.half()
 
-    def forward(self, input_tensor: torch.Tensor) -> torch.FloatTensor:
-        embedding: torch.FloatTensor = self.model(
-            input_tensor.half() if self.device.type == "cuda" else input_tensor
-        ).float()
-        assert isinstance(embedding, torch.FloatTensor)
-        return embedding
-
-    def dummy_input(self) -> torch.FloatTensor:
-        return torch.rand(self.input_shape, device=self.device)
-
-
-class RetinaFace(ExportBase):
-    input_shape = (1, 3, 640, 640)
-
-    def __init__(self, onnx_model_path: str, device: torch.device):
-        name, _ = os.path.splitext(os.path.basename(onnx_model_path))
-        super().__init__(device, name)
-        self.optimize = 3
-        self.model = convert(onnx_model_path).eval().to(device)
+    def forward(
+        self, input_tensor: torch.Tensor, attention_mask: torch.Tensor | None = None
+    ) -> torch.Tensor | tuple[torch.Tensor, ...]:
+        inputs = [input_tensor] if attention_mask is None else [input_tensor, attention_mask]
         if self.device.type == "cuda":
-            self.model = self.model.half()
-
-    def forward(self, input_tensor: torch.Tensor) -> tuple[torch.FloatTensor]:
-        out: torch.Tensor = self.model(input_tensor.half() if self.device.type == "cuda" else input_tensor)
-        return tuple(o.float() for o in out)
-
-    def dummy_input(self) -> torch.FloatTensor:
-        return torch.rand(self.input_shape, device=self.device)
-
-
-class ClipVision(ExportBase):
-    input_shape = (1, 3, 224, 224)
-
-    def __init__(self, model_name: str, weights: str, device: torch.device):
-        super().__init__(device, model_name + "__" + weights)
-        self.model = open_clip.create_model(
-            model_name,
-            weights,
-            precision="fp16" if device.type == "cuda" else "fp32",
-            jit=False,
-            require_pretrained=True,
-            device=device,
-        )
-
-    def forward(self, input_tensor: torch.Tensor) -> torch.FloatTensor:
-        embedding: torch.Tensor = self.model.encode_image(
-            input_tensor.half() if self.device.type == "cuda" else input_tensor,
-            normalize=True,
-        ).float()
-        return embedding
-
-
-def export(model: ExportBase) -> None:
+            inputs = [t.half() if t.is_floating_point() else t for t in inputs]
+        out = self.model(*inputs)
+        if isinstance(out, (tuple, list)):
+            return tuple(o.float() for o in out)
+        return out.float()
+
+    def dummy_input(self) -> tuple[torch.Tensor, ...]:
+        inputs: list[torch.Tensor] = []
+        for i, (shape, dtype) in enumerate(zip(self.input_shapes, self.input_dtypes)):
+            if np.issubdtype(dtype, np.floating):
+                inputs.append(torch.rand(shape, device=self.device))
+            elif i == 0:  # token ids
+                inputs.append(torch.randint(0, 1000, shape, dtype=TORCH_INT_TYPES[dtype], device=self.device))
+            else:  # attention mask
+                inputs.append(torch.ones(shape, dtype=TORCH_INT_TYPES[dtype], device=self.device))
+        return tuple(inputs)
+
+
+def get_exports(
+    model_name: str, model_types: list[str], model_dir: Path, device: torch.device, args: Namespace
+) -> list[ExportBase]:
+    names = load_model_names()
+    exports: list[ExportBase] = []
+
+    def add(model_type: str, input_shapes: tuple[tuple[int, ...], ...], suffix: str = "", optimize: int = 5) -> None:
+        onnx_path = model_dir / model_type / "model.onnx"
+        exports.append(ExportBase(onnx_path, input_shapes, device, f"{model_type}/model{suffix}", optimize))
+
+    if model_name in names["_OPENCLIP_MODELS"] or model_name in names["_MCLIP_MODELS"]:
+        if "visual" in model_types:
+            size = json.loads((model_dir / "visual" / "preprocess_cfg.json").read_text())["size"]
+            size = size[0] if isinstance(size, list) else size
+            add("visual", ((1, 3, size, size),))
+        if "textual" in model_types:
+            text_cfg = json.loads((model_dir / "config.json").read_text())["text_cfg"]
+            context_length = text_cfg.get("context_length", 77)
+            num_inputs = 2 if model_name in names["_MCLIP_MODELS"] else 1
+            add("textual", ((1, context_length),) * num_inputs)
+    elif model_name in names["_INSIGHTFACE_MODELS"]:
+        if "detection" in model_types:
+            add("detection", ((1, 3, 640, 640),), optimize=3)
+        if "recognition" in model_types:
+            for batch_size in args.batch_sizes:
+                add("recognition", ((batch_size, 3, 112, 112),), "" if batch_size == 1 else f".b{batch_size}")
+    else:
+        raise ValueError(f"Unknown model '{model_name}'")
+    return exports
+
+
+def export(model: ExportBase, output_dir: Path) -> None:
     model.eval()
     for param in model.parameters():
         param.requires_grad = False
     dummy_input = model.dummy_input()
-    model(dummy_input)
+    model(*dummy_input)
     jit = torch.jit.trace(model, dummy_input)  # type: ignore[no-untyped-call,attr-defined]
-    tflite_model_path = f"output/{model.name}.tflite"
-    os.makedirs("output", exist_ok=True)
+
+    tflite_model_path = output_dir / f"{model.name}.tflite"
+    tflite_model_path.parent.mkdir(parents=True, exist_ok=True)
 
     converter = TFLiteConverter(
         jit,
         dummy_input,
-        tflite_model_path,
+        tflite_model_path.as_posix(),
         optimize=model.optimize,
         nchw_transpose=model.nchw_transpose,
     )
     # segfaults on ARM, must run on x86_64 / AMD64
     converter.convert()
 
-    armnn_model_path = f"output/{model.name}.armnn"
+    armnn_model_path = output_dir / f"{model.name}.armnn"
     os.environ["LD_LIBRARY_PATH"] = "armnn"
     subprocess.run(
         [
@@ -123,33 +145,65 @@ def export(model: ExportBase) -> None:
             "-f",
             "tflite-binary",
             "-m",
-            tflite_model_path,
+            tflite_model_path.as_posix(),
             "-i",
-            "input_tensor",
+            ",".join(INPUT_NAMES[: len(dummy_input)]),
             "-o",
             "output_tensor",
             "-p",
-            armnn_model_path,
-        ]
+            armnn_model_path.as_posix(),
+        ],
+        check=True,
     )
 
 
+def parse_args() -> Namespace:
+    parser = ArgumentParser(
+        description="Export Immich ML models to ARM NN. Check the exported models on the device with verify.py."
+    )
+    parser.add_argument("models", nargs="+", help="model names as listed in immich_ml/models/constants.py")
+    parser.add_argument(
+        "--model-types",
+        nargs="+",
+        default=["visual", "textual", "detection", "recognition"],
+        help="model types to export, where supported by the model",
+    )
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        help=(
+            "directory with a model's ONNX files laid out like the ML cache (e.g. `<type>/model.onnx`), "
+            "instead of downloading them from Hugging Face"
+        ),
+    )
+    parser.add_argument("--output-dir", type=Path, default=Path("output"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(RECOGNITION_BATCH_SIZES))
+    return parser.parse_args()
+
+
 def main() -> None:
     if platform.machine() not in ("x86_64", "AMD64"):
         raise RuntimeError(f"Can only run on x86_64 / AMD64, not {platform.machine()}")
 
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.model_dir is not None and len(args.models) > 1:
+        raise ValueError("--model-dir can only be used when exporting a single model")
+
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     if device.type != "cuda":
         logging.warning(
             "No CUDA available, cannot create fp16 model! proceeding to create a fp32 model (use only for testing)"
         )
-    models = [
-        ClipVision("ViT-B-32", "openai", device),
-        ArcFace("buffalo_l_rec.onnx", device),
-        RetinaFace("buffalo_l_det.onnx", device),
-    ]
-    for model in models:
-        export(model)
+    for model_name in args.models:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = Path(snapshot_download(f"immich-app/{model_name}", ignore_patterns=["*.armnn", "*.rknn"]))
+
+        # matches the layout of the model repositories, e.g. `<output-dir>/<model name>/recognition/model.b4.armnn`
+        output_dir = args.output_dir / model_name
+        for model in get_exports(model_name, args.model_types, model_dir, device, args):
+            export(model, output_dir)
 
 
 if __name__ == "__main__":
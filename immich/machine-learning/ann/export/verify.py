@@ -0,0 +1,109 @@
+"""
+Checks ARM NN models exported by run.py against ONNX Runtime, by running both on the same random inputs.
+
+The exported models only run where ARM NN does, so this runs on the device in the machine learning environment,
+e.g. `python ann/export/verify.py output/ViT-B-32__openai <ONNX model dir>` in the machine learning container.
+"""
+
+import logging
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+import numpy as np
+import onnxruntime as ort
+from numpy.typing import NDArray
+
+from immich_ml.sessions.ann import AnnSession
+from immich_ml.sessions.ann.loader import is_available
+
+ORT_INT_TYPES = {"tensor(int32)": np.int32, "tensor(int64)": np.int64}
+
+
+def random_inputs(
+    ann_session: AnnSession, ort_session: ort.InferenceSession
+) -> tuple[dict[str, NDArray[Any]], dict[str, NDArray[Any]]]:
+    """Returns the same inputs for ARM NN, which takes int32 tokens like the service sends, and ONNX Runtime."""
+    ann_inputs: dict[str, NDArray[Any]] = {}
+    ort_inputs: dict[str, NDArray[Any]] = {}
+    for i, (ann_input, ort_input) in enumerate(zip(ann_session.get_inputs(), ort_session.get_inputs())):
+        if ort_input.type in ORT_INT_TYPES:
+            # token ids, then an attention mask
+            tokens = np.random.randint(0, 1000, ann_input.shape) if i == 0 else np.ones(ann_input.shape)
+            ann_inputs[ort_input.name] = tokens.astype(np.int32)
+            ort_inputs[ort_input.name] = tokens.astype(ORT_INT_TYPES[ort_input.type])
+        else:
+            ann_inputs[ort_input.name] = ort_inputs[ort_input.name] = np.random.rand(*ann_input.shape).astype(
+                np.float32
+            )
+    return ann_inputs, ort_inputs
+
+
+def verify(armnn_path: Path, onnx_path: Path, samples: int, min_similarity: float, cache_dir: Path) -> None:
+    """Fails if any output of the ARM NN model diverges from ONNX Runtime's."""
+    network_cache = armnn_path.with_suffix(".anncache")
+    keep_network_cache = network_cache.exists()
+    try:
+        _verify(armnn_path, onnx_path, samples, min_similarity, cache_dir)
+    finally:
+        # loading writes the optimized network next to the model, which shouldn't end up in the export
+        if not keep_network_cache:
+            network_cache.unlink(missing_ok=True)
+
+
+def _verify(armnn_path: Path, onnx_path: Path, samples: int, min_similarity: float, cache_dir: Path) -> None:
+    ann_session = AnnSession(armnn_path, cache_dir=cache_dir)
+    ort_session = ort.InferenceSession(onnx_path.as_posix(), providers=["CPUExecutionProvider"])
+    if len(ann_session.get_inputs()) != len(ort_session.get_inputs()):
+        raise RuntimeError(f"{armnn_path} and {onnx_path} have a different number of inputs")
+
+    for _ in range(samples):
+        ann_inputs, ort_inputs = random_inputs(ann_session, ort_session)
+        expected = ort_session.run(None, ort_inputs)
+        actual = ann_session.run(None, ann_inputs)
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            e, a = e.astype(np.float32).ravel(), a.astype(np.float32).ravel()
+            similarity = float(np.dot(e, a) / max(np.linalg.norm(e) * np.linalg.norm(a), 1e-12))
+            max_diff = float(np.abs(e - a).max())
+            logging.info(f"{armnn_path} output {i}: cosine similarity {similarity:.6f}, max abs diff {max_diff:.6f}")
+            if similarity < min_similarity:
+                raise RuntimeError(
+                    f"{armnn_path} output {i} diverges from ONNX: similarity {similarity:.6f} < {min_similarity}"
+                )
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Check exported ARM NN models against ONNX Runtime.")
+    parser.add_argument("armnn_dir", type=Path, help="output of run.py for a model, e.g. `output/ViT-B-32__openai`")
+    parser.add_argument("onnx_dir", type=Path, help="the model's ONNX files laid out like the ML cache")
+    parser.add_argument("--samples", type=int, default=3, help="random inputs to compare per model")
+    parser.add_argument("--min-similarity", type=float, default=0.99)
+    return parser.parse_args()
+
+
+def main() -> None:
+    if not is_available:
+        raise RuntimeError("ARM NN is not available, run this on the device the models were exported for")
+
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    armnn_paths = sorted(args.armnn_dir.rglob("*.armnn"))
+    if not armnn_paths:
+        raise FileNotFoundError(f"No ARM NN models found in {args.armnn_dir}")
+
+    # keeps the GPU tuning file out of the export
+    with TemporaryDirectory() as cache_dir:
+        for armnn_path in armnn_paths:
+            model_type = armnn_path.relative_to(args.armnn_dir).parts[0]
+            verify(
+                armnn_path,
+                args.onnx_dir / model_type / "model.onnx",
+                args.samples,
+                args.min_similarity,
+                Path(cache_dir),
+            )
+
+
+if __name__ == "__main__":
+    main()
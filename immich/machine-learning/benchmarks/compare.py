@@ -0,0 +1,149 @@
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+
+Stats = dict[str, float]
+
+
+def run_benchmarks(pytest_args: list[str]) -> dict[str, Stats]:
+    """Runs the benchmarks once, returning the median and p95 in seconds of each scenario."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "results.json"
+        command = [sys.executable, "-m", "pytest", BENCHMARK_DIR.as_posix(), "-q", "-p", "no:cacheprovider"]
+        command += ["--benchmark-save-data", f"--benchmark-json={output}", *pytest_args]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        results = json.loads(output.read_text())
+
+    scenarios = {}
+    for benchmark in results["benchmarks"]:
+        timings = np.array(benchmark["stats"]["data"])
+        scenarios[benchmark["fullname"]] = {
+            "median": float(np.median(timings)),
+            "p95": float(np.percentile(timings, 95)),
+        }
+    return scenarios
+
+
+def measure(repeat: int, pytest_args: list[str]) -> dict[str, Stats]:
+    """
+    Runs the benchmarks `repeat` times, keeping the fastest median and p95 seen for each scenario.
+
+    Noise from other processes only ever makes a run slower, so the fastest of several runs is the most stable
+    estimate, and a scenario only counts as regressed if it's slower in every run.
+    """
+    best: dict[str, Stats] = {}
+    for i in range(repeat):
+        logging.info(f"Running benchmarks ({i + 1}/{repeat})")
+        for name, stats in run_benchmarks(pytest_args).items():
+            if name in best:
+                best[name] = {metric: min(value, best[name][metric]) for metric, value in stats.items()}
+            else:
+                best[name] = stats
+    return best
+
+
+def machine_info() -> dict[str, Any]:
+    return {"machine": platform.machine(), "processor": platform.processor(), "python": platform.python_version()}
+
+
+def compare(
+    baseline: dict[str, Stats], current: dict[str, Stats], thresholds: dict[str, float]
+) -> tuple[list[str], bool]:
+    """Builds a markdown table comparing each scenario against the baseline, and whether any of them regressed."""
+    header = ["Scenario"]
+    for metric in thresholds:
+        header += [f"Baseline {metric}", f"Current {metric}", "Change"]
+    header.append("Status")
+    lines = [f"| {' | '.join(header)} |", f"|{'---|' * len(header)}"]
+
+    regressed = False
+    for name in sorted(baseline.keys() | current.keys()):
+        if name not in current:
+            lines.append(f"| `{name}` |{' - |' * (len(header) - 2)} missing |")
+            continue
+        if name not in baseline:
+            row = [f"`{name}`"]
+            for metric in thresholds:
+                row += ["-", format_time(current[name][metric]), "-"]
+            lines.append(f"| {' | '.join(row)} | new |")
+            continue
+
+        row = [f"`{name}`"]
+        status = "ok"
+        for metric, threshold in thresholds.items():
+            before, after = baseline[name][metric], current[name][metric]
+            change = after / before - 1
+            row += [format_time(before), format_time(after), f"{change:+.1%}"]
+            if change > threshold:
+                status = f"regressed ({metric})" if status == "ok" else "regressed"
+        regressed |= status != "ok"
+        lines.append(f"| {' | '.join(row)} | {status} |")
+    return lines, regressed
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def parse_args() -> tuple[Namespace, list[str]]:
+    parser = ArgumentParser(
+        description="Compare benchmark results against a stored baseline. Unknown arguments are passed to pytest."
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--update", action="store_true", help="write the current results to the baseline instead")
+    parser.add_argument("--repeat", type=int, default=3, help="times to run the benchmarks, keeping the fastest")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative increase of the median")
+    parser.add_argument("--p95-threshold", type=float, default=0.2, help="allowed relative increase of the p95")
+    parser.add_argument("--output", type=Path, help="also write the markdown table to this file")
+    return parser.parse_known_args()
+
+
+def main() -> None:
+    args, pytest_args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.repeat < 1:
+        raise ValueError("--repeat must be at least 1")
+    if not args.update and not args.baseline.is_file():
+        raise FileNotFoundError(f"Baseline not found: {args.baseline}, create one with --update")
+
+    current = measure(args.repeat, pytest_args)
+    if args.update:
+        args.baseline.write_text(json.dumps({"machine": machine_info(), "scenarios": current}, indent=2) + "\n")
+        logging.info(f"Saved baseline for {len(current)} scenarios to {args.baseline}")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["machine"] != machine_info():
+        logging.warning(f"Baseline was recorded on a different machine ({baseline['machine']}), timings may differ")
+    scenarios = baseline["scenarios"]
+    if pytest_args:
+        # only compare the scenarios that were selected
+        scenarios = {name: stats for name, stats in scenarios.items() if name in current}
+
+    lines, regressed = compare(scenarios, current, {"median": args.threshold, "p95": args.p95_threshold})
+    table = "\n".join(lines) + "\n"
+    print(table)
+    if args.output is not None:
+        args.output.write_text(table)
+    if regressed:
+        logging.error("Performance regressed beyond the allowed threshold")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
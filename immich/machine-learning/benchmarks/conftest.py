@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+
+from immich_ml.models.clip.textual import OpenClipTextualEncoder
+from immich_ml.models.clip.visual import OpenClipVisualEncoder
+from immich_ml.models.facial_recognition.recognition import FaceRecognizer
+
+from .inputs import WORDS, make_jpeg
+from .stand_ins import EMBED_DIM, save_image_model, save_text_model
+
+CLIP_CONFIG = {"embed_dim": EMBED_DIM, "text_cfg": {"context_length": 77}}
+
+
+@pytest.fixture(scope="session")
+def model_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return tmp_path_factory.mktemp("models")
+
+
+@pytest.fixture(scope="session")
+def clip_visual(model_dir: Path) -> OpenClipVisualEncoder:
+    cache_dir = model_dir / "clip" / "ViT-B-32__openai"
+    save_image_model(cache_dir / "visual" / "model.onnx", 224, "image")
+    (cache_dir / "config.json").write_text(json.dumps(CLIP_CONFIG))
+    preprocess_cfg = {
+        "size": [224, 224],
+        "mean": [0.48145466, 0.4578275, 0.40821073],
+        "std": [0.26862954, 0.26130258, 0.27577711],
+        "interpolation": "bicubic",
+    }
+    (cache_dir / "visual" / "preprocess_cfg.json").write_text(json.dumps(preprocess_cfg))
+    model = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir=cache_dir)
+    model.load()
+    return model
+
+
+@pytest.fixture(scope="session")
+def clip_textual(model_dir: Path) -> OpenClipTextualEncoder:
+    cache_dir = model_dir / "clip" / "ViT-B-32__openai"
+    vocab = {"<pad>": 0, "<unk>": 1, **{word: i + 2 for i, word in enumerate(WORDS)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    (cache_dir / "textual").mkdir(parents=True, exist_ok=True)
+    tokenizer.save((cache_dir / "textual" / "tokenizer.json").as_posix())
+    (cache_dir / "textual" / "tokenizer_config.json").write_text(json.dumps({"pad_token": "<pad>"}))
+    (cache_dir / "config.json").write_text(json.dumps(CLIP_CONFIG))
+    save_text_model(cache_dir / "textual" / "model.onnx", len(vocab), 77)
+    model = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir=cache_dir)
+    model.load()
+    return model
+
+
+@pytest.fixture(scope="session")
+def face_recognizer(model_dir: Path) -> FaceRecognizer:
+    cache_dir = model_dir / "facial-recognition" / "buffalo_l"
+    save_image_model(cache_dir / "recognition" / "model.onnx", 112, "input.1")
+    model = FaceRecognizer("buffalo_l", cache_dir=cache_dir)
+    model.load()
+    return model
+
+
+@pytest.fixture(scope="session")
+def jpeg_factory() -> Callable[[int, int], bytes]:
+    cache: dict[tuple[int, int], bytes] = {}
+
+    def get(width: int, height: int) -> bytes:
+        if (width, height) not in cache:
+            cache[(width, height)] = make_jpeg(width, height)
+        return cache[(width, height)]
+
+    return get
@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+
+from immich_ml.schemas import FaceDetectionOutput
+
+# roughly what Immich sends: a preview, a full HD export and a full-size phone photo
+RESOLUTIONS = [(1440, 1080), (1920, 1080), (4032, 3024)]
+FACE_COUNTS = [1, 8, 32]
+TEXT_BOX_COUNTS = [10, 100, 500]
+
+WORDS = "a an the photo picture of with on in at dog cat person people beach mountain city night snow car".split()
+
+
+def make_image(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Smooth gradients with noise, which compress and decode more like a photo than a flat color does."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels += rng.standard_normal(pixels.shape, dtype=np.float32) * 12
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8))
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    make_image(width, height).save(buffer, format="jpeg", quality=90)
+    return buffer.getvalue()
+
+
+def make_faces(count: int, width: int, height: int, seed: int = 0) -> FaceDetectionOutput:
+    rng = np.random.default_rng(seed)
+    size = rng.uniform(60, 240, count).astype(np.float32)
+    x1 = rng.uniform(0, width - 240, count).astype(np.float32)
+    y1 = rng.uniform(0, height - 240, count).astype(np.float32)
+    # eyes, nose and mouth corners relative to the box, as the detector reports them
+    relative = np.array([[0.3, 0.35], [0.7, 0.35], [0.5, 0.55], [0.35, 0.75], [0.65, 0.75]], dtype=np.float32)
+    landmarks = np.stack([x1, y1], axis=-1)[:, None] + relative[None] * size[:, None, None]
+    return {
+        "boxes": np.stack([x1, y1, x1 + size, y1 + size], axis=-1),
+        "scores": rng.uniform(0.7, 1, count).astype(np.float32),
+        "landmarks": landmarks,
+    }
+
+
+def make_text_boxes(count: int, width: int, height: int, seed: int = 0) -> NDArray[np.float32]:
+    """Slightly rotated word boxes, clockwise from the top left as the text detector returns them."""
+    rng = np.random.default_rng(seed)
+    w = rng.uniform(40, 300, count)
+    h = rng.uniform(16, 48, count)
+    cx = rng.uniform(150, width - 150, count)
+    cy = rng.uniform(30, height - 30, count)
+    angle = rng.normal(0, 0.05, count)
+    corners = np.array([[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5]])
+    offsets = corners[None] * np.stack([w, h], axis=-1)[:, None]
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    rotated = np.stack(
+        [offsets[..., 0] * cos - offsets[..., 1] * sin, offsets[..., 0] * sin + offsets[..., 1] * cos], axis=-1
+    )
+    return (rotated + np.stack([cx, cy], axis=-1)[:, None]).astype(np.float32)
+
+
+def make_query(seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    return " ".join(rng.choice(WORDS, 8))
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+EMBED_DIM = 512
+
+
+def save_model(
+    nodes: list[onnx.NodeProto],
+    inputs: list[onnx.ValueInfoProto],
+    initializers: list[onnx.TensorProto],
+    path: Path,
+    features: int,
+) -> None:
+    """Saves a graph producing `features`-d features, followed by a random projection to `EMBED_DIM` outputs."""
+    projection = np.random.default_rng(0).standard_normal((features, EMBED_DIM)).astype(np.float32)
+    graph = helper.make_graph(
+        [*nodes, helper.make_node("MatMul", ["features", "W"], ["embedding"])],
+        "stand-in",
+        inputs,
+        [helper.make_tensor_value_info("embedding", TensorProto.FLOAT, ["batch", EMBED_DIM])],
+        [*initializers, numpy_helper.from_array(projection, "W")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    path.parent.mkdir(parents=True, exist_ok=True)
+    onnx.save(model, path)
+
+
+def save_image_model(path: Path, size: int, input_name: str) -> None:
+    # a patchifying convolution keeps the cost proportional to the input size, like a real vision encoder
+    kernel = np.random.default_rng(0).standard_normal((64, 3, 16, 16)).astype(np.float32)
+    nodes = [
+        helper.make_node("Conv", [input_name, "K"], ["patches"], strides=[16, 16]),
+        helper.make_node("GlobalAveragePool", ["patches"], ["pooled"]),
+        helper.make_node("Flatten", ["pooled"], ["features"]),
+    ]
+    inputs = [helper.make_tensor_value_info(input_name, TensorProto.FLOAT, ["batch", 3, size, size])]
+    save_model(nodes, inputs, [numpy_helper.from_array(kernel, "K")], path, 64)
+
+
+def save_text_model(path: Path, vocab_size: int, context_length: int) -> None:
+    embeddings = np.random.default_rng(0).standard_normal((vocab_size, 64)).astype(np.float32)
+    nodes = [
+        helper.make_node("Gather", ["E", "text"], ["tokens"]),
+        helper.make_node("ReduceMean", ["tokens"], ["features"], axes=[1], keepdims=0),
+    ]
+    inputs = [helper.make_tensor_value_info("text", TensorProto.INT32, ["batch", context_length])]
+    save_model(nodes, inputs, [numpy_helper.from_array(embeddings, "E")], path, 64)
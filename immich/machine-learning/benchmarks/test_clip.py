@@ -0,0 +1,36 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from immich_ml.models.clip.textual import OpenClipTextualEncoder
+from immich_ml.models.clip.visual import OpenClipVisualEncoder
+
+from .inputs import RESOLUTIONS, make_image, make_query
+
+
+@pytest.mark.parametrize("width,height", RESOLUTIONS)
+def test_visual_transform(
+    benchmark: BenchmarkFixture, clip_visual: OpenClipVisualEncoder, width: int, height: int
+) -> None:
+    image = make_image(width, height)
+
+    inputs = benchmark(clip_visual.transform, image)
+
+    assert inputs["image"].shape == (1, 3, 224, 224)
+
+
+def test_visual_predict(benchmark: BenchmarkFixture, clip_visual: OpenClipVisualEncoder) -> None:
+    image = make_image(1440, 1080)
+
+    benchmark(clip_visual.predict, image)
+
+
+def test_tokenize(benchmark: BenchmarkFixture, clip_textual: OpenClipTextualEncoder) -> None:
+    query = make_query()
+
+    tokens = benchmark(clip_textual.tokenize, query)
+
+    assert tokens["text"].shape == (1, 77)
+
+
+def test_textual_predict(benchmark: BenchmarkFixture, clip_textual: OpenClipTextualEncoder) -> None:
+    benchmark(clip_textual.predict, make_query())
@@ -0,0 +1,27 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from immich_ml.models.facial_recognition.recognition import FaceRecognizer
+from immich_ml.models.transforms import pil_to_cv2
+
+from .inputs import FACE_COUNTS, make_faces, make_image
+
+
+@pytest.mark.parametrize("count", FACE_COUNTS)
+def test_crop(benchmark: BenchmarkFixture, face_recognizer: FaceRecognizer, count: int) -> None:
+    image = pil_to_cv2(make_image(1440, 1080))
+    faces = make_faces(count, 1440, 1080)
+
+    crops = benchmark(face_recognizer._crop, image, faces)
+
+    assert len(crops) == count
+
+
+@pytest.mark.parametrize("count", FACE_COUNTS)
+def test_predict(benchmark: BenchmarkFixture, face_recognizer: FaceRecognizer, count: int) -> None:
+    image = pil_to_cv2(make_image(1440, 1080))
+    faces = make_faces(count, 1440, 1080)
+
+    output = benchmark(face_recognizer.predict, image, faces)
+
+    assert len(output) == count
@@ -0,0 +1,45 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from immich_ml.models.ocr.detection import TextDetector
+from immich_ml.models.ocr.recognition import TextRecognizer
+
+from .inputs import RESOLUTIONS, TEXT_BOX_COUNTS, make_image, make_text_boxes
+
+
+@pytest.fixture(scope="module")
+def text_detector() -> TextDetector:
+    return TextDetector("PP-OCRv5_mobile")
+
+
+@pytest.fixture(scope="module")
+def text_recognizer() -> TextRecognizer:
+    return TextRecognizer("PP-OCRv5_mobile")
+
+
+@pytest.mark.parametrize("width,height", RESOLUTIONS)
+def test_detection_transform(benchmark: BenchmarkFixture, text_detector: TextDetector, width: int, height: int) -> None:
+    image = make_image(width, height)
+
+    inputs = benchmark(text_detector._transform, image)
+
+    assert inputs.shape[:2] == (1, 3)
+
+
+@pytest.mark.parametrize("count", TEXT_BOX_COUNTS)
+def test_sorted_boxes(benchmark: BenchmarkFixture, text_detector: TextDetector, count: int) -> None:
+    boxes = make_text_boxes(count, 1440, 1080)
+
+    sorted_boxes = benchmark(text_detector.sorted_boxes, boxes)
+
+    assert sorted_boxes.shape == boxes.shape
+
+
+@pytest.mark.parametrize("count", TEXT_BOX_COUNTS)
+def test_get_crop_img_list(benchmark: BenchmarkFixture, text_recognizer: TextRecognizer, count: int) -> None:
+    image = make_image(1440, 1080)
+    boxes = make_text_boxes(count, 1440, 1080)
+
+    crops = benchmark(text_recognizer.get_crop_img_list, image, boxes)
+
+    assert len(crops) == count
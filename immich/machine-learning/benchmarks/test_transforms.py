@@ -0,0 +1,39 @@
+from typing import Callable
+
+import numpy as np
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from immich_ml.models.transforms import decode_cv2, decode_pil, serialize_np_array
+
+from .inputs import RESOLUTIONS
+from .stand_ins import EMBED_DIM
+
+
+@pytest.mark.parametrize("width,height", RESOLUTIONS)
+def test_decode_pil(
+    benchmark: BenchmarkFixture, jpeg_factory: Callable[[int, int], bytes], width: int, height: int
+) -> None:
+    image_bytes = jpeg_factory(width, height)
+
+    image = benchmark(decode_pil, image_bytes)
+
+    assert image.size == (width, height)
+
+
+@pytest.mark.parametrize("width,height", RESOLUTIONS)
+def test_decode_cv2(
+    benchmark: BenchmarkFixture, jpeg_factory: Callable[[int, int], bytes], width: int, height: int
+) -> None:
+    image_bytes = jpeg_factory(width, height)
+
+    image = benchmark(decode_cv2, image_bytes)
+
+    assert image.shape == (height, width, 3)
+
+
+@pytest.mark.parametrize("count", [1, 32])
+def test_serialize_np_array(benchmark: BenchmarkFixture, count: int) -> None:
+    embeddings = np.random.default_rng(0).standard_normal((count, EMBED_DIM)).astype(np.float32)
+
+    benchmark(lambda: [serialize_np_array(embedding) for embedding in embeddings])
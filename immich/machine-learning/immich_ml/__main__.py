@@ -25,6 +25,10 @@ bind_host = non_prefixed_settings.immich_host
 if is_ipv6(bind_host):
     bind_host = f"[{bind_host}]"
 bind_address = f"{bind_host}:{non_prefixed_settings.immich_port}"
+bind_args = ["-b", bind_address]
+if settings.unix_socket is not None:
+    # local clients can skip TCP entirely, while the TCP listener stays up for health checks
+    bind_args += ["-b", f"unix:{settings.unix_socket}"]
 
 try:
     with subprocess.Popen(
@@ -37,8 +41,7 @@ try:
             "immich_ml.config.CustomUvicornWorker",
             "-c",
             module_dir / "gunicorn_conf.py",
-            "-b",
-            bind_address,
+            *bind_args,
             "-w",
             str(settings.workers),
             "-t",
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
+
+class AdmissionController:
+    """
+    Bounds how many requests hold a decoded image at once, with a bounded wait queue for each task.
+
+    Requests that would overflow their task's queue are rejected immediately with a 503 so the caller can retry
+    later, instead of piling up in memory while waiting for a slot.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int = 0, retry_after_s: int = 1) -> None:
+        """
+        Args:
+            max_in_flight: Maximum number of admitted requests.
+            max_queued: Maximum number of requests waiting per task. Unbounded if <= 0. Defaults to 0.
+            retry_after_s: Value of the `Retry-After` header when rejecting a request. Defaults to 1.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.retry_after_s = retry_after_s
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.queued: dict[str, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def admit(self, task: str) -> AsyncIterator[float]:
+        """Waits for a free slot, yielding the time spent queued in seconds."""
+        if self.semaphore.locked() and 0 < self.max_queued <= self.queued[task]:
+            raise HTTPException(
+                503,
+                f"Too many queued '{task}' requests",
+                headers={"Retry-After": str(self.retry_after_s)},
+            )
+
+        start = time.perf_counter()
+        self.queued[task] += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queued[task] -= 1
+
+        try:
+            yield time.perf_counter() - start
+        finally:
+            self.semaphore.release()
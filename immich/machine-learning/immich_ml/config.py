@@ -1,6 +1,7 @@
 import concurrent.futures
 import logging
 import os
+import re
 import sys
 from pathlib import Path
 from socket import socket
@@ -53,6 +54,7 @@ class MaxBatchSize(BaseModel):
         os.environ["MACHINE_LEARNING_MAX_BATCH_SIZE__OCR"] = ocr_fallback
     facial_recognition: int | None = None
     ocr: int | None = None
+    clip_textual: int | None = None
 
 
 class Settings(BaseSettings):
@@ -64,13 +66,18 @@ class Settings(BaseSettings):
     )
 
     cache_folder: Path = (Path.home() / ".cache" / "immich_ml").resolve()
+    model_mirror: str | None = None
+    download_threads: int = 8
     model_ttl: int = 300
     model_ttl_poll_s: int = 10
     workers: int = 1
     worker_timeout: int = 300
     http_keepalive_timeout_s: int = 2
+    unix_socket: Path | None = None
+    grpc_port: int = 0
     test_full: bool = False
     request_threads: int = os.cpu_count() or 4
+    interactive_threads: int = 1
     model_inter_op_threads: int = 0
     model_intra_op_threads: int = 0
     model_arena: bool = True
@@ -80,14 +87,28 @@ class Settings(BaseSettings):
     rknn: bool = True
     rknn_threads: int = 1
     preload: PreloadModelData | None = None
+    preload_parallelism: int = 4
+    preload_before_fork: bool = False
+    warmup: bool = True
+    warmup_batch_sizes: bool = False
     max_batch_size: MaxBatchSize | None = None
     openvino_precision: ModelPrecision = ModelPrecision.FP32
     rocm_precision: ModelPrecision = ModelPrecision.FP32
+    multi_device: bool = False
+    max_concurrent_images: int = 0
+    max_queued_requests: int = 0
+    retry_after_s: int = 1
+    deduplicate_requests: bool = True
+    profiling: bool = False
 
     @property
     def device_id(self) -> str:
         return os.environ.get("MACHINE_LEARNING_DEVICE_ID", "0")
 
+    @property
+    def device_ids(self) -> list[str]:
+        return os.environ.get("MACHINE_LEARNING_DEVICE_IDS", "0").replace(" ", "").split(",")
+
 
 class NonPrefixedSettings(BaseSettings):
     model_config = SettingsConfigDict(case_sensitive=False)
@@ -105,6 +126,14 @@ def clean_name(model_name: str) -> str:
     return model_name.split("/")[-1].translate(_clean_name)
 
 
+_file_name = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+
+def is_valid_name(name: str) -> bool:
+    """Whether a client-provided name (e.g. of a label set) can safely be used as a file name in the cache folder."""
+    return _file_name.fullmatch(name) is not None
+
+
 LOG_LEVELS: dict[str, int] = {
     "critical": logging.ERROR,
     "error": logging.ERROR,
@@ -3,6 +3,8 @@ import os
 from gunicorn.arbiter import Arbiter
 from gunicorn.workers.base import Worker
 
+from immich_ml.config import settings
+
 device_ids = os.environ.get("MACHINE_LEARNING_DEVICE_IDS", "0").replace(" ", "").split(",")
 env = os.environ
 
@@ -10,3 +12,11 @@ env = os.environ
 # Round-robin device assignment for each worker
 def pre_fork(arbiter: Arbiter, _: Worker) -> None:
     env["MACHINE_LEARNING_DEVICE_ID"] = device_ids[len(arbiter.WORKERS) % len(device_ids)]
+
+
+# Workers inherit models loaded here instead of each loading their own copy
+def on_starting(_: Arbiter) -> None:
+    if settings.preload_before_fork:
+        from immich_ml.main import preload_before_fork
+
+        preload_before_fork()
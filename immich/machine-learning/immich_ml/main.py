@@ -1,29 +1,36 @@
+from __future__ import annotations
+
 import asyncio
+import contextvars
 import gc
 import os
 import signal
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 from functools import partial
-from typing import Any, AsyncGenerator, Callable, Iterator
+from typing import IO, TYPE_CHECKING, Any, AsyncGenerator, AsyncIterator, Callable, Iterator, Literal
+from weakref import WeakKeyDictionary
 from zipfile import BadZipFile
 
 import orjson
-from fastapi import Depends, FastAPI, File, Form, HTTPException
-from fastapi.responses import ORJSONResponse, PlainTextResponse
-from onnxruntime.capi.onnxruntime_pybind11_state import InvalidProtobuf, NoSuchFile
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, UploadFile
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
 from PIL.Image import Image
 from pydantic import ValidationError
 from starlette.formparsers import MultiPartParser
 
+from immich_ml.admission import AdmissionController
 from immich_ml.models import get_model_deps
-from immich_ml.models.base import InferenceModel
-from immich_ml.models.transforms import decode_pil
+from immich_ml.models.clip.labels import LabelSet, LabelSetNotFoundError, delete_label_set, save_label_set
+from immich_ml.models.embedding import InvalidOutputError
+from immich_ml.models.transforms import decode_pil, decode_raw
+from immich_ml.sessions.multi_device import DeviceBalancedSession
 
-from .config import PreloadModelData, log, settings
+from . import timing
+from .config import PreloadModelData, is_valid_name, log, non_prefixed_settings, settings
 from .models.cache import ModelCache
+from .scheduler import Priority, PriorityExecutor, request_priority
 from .schemas import (
     InferenceEntries,
     InferenceEntry,
@@ -35,19 +42,33 @@ from .schemas import (
     PipelineRequest,
     T,
 )
+from .singleflight import SingleFlight, hash_request
+
+if TYPE_CHECKING:
+    from immich_ml.models.base import InferenceModel
 
 MultiPartParser.spool_max_size = 2**26  # spools to disk if payload is 64 MiB or larger
 
 model_cache = ModelCache(revalidate=settings.model_ttl > 0)
-thread_pool: ThreadPoolExecutor | None = None
+thread_pool: PriorityExecutor | None = None
+admission: AdmissionController | None = None
+deduplicator: SingleFlight[tuple[InferenceResponse, float]] = SingleFlight()
+profile_lock = asyncio.Lock()
 lock = threading.Lock()
+model_locks: WeakKeyDictionary[InferenceModel, threading.Lock] = WeakKeyDictionary()
+# ARM NN and RKNN keep process-wide state that isn't safe to initialize from several threads, unlike ONNX Runtime
+backend_lock = threading.Lock()
+ready = False
+preload_error: str | None = None
 active_requests = 0
 last_called: float | None = None
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
-    global thread_pool
+    global thread_pool, admission, ready
+    grpc_server = None
+    preload_task = None
     log.info(
         (
             "Created in-memory cache with unloading "
@@ -58,16 +79,39 @@ async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
     try:
         if settings.request_threads > 0:
             # asyncio is a huge bottleneck for performance, so we use a thread pool to run blocking code
-            thread_pool = ThreadPoolExecutor(settings.request_threads) if settings.request_threads > 0 else None
-            log.info(f"Initialized request thread pool with {settings.request_threads} threads.")
+            thread_pool = PriorityExecutor(settings.request_threads, max(settings.interactive_threads, 0), "request")
+            log.info(
+                f"Initialized request thread pool with {settings.request_threads} threads "
+                f"and {max(settings.interactive_threads, 0)} reserved for interactive requests."
+            )
+        if settings.max_concurrent_images > 0:
+            admission = AdmissionController(
+                settings.max_concurrent_images, settings.max_queued_requests, settings.retry_after_s
+            )
+            log.info(f"Limiting concurrent image requests to {settings.max_concurrent_images}.")
         if settings.model_ttl > 0 and settings.model_ttl_poll_s > 0:
             asyncio.ensure_future(idle_shutdown_task())
         if settings.preload is not None:
-            await preload_models(settings.preload)
+            # loads in the background so the worker can report liveness while it isn't ready yet
+            preload_task = asyncio.ensure_future(preload_and_mark_ready(settings.preload))
+        else:
+            ready = True
+        if settings.grpc_port > 0:
+            from .rpc.server import serve
+
+            host = non_prefixed_settings.immich_host
+            grpc_server = await serve(
+                f"{f'[{host}]' if ':' in host and '[' not in host else host}:{settings.grpc_port}"
+            )
+            log.info(f"Serving gRPC on port {settings.grpc_port}.")
         yield
     finally:
+        if preload_task is not None:
+            preload_task.cancel()
+        if grpc_server is not None:
+            await grpc_server.stop(grace=5)
         log.handlers.clear()
-        for model in model_cache.cache._cache.values():
+        for model in model_cache.loaded_models():
             del model
         if thread_pool is not None:
             thread_pool.shutdown()
@@ -76,46 +120,29 @@ async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
 
 async def preload_models(preload: PreloadModelData) -> None:
     log.info(f"Preloading models: clip:{preload.clip} facial_recognition:{preload.facial_recognition}")
+    semaphore = asyncio.Semaphore(max(settings.preload_parallelism, 1))
 
-    async def load_models(model_string: str, model_type: ModelType, model_task: ModelTask) -> None:
-        for model_name in model_string.split(","):
-            model_name = model_name.strip()
+    async def load_model(model_name: str, model_type: ModelType, model_task: ModelTask) -> None:
+        async with semaphore:
             model = await model_cache.get(model_name, model_type, model_task)
             await load(model)
 
-    if preload.clip.textual is not None:
-        await load_models(preload.clip.textual, ModelType.TEXTUAL, ModelTask.SEARCH)
-
-    if preload.clip.visual is not None:
-        await load_models(preload.clip.visual, ModelType.VISUAL, ModelTask.SEARCH)
-
-    if preload.facial_recognition.detection is not None:
-        await load_models(
-            preload.facial_recognition.detection,
-            ModelType.DETECTION,
-            ModelTask.FACIAL_RECOGNITION,
-        )
-
-    if preload.facial_recognition.recognition is not None:
-        await load_models(
-            preload.facial_recognition.recognition,
-            ModelType.RECOGNITION,
-            ModelTask.FACIAL_RECOGNITION,
-        )
-
-    if preload.ocr.detection is not None:
-        await load_models(
-            preload.ocr.detection,
-            ModelType.DETECTION,
-            ModelTask.OCR,
-        )
-
-    if preload.ocr.recognition is not None:
-        await load_models(
-            preload.ocr.recognition,
-            ModelType.RECOGNITION,
-            ModelTask.OCR,
-        )
+    requested = [
+        (preload.clip.textual, ModelType.TEXTUAL, ModelTask.SEARCH),
+        (preload.clip.visual, ModelType.VISUAL, ModelTask.SEARCH),
+        (preload.facial_recognition.detection, ModelType.DETECTION, ModelTask.FACIAL_RECOGNITION),
+        (preload.facial_recognition.recognition, ModelType.RECOGNITION, ModelTask.FACIAL_RECOGNITION),
+        (preload.ocr.detection, ModelType.DETECTION, ModelTask.OCR),
+        (preload.ocr.recognition, ModelType.RECOGNITION, ModelTask.OCR),
+    ]
+    await asyncio.gather(
+        *[
+            load_model(model_name.strip(), model_type, model_task)
+            for model_names, model_type, model_task in requested
+            if model_names is not None
+            for model_name in model_names.split(",")
+        ]
+    )
 
     if preload.clip_fallback is not None:
         log.warning(
@@ -132,6 +159,51 @@ async def preload_models(preload: PreloadModelData) -> None:
         )
 
 
+async def preload_and_mark_ready(preload: PreloadModelData) -> None:
+    global ready, preload_error
+    try:
+        await preload_models(preload)
+        ready = True
+        log.info("Finished preloading models.")
+    except Exception as e:
+        # reported by /ready, since the worker won't become ready without a restart
+        preload_error = f"{type(e).__name__}: {e}"
+        log.exception("Failed to preload models", exc_info=e)
+
+
+def preload_before_fork() -> None:
+    """
+    Loads the preloaded models in the gunicorn arbiter, so forked workers share their weights copy-on-write.
+
+    Only CPU inference is supported: GPU and NPU contexts don't survive a fork.
+    """
+    if settings.preload is None:
+        return
+
+    import onnxruntime as ort
+
+    from .models.constants import SUPPORTED_PROVIDERS
+    from .sessions import rknn
+    from .sessions.ann import loader
+
+    providers = [provider for provider in SUPPORTED_PROVIDERS if provider in ort.get_available_providers()]
+    if providers != ["CPUExecutionProvider"] or rknn.is_available or (loader.is_available and settings.ann):
+        log.warning("Loading models before forking workers is only supported for CPU inference. Skipping.")
+        return
+
+    # ORT's thread pools don't survive a fork, so shared sessions must run on the calling thread
+    if settings.model_intra_op_threads != 1 or settings.model_inter_op_threads != 1:
+        log.info("Using 1 intra-op and inter-op thread per model to share models between workers.")
+        settings.model_intra_op_threads = settings.model_inter_op_threads = 1
+    try:
+        asyncio.run(preload_models(settings.preload))
+    except Exception as e:
+        # workers load whatever is missing themselves
+        log.exception("Failed to preload models before forking workers", exc_info=e)
+    # keeps the garbage collector from writing to shared pages in workers
+    gc.freeze()
+
+
 def update_state() -> Iterator[None]:
     global active_requests, last_called
     active_requests += 1
@@ -144,26 +216,30 @@ def update_state() -> Iterator[None]:
 
 def get_entries(entries: str = Form()) -> InferenceEntries:
     try:
-        request: PipelineRequest = orjson.loads(entries)
-        without_deps: list[InferenceEntry] = []
-        with_deps: list[InferenceEntry] = []
-        for task, types in request.items():
-            for type, entry in types.items():
-                parsed: InferenceEntry = {
-                    "name": entry["modelName"],
-                    "task": task,
-                    "type": type,
-                    "options": entry.get("options", {}),
-                }
-                dep = get_model_deps(parsed["name"], type, task)
-                (with_deps if dep else without_deps).append(parsed)
-        return without_deps, with_deps
+        return parse_entries(orjson.loads(entries))
     except (orjson.JSONDecodeError, ValidationError, KeyError, AttributeError) as e:
         log.error(f"Invalid request format: {e}")
         raise HTTPException(422, "Invalid request format.")
 
 
+def parse_entries(request: PipelineRequest) -> InferenceEntries:
+    without_deps: list[InferenceEntry] = []
+    with_deps: list[InferenceEntry] = []
+    for task, types in request.items():
+        for type, entry in types.items():
+            parsed: InferenceEntry = {
+                "name": entry["modelName"],
+                "task": task,
+                "type": type,
+                "options": entry.get("options", {}),
+            }
+            dep = get_model_deps(parsed["name"], type, task)
+            (with_deps if dep else without_deps).append(parsed)
+    return without_deps, with_deps
+
+
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(timing.ServerTimingMiddleware)
 
 
 @app.get("/")
@@ -176,23 +252,195 @@ def ping() -> PlainTextResponse:
     return PlainTextResponse("pong")
 
 
+@app.get("/ready")
+def ready_check() -> PlainTextResponse:
+    if preload_error is not None:
+        return PlainTextResponse(f"failed to preload models: {preload_error}", status_code=503)
+    if not ready:
+        return PlainTextResponse("not ready", status_code=503)
+    return PlainTextResponse("ready")
+
+
+@app.get("/devices")
+async def devices() -> ORJSONResponse:
+    utilization = {
+        get_model_key(model): model.session.utilization()
+        for model in model_cache.loaded_models()
+        if isinstance(model.session, DeviceBalancedSession)
+    }
+    return ORJSONResponse(utilization)
+
+
+@app.get("/metrics")
+async def metrics() -> ORJSONResponse:
+    timings = {
+        get_model_key(model): {
+            "loadTimeMs": to_ms(model.load_time),
+            "warmupTimeMs": to_ms(model.warmup_time),
+        }
+        for model in model_cache.loaded_models()
+    }
+    return ORJSONResponse(timings)
+
+
+def to_ms(seconds: float | None) -> float | None:
+    return seconds * 1000 if seconds is not None else None
+
+
+def get_model_key(model: InferenceModel) -> str:
+    return f"{model.model_task}/{model.model_type}/{model.model_name}"
+
+
+@app.post("/profile")
+async def profile(
+    duration_s: float = Query(default=10, gt=0, le=300),
+    models: list[str] = Query(default=[]),
+    interval_ms: float = Query(default=10, ge=1),
+    format: Literal["chrome", "speedscope"] = "chrome",
+) -> ORJSONResponse:
+    """
+    Profiles requests for the given duration, returning a Chrome trace or speedscope profile of the Python code
+    handling them along with ONNX Runtime's operator timings for the given models, or all loaded models if none are
+    given. Models are identified like in `/metrics`.
+    """
+    if not settings.profiling:
+        raise HTTPException(404, "Profiling is disabled")
+    if profile_lock.locked():
+        raise HTTPException(409, "Already profiling")
+
+    from .profiler import Profiler
+
+    loaded = {get_model_key(model): model for model in model_cache.loaded_models()}
+    if missing := set(models) - loaded.keys():
+        raise HTTPException(422, f"Models not loaded: {', '.join(sorted(missing))}")
+    async with profile_lock:
+        profiler = Profiler({key: loaded[key] for key in models} if models else loaded, interval_ms / 1000)
+        # enabling ORT profiling recreates the sessions, so it runs outside the event loop
+        await asyncio.to_thread(profiler.start)
+        try:
+            await asyncio.sleep(duration_s)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+    trace = await asyncio.to_thread(profiler.to_chrome_trace if format == "chrome" else profiler.to_speedscope)
+    return ORJSONResponse(trace)
+
+
+@app.exception_handler(LabelSetNotFoundError)
+async def label_set_not_found(request: Request, exc: LabelSetNotFoundError) -> ORJSONResponse:
+    return ORJSONResponse({"detail": str(exc)}, status_code=404)
+
+
+@app.exception_handler(InvalidOutputError)
+async def invalid_output(request: Request, exc: InvalidOutputError) -> ORJSONResponse:
+    return ORJSONResponse({"detail": str(exc)}, status_code=422)
+
+
+@app.put("/labels/{name}")
+async def put_label_set(name: str, label_set: LabelSet) -> ORJSONResponse:
+    """
+    Registers a label set for zero-shot classification, replacing any existing one of the same name. The labels are
+    encoded the first time a model classifies with them.
+    """
+    if not is_valid_name(name):
+        raise HTTPException(422, "Label set names may only contain letters, digits, '_' and '-'")
+    await asyncio.to_thread(save_label_set, name, label_set)
+    return ORJSONResponse({"name": name, "labels": len(label_set.labels)})
+
+
+@app.delete("/labels/{name}", status_code=204)
+async def remove_label_set(name: str) -> Response:
+    await asyncio.to_thread(delete_label_set, name)
+    return Response(status_code=204)
+
+
 @app.post("/predict", dependencies=[Depends(update_state)])
 async def predict(
     entries: InferenceEntries = Depends(get_entries),
-    image: bytes | None = File(default=None),
+    image: UploadFile | None = File(default=None),
     text: str | None = Form(default=None),
+    texts: list[str] | None = Form(default=None),
+    width: int | None = Form(default=None),
+    height: int | None = Form(default=None),
+    stride: int | None = Form(default=None),
+    priority: Priority | None = Header(default=None, alias="X-Priority"),
 ) -> Any:
+    # receiving and parsing the form happens before the handler is called
+    timing.since_start("parse")
+    # text requests come from searches, so they shouldn't wait behind queued image jobs; batches of texts are bulk work
+    request_priority.set(priority or (Priority.BACKGROUND if text is None else Priority.INTERACTIVE))
     if image is not None:
-        inputs: Image | str = await run(lambda: decode_pil(image))
+        # decodes straight from the spooled upload, unless it has to be read for a deduplicated call
+        response, queue_wait = await predict_image(image.file, entries, width, height, stride)
+        return ORJSONResponse(response, headers={"X-Queue-Wait-Ms": f"{queue_wait * 1000:.1f}"})
     elif text is not None:
-        inputs = text
+        return ORJSONResponse(await run_inference(text, entries))
+    elif texts is not None:
+        return ORJSONResponse(await run_inference(texts, entries))
     else:
-        raise HTTPException(400, "Either image or text must be provided")
-    response = await run_inference(inputs, entries)
-    return ORJSONResponse(response)
+        raise HTTPException(400, "Either image, text or texts must be provided")
+
+
+async def predict_image(
+    image: bytes | IO[bytes],
+    entries: InferenceEntries,
+    width: int | None = None,
+    height: int | None = None,
+    stride: int | None = None,
+    packed: bool = False,
+) -> tuple[InferenceResponse, float]:
+    """Decodes and runs inference on an image, returning the response and the time (s) spent queued."""
+    if not settings.deduplicate_requests:
+        return await _predict_image(image, entries, width, height, stride, packed)
+    if not isinstance(image, bytes):
+        # the upload is closed once the request that started the call ends, which may be before the call has run
+        image = await run(image.read)
+    # retried or overlapping jobs for the same asset share one computation instead of running twice
+    key = await run(hash_request, image, entries, width, height, stride, packed)
+    return await deduplicator.run(key, partial(_predict_image, image, entries, width, height, stride, packed))
+
+
+async def _predict_image(
+    image: bytes | IO[bytes],
+    entries: InferenceEntries,
+    width: int | None = None,
+    height: int | None = None,
+    stride: int | None = None,
+    packed: bool = False,
+) -> tuple[InferenceResponse, float]:
+    async with admit(entries) as queue_wait:
+        timing.add("queue", int(queue_wait * 1e9))
+        if width is None and height is None:
+            inputs = await run(timing.timed("decode", decode_pil), image)
+        elif width is not None and height is not None:
+            # already decoded by the caller, so the pixels only need to be wrapped
+            try:
+                inputs = await run(timing.timed("decode", decode_raw), image, width, height, stride)
+            except ValueError as e:
+                raise HTTPException(422, str(e))
+        else:
+            raise HTTPException(422, "Both width and height must be provided for raw images")
+        return await run_inference(inputs, entries, packed), queue_wait
+
+
+@asynccontextmanager
+async def admit(entries: InferenceEntries) -> AsyncIterator[float]:
+    # bounds the number of decoded images in memory, shedding requests once the task's queue is full
+    if admission is None:
+        yield 0.0
+        return
+    async with admission.admit(get_task_key(entries)) as queue_wait:
+        yield queue_wait
+
+
+def get_task_key(entries: InferenceEntries) -> str:
+    without_deps, with_deps = entries
+    return ",".join(sorted({entry["task"] for entry in [*without_deps, *with_deps]}))
 
 
-async def run_inference(payload: Image | str, entries: InferenceEntries) -> InferenceResponse:
+async def run_inference(
+    payload: Image | str | list[str], entries: InferenceEntries, packed: bool = False
+) -> InferenceResponse:
+    """Runs each entry's model, with embeddings in the response kept as float32 arrays if `packed`."""
     outputs: dict[ModelIdentity, Any] = {}
     response: InferenceResponse = {}
 
@@ -207,10 +455,14 @@ async def run_inference(payload: Image | str, entries: InferenceEntries) -> Infe
             except KeyError:
                 message = f"Task {entry['task']} of type {entry['type']} depends on output of {dep}"
                 raise HTTPException(400, message)
+        for identity in model.uses:
+            used = await model_cache.get(entry["name"], *identity, ttl=settings.model_ttl)
+            model.use(await load(used))
         model = await load(model)
-        output = await run(model.predict, *inputs, **entry["options"])
-        outputs[model.identity] = output
-        response[entry["task"]] = output
+        # models that depend on this one get its output before it's serialized, e.g. embeddings at full size
+        outputs[model.identity], response[entry["task"]] = await run(
+            model.infer, *inputs, packed=packed, **entry["options"]
+        )
 
     without_deps, with_deps = entries
     await asyncio.gather(*[_run_inference(entry) for entry in without_deps])
@@ -226,17 +478,23 @@ async def run(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
     if thread_pool is None:
         return func(*args, **kwargs)
     partial_func = partial(func, *args, **kwargs)
-    return await asyncio.get_running_loop().run_in_executor(thread_pool, partial_func)
+    # like `asyncio.to_thread`, so work in the pool can see the request's context vars (e.g. to record timings)
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(thread_pool, context.run, partial_func)
 
 
 async def load(model: InferenceModel) -> InferenceModel:
     if model.loaded:
         return model
 
+    from onnxruntime.capi.onnxruntime_pybind11_state import InvalidProtobuf, NoSuchFile
+
     def _load(model: InferenceModel) -> InferenceModel:
         if model.load_attempts > 1:
             raise HTTPException(500, f"Failed to load model '{model.model_name}'")
-        with lock:
+        # downloads can take a while, so they shouldn't hold up loading other models
+        model.download()
+        with get_model_lock(model), get_backend_lock(model):
             try:
                 model.load()
             except FileNotFoundError as e:
@@ -258,12 +516,21 @@ async def load(model: InferenceModel) -> InferenceModel:
         return await run(_load, model)
 
 
+def get_model_lock(model: InferenceModel) -> threading.Lock:
+    with lock:
+        return model_locks.setdefault(model, threading.Lock())
+
+
+def get_backend_lock(model: InferenceModel) -> threading.Lock | nullcontext[None]:
+    return nullcontext() if model.model_format == ModelFormat.ONNX else backend_lock
+
+
 async def idle_shutdown_task() -> None:
     while True:
         if (
             last_called is not None
             and not active_requests
-            and not lock.locked()
+            and not any(model_lock.locked() for model_lock in list(model_locks.values()))
             and time.time() - last_called > settings.model_ttl
         ):
             log.info("Shutting down due to inactivity.")
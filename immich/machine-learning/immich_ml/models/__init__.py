@@ -1,39 +1,57 @@
-from typing import Any
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
 
-from immich_ml.models.base import InferenceModel
-from immich_ml.models.clip.textual import MClipTextualEncoder, OpenClipTextualEncoder
-from immich_ml.models.clip.visual import OpenClipVisualEncoder
-from immich_ml.models.ocr.detection import TextDetector
-from immich_ml.models.ocr.recognition import TextRecognizer
 from immich_ml.schemas import ModelSource, ModelTask, ModelType
 
 from .constants import get_model_source
-from .facial_recognition.detection import FaceDetector
-from .facial_recognition.recognition import FaceRecognizer
+
+if TYPE_CHECKING:
+    from immich_ml.models.base import InferenceModel
 
 
+# model families and their runtimes are imported on first use, so a node only pays for the ones it serves
 def get_model_class(model_name: str, model_type: ModelType, model_task: ModelTask) -> type[InferenceModel]:
     source = get_model_source(model_name)
     match source, model_type, model_task:
         case ModelSource.OPENCLIP | ModelSource.MCLIP, ModelType.VISUAL, ModelTask.SEARCH:
+            from immich_ml.models.clip.visual import OpenClipVisualEncoder
+
             return OpenClipVisualEncoder
 
         case ModelSource.OPENCLIP, ModelType.TEXTUAL, ModelTask.SEARCH:
+            from immich_ml.models.clip.textual import OpenClipTextualEncoder
+
             return OpenClipTextualEncoder
 
         case ModelSource.MCLIP, ModelType.TEXTUAL, ModelTask.SEARCH:
+            from immich_ml.models.clip.textual import MClipTextualEncoder
+
             return MClipTextualEncoder
 
+        case ModelSource.OPENCLIP | ModelSource.MCLIP, ModelType.TEXTUAL, ModelTask.CLASSIFICATION:
+            from immich_ml.models.clip.classification import ZeroShotClassifier
+
+            return ZeroShotClassifier
+
         case ModelSource.INSIGHTFACE, ModelType.DETECTION, ModelTask.FACIAL_RECOGNITION:
+            from .facial_recognition.detection import FaceDetector
+
             return FaceDetector
 
         case ModelSource.INSIGHTFACE, ModelType.RECOGNITION, ModelTask.FACIAL_RECOGNITION:
+            from .facial_recognition.recognition import FaceRecognizer
+
             return FaceRecognizer
 
         case ModelSource.PADDLE, ModelType.DETECTION, ModelTask.OCR:
+            from immich_ml.models.ocr.detection import TextDetector
+
             return TextDetector
 
         case ModelSource.PADDLE, ModelType.RECOGNITION, ModelTask.OCR:
+            from immich_ml.models.ocr.recognition import TextRecognizer
+
             return TextRecognizer
 
         case _:
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import threading
+import time
 from abc import ABC, abstractmethod
 from pathlib import Path
 from shutil import rmtree
@@ -11,14 +13,24 @@ import immich_ml.sessions.ann.loader
 import immich_ml.sessions.rknn as rknn
 from immich_ml.sessions.ort import OrtSession
 
+from .. import timing
 from ..config import clean_name, log, settings
 from ..schemas import ModelFormat, ModelIdentity, ModelSession, ModelTask, ModelType
 from ..sessions.ann import AnnSession
+from ..sessions.batch import BatchedSession, get_batch_variants
+from ..sessions.multi_device import DeviceBalancedSession
+from .download import copy_from_mirror, is_url, verify_checksums
 
 
 class InferenceModel(ABC):
     depends: ClassVar[list[ModelIdentity]]
     identity: ClassVar[ModelIdentity]
+    # options that can differ between concurrent requests, so they're passed to `_predict` rather than configured
+    request_options: ClassVar[tuple[str, ...]] = ()
+    # options for how the output is returned, e.g. as smaller embeddings, which are passed to `serialize`
+    output_options: ClassVar[tuple[str, ...]] = ()
+    # models this one runs itself, which are shared through the model cache and passed to `use` before it loads
+    uses: ClassVar[list[ModelIdentity]] = []
 
     def __init__(
         self,
@@ -30,17 +42,23 @@ class InferenceModel(ABC):
     ) -> None:
         self.loaded = session is not None
         self.load_attempts = 0
+        self.load_time: float | None = None
+        self.warmup_time: float | None = None
         self.model_name = clean_name(model_name)
         self.cache_dir = Path(cache_dir) if cache_dir is not None else self._cache_dir_default
         self.model_format = model_format if model_format is not None else self._model_format_default
+        self.download_lock = threading.Lock()
         if session is not None:
             self.session = session
 
     def download(self) -> None:
-        if not self.cached:
-            model_type = self.model_type.replace("-", " ")
-            log.info(f"Downloading {model_type} model '{self.model_name}' to {self.model_path}. This may take a while.")
-            self._download()
+        with self.download_lock:
+            if not self.cached:
+                model_type = self.model_type.replace("-", " ")
+                log.info(
+                    f"Downloading {model_type} model '{self.model_name}' to {self.model_path}. This may take a while."
+                )
+                self._download()
 
     def load(self) -> None:
         if self.loaded:
@@ -50,21 +68,67 @@ class InferenceModel(ABC):
         self.download()
         attempt = f"Attempt #{self.load_attempts} to load" if self.load_attempts > 1 else "Loading"
         log.info(f"{attempt} {self.model_type.replace('-', ' ')} model '{self.model_name}' to memory")
+        start = time.perf_counter()
         self.session = self._load()
+        self.load_time = time.perf_counter() - start
+        if settings.warmup:
+            self.warmup()
         self.loaded = True
 
+    def warmup(self) -> None:
+        """
+        Runs synthetic inputs through the model so the first real request doesn't pay for lazy allocations, kernel
+        selection and graph compilation.
+        """
+        # multi-device sessions send each call to the idlest device, so each pass lands on a different one
+        passes = len(self.session.devices) if isinstance(self.session, DeviceBalancedSession) else 1
+        start = time.perf_counter()
+        try:
+            for _ in range(passes):
+                for inputs in self._warmup_inputs(all_batch_sizes=settings.warmup_batch_sizes):
+                    self._predict(*inputs)
+        except Exception as e:
+            log.warning(f"Failed to warm up {self.model_type.replace('-', ' ')} model '{self.model_name}'", exc_info=e)
+            return
+        self.warmup_time = time.perf_counter() - start
+        log.debug(f"Warmed up model '{self.model_name}' in {self.warmup_time:.2f}s")
+
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        """Inputs for `_predict` to warm up with, covering each batch size the model supports if `all_batch_sizes`."""
+        return []
+
     def predict(self, *inputs: Any, **model_kwargs: Any) -> Any:
+        return self.infer(*inputs, **model_kwargs)[1]
+
+    def infer(self, *inputs: Any, packed: bool = False, **model_kwargs: Any) -> tuple[Any, Any]:
+        """Returns the output of `_predict` as-is, for models that depend on it, along with its serialized form."""
         self.load()
+        request_options = {key: model_kwargs.pop(key) for key in self.request_options if key in model_kwargs}
+        output_options = {key: model_kwargs.pop(key) for key in self.output_options if key in model_kwargs}
         if model_kwargs:
             self.configure(**model_kwargs)
-        return self._predict(*inputs)
+        with timing.model(f"{self.model_task}.{self.model_type}"):
+            result = self._predict(*inputs, **request_options)
+            return result, self.serialize(result, packed, **output_options)
 
     @abstractmethod
     def _predict(self, *inputs: Any, **model_kwargs: Any) -> Any: ...
 
+    def serialize(self, result: Any, *args: Any, **output_options: Any) -> Any:
+        """
+        Converts the output of `_predict` for the response, e.g. embeddings to strings.
+
+        Models with embeddings take a `packed` argument first, to keep them as float32 arrays for the gRPC API instead.
+        """
+        return result
+
     def configure(self, **kwargs: Any) -> None:
         pass
 
+    def use(self, model: InferenceModel) -> None:
+        """Receives a loaded model listed in `uses`, so it doesn't need to load its own copy."""
+        pass
+
     def _download(self) -> None:
         ignored_patterns: dict[ModelFormat, list[str]] = {
             ModelFormat.ONNX: ["*.armnn", "*.rknn"],
@@ -72,12 +136,20 @@ class InferenceModel(ABC):
             ModelFormat.RKNN: ["*.armnn"],
         }
 
-        snapshot_download(
-            f"immich-app/{clean_name(self.model_name)}",
-            cache_dir=self.cache_dir,
-            local_dir=self.cache_dir,
-            ignore_patterns=ignored_patterns.get(self.model_format, []),
-        )
+        repo_name = clean_name(self.model_name)
+        mirror = settings.model_mirror
+        if mirror is not None and not is_url(mirror):
+            copy_from_mirror(Path(mirror) / repo_name, self.cache_dir, ignored_patterns.get(self.model_format, []))
+        else:
+            snapshot_download(
+                f"immich-app/{repo_name}",
+                cache_dir=self.cache_dir,
+                local_dir=self.cache_dir,
+                ignore_patterns=ignored_patterns.get(self.model_format, []),
+                max_workers=settings.download_threads,
+                endpoint=mirror,
+            )
+        verify_checksums(self.cache_dir)
 
     def _load(self) -> ModelSession:
         return self._make_session(self.model_path)
@@ -111,12 +183,21 @@ class InferenceModel(ABC):
         match model_path.suffix:
             case ".armnn":
                 session: ModelSession = AnnSession(model_path)
+            case ".onnx" if settings.multi_device and len(settings.device_ids) > 1:
+                session = DeviceBalancedSession(
+                    {device_id: OrtSession(model_path, device_id=device_id) for device_id in settings.device_ids}
+                )
             case ".onnx":
                 session = OrtSession(model_path)
             case ".rknn":
                 session = rknn.RknnSession(model_path)
             case _:
                 raise ValueError(f"Unsupported model file type: {model_path.suffix}")
+
+        # ARM NN and RKNN models have static shapes, so each batch size they support is compiled separately
+        if model_path.suffix != ".onnx" and (variants := get_batch_variants(model_path)):
+            sessions = [session, *(self._make_session(variant) for variant in variants)]
+            session = BatchedSession({s.get_inputs()[0].shape[0]: s for s in sessions})
         return session
 
     def model_path_for_format(self, model_format: ModelFormat) -> Path:
@@ -1,14 +1,18 @@
-from typing import Any
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
 
 from aiocache.backends.memory import SimpleMemoryCache
 from aiocache.lock import OptimisticLock
 from aiocache.plugins import TimingPlugin
 
 from immich_ml.models import from_model_type
-from immich_ml.models.base import InferenceModel
 
 from ..schemas import ModelTask, ModelType, has_profiling
 
+if TYPE_CHECKING:
+    from immich_ml.models.base import InferenceModel
+
 
 class ModelCache:
     """Fetches a model from an in-memory cache, instantiating it if it's missing."""
@@ -49,6 +53,10 @@ class ModelCache:
                 await self.revalidate(key, model_kwargs.get("ttl", None))
         return model
 
+    def loaded_models(self) -> list[InferenceModel]:
+        """Returns the cached models that have been loaded into memory."""
+        return [model for model in self.cache._cache.values() if model.loaded]
+
     async def get_profiling(self) -> dict[str, float] | None:
         if not has_profiling(self.cache):
             return None
@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Any, NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from immich_ml.config import log
+from immich_ml.models.base import InferenceModel
+from immich_ml.models.clip.labels import LabelSetNotFoundError, embeddings_dir, label_set_path, load_label_set
+from immich_ml.models.clip.textual import BaseCLIPTextualEncoder, MClipTextualEncoder, OpenClipTextualEncoder
+from immich_ml.models.constants import get_model_source
+from immich_ml.schemas import Classification, ModelSession, ModelSource, ModelTask, ModelType
+
+
+class LabelEmbeddings(NamedTuple):
+    mtime_ns: int
+    labels: list[str]
+    embeddings: NDArray[np.float32]  # normalized, one row per label
+
+
+class ZeroShotClassifier(InferenceModel):
+    """
+    Scores an image's CLIP embedding against the embeddings of a registered label set, returning the top-k labels.
+
+    Label embeddings are computed with the model's text encoder the first time a label set is used, then kept in memory
+    and saved next to the label set so other workers and restarts don't need to encode them again.
+    """
+
+    depends = [(ModelType.VISUAL, ModelTask.SEARCH)]
+    identity = (ModelType.TEXTUAL, ModelTask.CLASSIFICATION)
+    request_options = ("labelSet", "topK")
+    uses = [(ModelType.TEXTUAL, ModelTask.SEARCH)]
+
+    def __init__(self, model_name: str, **model_kwargs: Any) -> None:
+        super().__init__(model_name, **model_kwargs)
+        encoder_class = (
+            MClipTextualEncoder if get_model_source(model_name) == ModelSource.MCLIP else OpenClipTextualEncoder
+        )
+        # replaced with the cached search model by `use` when serving requests, so only one copy is loaded
+        self.encoder: BaseCLIPTextualEncoder = encoder_class(model_name, **model_kwargs)
+        self.label_sets: dict[str, LabelEmbeddings] = {}
+        self.label_lock = threading.Lock()
+
+    def _predict(self, inputs: Any, embedding: NDArray[np.float32], **options: Any) -> list[Classification]:
+        # the visual model's embedding before any `output` options are applied, which only affect its response
+        label_set = self.get_label_embeddings(options.get("labelSet", ""))
+        query = embedding.astype(np.float32, copy=False)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []  # has no direction, so it's no more similar to one label than another
+        scores = label_set.embeddings @ (query / norm)
+
+        k = min(int(options.get("topK", 5)), len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"label": label_set.labels[i], "score": float(scores[i])} for i in top]
+
+    def get_label_embeddings(self, name: str) -> LabelEmbeddings:
+        mtime_ns = self._label_set_mtime(name)
+        cached = self.label_sets.get(name)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
+
+        # requests for the same label set wait for its embeddings rather than encoding them again
+        with self.label_lock:
+            mtime_ns = self._label_set_mtime(name)
+            cached = self.label_sets.get(name)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                return cached
+
+            label_set, digest = load_label_set(name)
+            path = embeddings_dir(name) / f"{self.model_name}-{digest}.npy"
+            if path.is_file():
+                embeddings: NDArray[np.float32] = np.load(path)
+            else:
+                log.info(f"Encoding {len(label_set.labels)} labels of label set '{name}' with '{self.model_name}'")
+                embeddings = self.encoder.embed(label_set.texts())
+                embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                with tmp_path.open("wb") as f:
+                    np.save(f, embeddings)
+                os.replace(tmp_path, path)
+
+            self.label_sets[name] = LabelEmbeddings(mtime_ns, label_set.labels, embeddings)
+            return self.label_sets[name]
+
+    def _label_set_mtime(self, name: str) -> int:
+        try:
+            return label_set_path(name).stat().st_mtime_ns
+        except FileNotFoundError:
+            self.label_sets.pop(name, None)
+            raise LabelSetNotFoundError(name)
+
+    def use(self, model: InferenceModel) -> None:
+        # the search model of the same name, which encodes text the same way
+        if isinstance(model, BaseCLIPTextualEncoder):
+            self.encoder = model
+
+    def download(self) -> None:
+        self.encoder.download()
+
+    def _load(self) -> ModelSession:
+        # the text encoder is kept loaded, so newly registered label sets can be encoded without waiting for it
+        if not self.encoder.loaded:
+            self.encoder.model_format = self.model_format
+            self.encoder.load()
+        return self.encoder.session
+
+    def clear_cache(self) -> None:
+        self.encoder.clear_cache()
+
+    @property
+    def cached(self) -> bool:
+        return self.encoder.cached
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from pathlib import Path
+from shutil import rmtree
+
+from pydantic import BaseModel, Field, field_validator
+
+from immich_ml.config import is_valid_name, settings
+
+
+class LabelSet(BaseModel):
+    labels: list[str] = Field(min_length=1)
+    # each label is put into the template before encoding, e.g. "a photo of a {}."
+    template: str = "{}"
+
+    @field_validator("template")
+    @classmethod
+    def has_placeholder(cls, template: str) -> str:
+        if "{}" not in template:
+            raise ValueError("template must contain '{}'")
+        return template
+
+    def texts(self) -> list[str]:
+        return [self.template.replace("{}", label) for label in self.labels]
+
+
+class LabelSetNotFoundError(LookupError):
+    def __init__(self, name: str) -> None:
+        super().__init__(f"Label set '{name}' not found")
+
+
+def label_set_path(name: str) -> Path:
+    if not is_valid_name(name):
+        raise LabelSetNotFoundError(name)
+    return settings.cache_folder / "labels" / f"{name}.json"
+
+
+def embeddings_dir(name: str) -> Path:
+    """Embeddings of the label set's current version, with a file per textual model."""
+    return label_set_path(name).with_suffix("")
+
+
+def save_label_set(name: str, label_set: LabelSet) -> None:
+    path = label_set_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rmtree(embeddings_dir(name), ignore_errors=True)
+    # replaced atomically, so other workers never read a partially written file
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(label_set.model_dump_json())
+    os.replace(tmp_path, path)
+
+
+def load_label_set(name: str) -> tuple[LabelSet, str]:
+    """Returns the label set and a digest of its contents, which changes whenever it's registered with new labels."""
+    try:
+        data = label_set_path(name).read_bytes()
+    except FileNotFoundError:
+        raise LabelSetNotFoundError(name)
+    return LabelSet.model_validate_json(data), hashlib.sha256(data).hexdigest()[:16]
+
+
+def delete_label_set(name: str) -> None:
+    try:
+        label_set_path(name).unlink()
+    except FileNotFoundError:
+        raise LabelSetNotFoundError(name)
+    rmtree(embeddings_dir(name), ignore_errors=True)
@@ -8,21 +8,59 @@ import numpy as np
 from numpy.typing import NDArray
 from tokenizers import Encoding, Tokenizer
 
-from immich_ml.config import log
+from immich_ml.config import log, settings
 from immich_ml.models.base import InferenceModel
 from immich_ml.models.constants import WEBLATE_TO_FLORES200
-from immich_ml.models.transforms import clean_text, serialize_np_array
-from immich_ml.schemas import ModelSession, ModelTask, ModelType
+from immich_ml.models.embedding import pack_embeddings, parse_output, serialize_embeddings
+from immich_ml.models.transforms import clean_text
+from immich_ml.schemas import ModelSession, ModelTask, ModelType, QuantizedEmbedding
+from immich_ml.sessions.batch import pad_batch
 
 
 class BaseCLIPTextualEncoder(InferenceModel):
     depends = []
     identity = (ModelType.TEXTUAL, ModelTask.SEARCH)
-
-    def _predict(self, inputs: str, language: str | None = None) -> str:
-        tokens = self.tokenize(inputs, language=language)
-        res: NDArray[np.float32] = self.session.run(None, tokens)[0][0]
-        return serialize_np_array(res)
+    output_options = ("output",)
+    static_batch_size = False
+
+    def _predict(self, inputs: str | list[str], language: str | None = None) -> NDArray[np.float32]:
+        """Returns an embedding, or one per row if `inputs` is a list."""
+        if isinstance(inputs, list):
+            return self.embed(inputs, language=language)
+        return self.run_tokens(self.tokenize(inputs, language=language))[0]
+
+    def serialize(
+        self, result: NDArray[np.float32], packed: bool = False, output: dict[str, Any] | None = None
+    ) -> str | QuantizedEmbedding | list[str | QuantizedEmbedding] | NDArray[np.float32]:
+        embeddings = result if result.ndim > 1 else result[None]
+        serialized = (
+            pack_embeddings(embeddings, self.model_name, parse_output(output))
+            if packed
+            else serialize_embeddings(embeddings, self.model_name, parse_output(output))
+        )
+        return serialized if result.ndim > 1 else serialized[0]
+
+    def embed(self, texts: list[str], language: str | None = None) -> NDArray[np.float32]:
+        """Encodes the texts in batches, returning one embedding per row."""
+        embeddings: NDArray[np.float32] | None = None
+        for i in range(0, len(texts), self.batch_size):
+            chunk = texts[i : i + self.batch_size]
+            res = self.run_tokens(self.tokenize_batch(chunk, language=language))
+            # copied out before the next run, as some sessions reuse their output buffers
+            if embeddings is None:
+                embeddings = np.empty((len(texts), res.shape[-1]), dtype=np.float32)
+            embeddings[i : i + len(chunk)] = res
+        if embeddings is None:
+            raise ValueError("No texts to encode")
+        return embeddings
+
+    def run_tokens(self, tokens: dict[str, NDArray[np.int32]]) -> NDArray[np.float32]:
+        """Runs a batch of tokenized texts, padding it to the model's batch size if that's static."""
+        count = tokens[next(iter(tokens))].shape[0]
+        if self.static_batch_size and count < self.batch_size:
+            tokens = {name: pad_batch(array, self.batch_size) for name, array in tokens.items()}
+        res: NDArray[np.float32] = self.session.run(None, tokens)[0]
+        return res[:count]
 
     def _load(self) -> ModelSession:
         session = super()._load()
@@ -33,8 +71,23 @@ class BaseCLIPTextualEncoder(InferenceModel):
         self.is_nllb = self.model_name.startswith("nllb")
         log.debug(f"Loaded tokenizer for CLIP model '{self.model_name}'")
 
+        # models exported with a static batch size can only run batches of exactly that size
+        batch_size = session.get_inputs()[0].shape[0]
+        self.static_batch_size = isinstance(batch_size, int)
+        if isinstance(batch_size, int):
+            self.batch_size = batch_size
+        else:
+            max_batch_size = settings.max_batch_size.clip_textual if settings.max_batch_size is not None else None
+            self.batch_size = max_batch_size or 32
+
         return session
 
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        inputs: list[tuple[Any, ...]] = [("a photo",)]
+        if all_batch_sizes and self.batch_size > 1:
+            inputs.append((["a photo"] * self.batch_size,))
+        return inputs
+
     @abstractmethod
     def _load_tokenizer(self) -> Tokenizer:
         pass
@@ -43,6 +96,10 @@ class BaseCLIPTextualEncoder(InferenceModel):
     def tokenize(self, text: str, language: str | None = None) -> dict[str, NDArray[np.int32]]:
         pass
 
+    @abstractmethod
+    def tokenize_batch(self, texts: list[str], language: str | None = None) -> dict[str, NDArray[np.int32]]:
+        """Tokenizes all texts in one call, which the tokenizer parallelizes, padding them to the context length."""
+
     @property
     def model_cfg_path(self) -> Path:
         return self.cache_dir / "config.json"
@@ -96,6 +153,14 @@ class OpenClipTextualEncoder(BaseCLIPTextualEncoder):
         return tokenizer
 
     def tokenize(self, text: str, language: str | None = None) -> dict[str, NDArray[np.int32]]:
+        tokens: Encoding = self.tokenizer.encode(self.prepare_text(text, language))
+        return {"text": np.array([tokens.ids], dtype=np.int32)}
+
+    def tokenize_batch(self, texts: list[str], language: str | None = None) -> dict[str, NDArray[np.int32]]:
+        encodings: list[Encoding] = self.tokenizer.encode_batch([self.prepare_text(text, language) for text in texts])
+        return {"text": np.array([tokens.ids for tokens in encodings], dtype=np.int32)}
+
+    def prepare_text(self, text: str, language: str | None = None) -> str:
         text = clean_text(text, canonicalize=self.canonicalize)
         if self.is_nllb and language is not None:
             flores_code = WEBLATE_TO_FLORES200.get(language)
@@ -106,8 +171,7 @@ class OpenClipTextualEncoder(BaseCLIPTextualEncoder):
                     log.warning(f"Language '{language}' not found, defaulting to 'en'")
                     flores_code = "eng_Latn"
             text = f"{flores_code}{text}"
-        tokens: Encoding = self.tokenizer.encode(text)
-        return {"text": np.array([tokens.ids], dtype=np.int32)}
+        return text
 
 
 class MClipTextualEncoder(OpenClipTextualEncoder):
@@ -118,3 +182,11 @@ class MClipTextualEncoder(OpenClipTextualEncoder):
             "input_ids": np.array([tokens.ids], dtype=np.int32),
             "attention_mask": np.array([tokens.attention_mask], dtype=np.int32),
         }
+
+    def tokenize_batch(self, texts: list[str], language: str | None = None) -> dict[str, NDArray[np.int32]]:
+        texts = [clean_text(text, canonicalize=self.canonicalize) for text in texts]
+        encodings: list[Encoding] = self.tokenizer.encode_batch(texts)
+        return {
+            "input_ids": np.array([tokens.ids for tokens in encodings], dtype=np.int32),
+            "attention_mask": np.array([tokens.attention_mask for tokens in encodings], dtype=np.int32),
+        }
@@ -10,26 +10,34 @@ from PIL import Image
 
 from immich_ml.config import log
 from immich_ml.models.base import InferenceModel
+from immich_ml.models.embedding import pack_embeddings, parse_output, serialize_embeddings
 from immich_ml.models.transforms import (
     crop_pil,
     decode_pil,
     get_pil_resampling,
     normalize,
     resize_pil,
-    serialize_np_array,
     to_numpy,
 )
-from immich_ml.schemas import ModelSession, ModelTask, ModelType
+from immich_ml.schemas import ModelSession, ModelTask, ModelType, QuantizedEmbedding
 
 
 class BaseCLIPVisualEncoder(InferenceModel):
     depends = []
     identity = (ModelType.VISUAL, ModelTask.SEARCH)
+    output_options = ("output",)
 
-    def _predict(self, inputs: Image.Image | bytes) -> str:
+    def _predict(self, inputs: Image.Image | bytes) -> NDArray[np.float32]:
         image = decode_pil(inputs)
-        res: NDArray[np.float32] = self.session.run(None, self.transform(image))[0][0]
-        return serialize_np_array(res)
+        res: NDArray[np.float32] = self.session.run(None, self.transform(image))[0]
+        return res[0]
+
+    def serialize(
+        self, result: NDArray[np.float32], packed: bool = False, output: dict[str, Any] | None = None
+    ) -> str | QuantizedEmbedding | NDArray[np.float32]:
+        if packed:
+            return pack_embeddings(result[None], self.model_name, parse_output(output))[0]
+        return serialize_embeddings(result[None], self.model_name, parse_output(output))[0]
 
     @abstractmethod
     def transform(self, image: Image.Image) -> dict[str, NDArray[np.float32]]:
@@ -75,3 +83,6 @@ class OpenClipVisualEncoder(BaseCLIPVisualEncoder):
         image_np = to_numpy(image)
         image_np = normalize(image_np, self.mean, self.std)
         return {"image": np.expand_dims(image_np.transpose(2, 0, 1), 0)}
+
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        return [(Image.new("RGB", (self.size, self.size)),)]
@@ -0,0 +1,134 @@
+import hashlib
+import shutil
+import urllib.error
+import urllib.request
+from fnmatch import fnmatch
+from pathlib import Path
+
+from ..config import log, settings
+
+_CHUNK_SIZE = 2**20
+# where `snapshot_download` records the commit and etag of each file it downloads to a local dir
+_HF_METADATA_DIR = Path(".cache") / "huggingface" / "download"
+_MANIFEST_NAME = "sha256sums"
+
+
+def is_url(mirror: str) -> bool:
+    return mirror.startswith(("http://", "https://"))
+
+
+def copy_from_mirror(source: Path, local_dir: Path, ignore_patterns: list[str]) -> None:
+    """
+    Copies a model repository from a local mirror, laid out like `huggingface-cli download --local-dir`.
+
+    The repository must have a `sha256sums` file in the format of `sha256sum`, and every copied file is checked against
+    it, so a mirror without one or with a file missing from it is rejected.
+    """
+    if not source.is_dir():
+        raise FileNotFoundError(f"Model not found in mirror: {source}")
+    checksums = read_checksums(source / _MANIFEST_NAME)
+    log.info(f"Copying model from mirror {source}")
+    for path in source.rglob("*"):
+        relative = path.relative_to(source)
+        name = relative.as_posix()
+        if (
+            path.is_dir()
+            or name == _MANIFEST_NAME
+            or relative.is_relative_to(_HF_METADATA_DIR.parent)
+            or any(fnmatch(name, pattern) for pattern in ignore_patterns)
+        ):
+            continue
+        if name not in checksums:
+            raise OSError(f"No checksum for {path} in {source / _MANIFEST_NAME}")
+        target = local_dir / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target)
+        if (digest := file_sha256(target)) != checksums[name]:
+            target.unlink()
+            raise OSError(f"Checksum mismatch for {path}: expected {checksums[name]}, got {digest}")
+
+
+def read_checksums(manifest: Path) -> dict[str, str]:
+    """Reads the output of `sha256sum`, with a line of `<digest>  <path>` per file."""
+    try:
+        lines = manifest.read_text().splitlines()
+    except FileNotFoundError:
+        raise OSError(f"Model mirror has no checksums to verify against: {manifest}")
+    checksums = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        digest, _, name = line.partition(" ")
+        # binary mode marks the path with `*`, and `find . -exec sha256sum` prefixes it with `./`
+        name = name.lstrip(" *").removeprefix("./")
+        checksums[name] = digest.lower()
+    return checksums
+
+
+def verify_checksums(local_dir: Path) -> None:
+    """
+    Checks downloaded files against the etags Hugging Face reports for them, removing any that don't match.
+
+    The etag is the SHA-256 of files stored with Git LFS (i.e. model weights) and the Git blob hash otherwise.
+    """
+    for metadata_path in (local_dir / _HF_METADATA_DIR).rglob("*.metadata"):
+        path = local_dir / metadata_path.relative_to(local_dir / _HF_METADATA_DIR).with_suffix("")
+        lines = metadata_path.read_text().splitlines()
+        if not path.is_file() or len(lines) < 2:
+            continue
+        etag = lines[1].strip().strip('"')
+        digest = file_sha256(path) if len(etag) == 64 else git_blob_sha1(path)
+        if digest != etag:
+            path.unlink()
+            metadata_path.unlink()
+            raise OSError(f"Checksum mismatch for {path}: expected {etag}, got {digest}")
+
+
+def download_file(url: str, path: Path, sha256: str | None = None) -> None:
+    """
+    Downloads a single file, resuming a previous partial download if one exists, and verifies its SHA-256.
+
+    If a mirror is configured, the file is taken from it instead, by file name.
+    """
+    name = url.rsplit("/", 1)[-1]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.incomplete")
+    if settings.model_mirror is not None and not is_url(settings.model_mirror):
+        shutil.copyfile(Path(settings.model_mirror) / name, partial)
+    else:
+        if settings.model_mirror is not None:
+            url = f"{settings.model_mirror.rstrip('/')}/{name}"
+        _download_to(url, partial)
+
+    if sha256 is not None and (digest := file_sha256(partial)) != sha256:
+        partial.unlink()
+        raise OSError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+    partial.replace(path)
+
+
+def _download_to(url: str, partial: Path) -> None:
+    offset = partial.stat().st_size if partial.is_file() else 0
+    request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+    log.info(f"Downloading {url}" + (f", resuming from {offset} bytes" if offset else ""))
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            # servers that don't support ranges send the whole file
+            with partial.open("ab" if response.status == 206 else "wb") as f:
+                while chunk := response.read(_CHUNK_SIZE):
+                    f.write(chunk)
+    except urllib.error.HTTPError as e:
+        if e.code != 416:  # the partial file is already complete
+            raise
+
+
+def file_sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def git_blob_sha1(path: Path) -> str:
+    digest = hashlib.sha1(f"blob {path.stat().st_size}\0".encode())
+    with path.open("rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,135 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel, Field, ValidationError
+
+from immich_ml.config import is_valid_name, settings
+from immich_ml.models.transforms import serialize_np_array
+from immich_ml.schemas import QuantizedEmbedding
+
+
+class EmbeddingOutput(BaseModel):
+    """Transforms applied to the embeddings of a request, to make them cheaper to store and search."""
+
+    # only for Matryoshka models, whose leading dimensions are trained to work as an embedding on their own
+    dimensions: int | None = Field(default=None, gt=0)
+    # name of a PCA projection in the `projections` folder of the cache folder
+    projection: str | None = None
+    # int8 embeddings are scaled to fill the range, and returned along with the scale to multiply them by
+    dtype: Literal["float32", "float16", "int8"] = "float32"
+
+
+class InvalidOutputError(ValueError):
+    pass
+
+
+def parse_output(options: dict[str, Any] | None) -> EmbeddingOutput | None:
+    try:
+        return EmbeddingOutput.model_validate(options) if options else None
+    except ValidationError as e:
+        raise InvalidOutputError(f"Invalid output options: {e}")
+
+
+def is_matryoshka(model_name: str) -> bool:
+    return model_name.endswith("__mrl")
+
+
+def transform(
+    embeddings: NDArray[np.float32], model_name: str, output: EmbeddingOutput
+) -> tuple[NDArray[np.float32] | NDArray[np.float16] | NDArray[np.int8], NDArray[np.float32] | None]:
+    """
+    Reduces and casts a batch of embeddings as requested, returning them along with the scale of each int8 embedding.
+
+    Embeddings are normalized again after reducing their dimensions, so they can still be compared by inner product.
+    """
+    if output.dimensions is not None and output.projection is not None:
+        raise InvalidOutputError("Only one of dimensions and projection can be set")
+
+    if output.dimensions is not None:
+        if not is_matryoshka(model_name):
+            raise InvalidOutputError(f"Model '{model_name}' doesn't support truncation, use a projection instead")
+        if output.dimensions > embeddings.shape[-1]:
+            raise InvalidOutputError(f"Model '{model_name}' only has {embeddings.shape[-1]} dimensions")
+        embeddings = normalize(embeddings[:, : output.dimensions])
+    elif output.projection is not None:
+        mean, components = load_projection(output.projection)
+        if components.shape[1] != embeddings.shape[-1]:
+            raise InvalidOutputError(
+                f"Projection '{output.projection}' expects {components.shape[1]} dimensions, "
+                f"but model '{model_name}' has {embeddings.shape[-1]}"
+            )
+        embeddings = normalize(np.asarray((embeddings - mean) @ components.T, dtype=np.float32))
+
+    match output.dtype:
+        case "float16":
+            return embeddings.astype(np.float16), None
+        case "int8":
+            scales = np.abs(embeddings).max(axis=-1) / 127
+            scales[scales == 0] = 1
+            quantized = np.rint(embeddings / scales[:, None]).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+        case _:
+            return embeddings, None
+
+
+def serialize_embeddings(
+    embeddings: NDArray[np.float32], model_name: str, output: EmbeddingOutput | None
+) -> list[str | QuantizedEmbedding]:
+    """Serializes a batch of embeddings, with their scales if they're quantized."""
+    if output is None:
+        return [serialize_np_array(embedding) for embedding in embeddings]
+    transformed, scales = transform(embeddings, model_name, output)
+    if scales is None:
+        return [serialize_np_array(embedding) for embedding in transformed]
+    return [
+        QuantizedEmbedding(embedding=serialize_np_array(embedding), scale=float(scale))
+        for embedding, scale in zip(transformed, scales)
+    ]
+
+
+def pack_embeddings(
+    embeddings: NDArray[np.float32], model_name: str, output: EmbeddingOutput | None
+) -> NDArray[np.float32]:
+    """Reduces a batch of embeddings as requested, keeping them as float32 for callers that send them as bytes."""
+    if output is None:
+        return embeddings
+    if output.dtype != "float32":
+        raise InvalidOutputError(f"Output dtype '{output.dtype}' can't be packed as float32")
+    transformed, _ = transform(embeddings, model_name, output)
+    return transformed.astype(np.float32, copy=False)
+
+
+def normalize(embeddings: NDArray[np.float32]) -> NDArray[np.float32]:
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    normalized: NDArray[np.float32] = embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+    return normalized
+
+
+def projection_path(name: str) -> Path:
+    if not is_valid_name(name):
+        raise InvalidOutputError(f"Invalid projection name '{name}'")
+    return settings.cache_folder / "projections" / f"{name}.npz"
+
+
+def load_projection(name: str) -> tuple[NDArray[np.float32], NDArray[np.float32]]:
+    """
+    Loads a projection saved with `np.savez(path, components=...)`, where `components` has a row per output dimension,
+    along with an optional `mean` to subtract first, like sklearn's `PCA.components_` and `PCA.mean_`.
+    """
+    path = projection_path(name)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise InvalidOutputError(f"Projection '{name}' not found in {path.parent}")
+    return _load_projection(path, mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_projection(path: Path, mtime_ns: int) -> tuple[NDArray[np.float32], NDArray[np.float32]]:
+    with np.load(path) as data:
+        components = data["components"].astype(np.float32)
+        mean = data["mean"].astype(np.float32) if "mean" in data else np.zeros(components.shape[1], dtype=np.float32)
+    return mean, components
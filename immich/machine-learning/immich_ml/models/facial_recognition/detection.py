@@ -37,5 +37,8 @@ class FaceDetector(InferenceModel):
     def _detect(self, inputs: NDArray[np.uint8] | bytes) -> tuple[NDArray[np.float32], NDArray[np.float32]]:
         return self.model.detect(inputs)  # type: ignore
 
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        return [(np.zeros((640, 640, 3), dtype=np.uint8),)]
+
     def configure(self, **kwargs: Any) -> None:
         self.model.det_thresh = kwargs.pop("minScore", self.model.det_thresh)
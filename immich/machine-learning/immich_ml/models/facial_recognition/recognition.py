@@ -5,15 +5,17 @@ import numpy as np
 import onnx
 import onnxruntime as ort
 from insightface.model_zoo import ArcFaceONNX
-from insightface.utils.face_align import norm_crop
+from insightface.utils.face_align import arcface_dst, norm_crop
 from numpy.typing import NDArray
 from onnx.tools.update_model_dims import update_inputs_outputs_dims
 from PIL import Image
 
 from immich_ml.config import log, settings
 from immich_ml.models.base import InferenceModel
-from immich_ml.models.transforms import decode_cv2, serialize_np_array
+from immich_ml.models.embedding import EmbeddingOutput, pack_embeddings, parse_output, serialize_embeddings
+from immich_ml.models.transforms import decode_cv2
 from immich_ml.schemas import (
+    BoundingBox,
     FaceDetectionOutput,
     FacialRecognitionOutput,
     ModelFormat,
@@ -21,19 +23,23 @@ from immich_ml.schemas import (
     ModelTask,
     ModelType,
 )
+from immich_ml.sessions.batch import BatchedSession
 
 
 class FaceRecognizer(InferenceModel):
     depends = [(ModelType.DETECTION, ModelTask.FACIAL_RECOGNITION)]
     identity = (ModelType.RECOGNITION, ModelTask.FACIAL_RECOGNITION)
+    output_options = ("output",)
 
     def __init__(self, model_name: str, **model_kwargs: Any) -> None:
         super().__init__(model_name, **model_kwargs)
-        max_batch_size = settings.max_batch_size and settings.max_batch_size.facial_recognition
-        self.batch_size = max_batch_size if max_batch_size else self._batch_size_default
+        self.max_batch_size = settings.max_batch_size and settings.max_batch_size.facial_recognition
+        self.batch_size = self.max_batch_size if self.max_batch_size else self._batch_size_default
 
     def _load(self) -> ModelSession:
         session = self._make_session(self.model_path)
+        if isinstance(session, BatchedSession) and not self.max_batch_size:
+            self.batch_size = None  # the session splits and pads faces to fit its compiled batch sizes
         if (not self.batch_size or self.batch_size > 1) and str(session.get_inputs()[0].shape[0]) != "batch":
             self._add_batch_axis(self.model_path)
             session = self._make_session(self.model_path)
@@ -45,13 +51,24 @@ class FaceRecognizer(InferenceModel):
 
     def _predict(
         self, inputs: NDArray[np.uint8] | bytes | Image.Image, faces: FaceDetectionOutput
-    ) -> FacialRecognitionOutput:
+    ) -> tuple[FaceDetectionOutput, NDArray[np.float32]]:
+        """Returns the detected faces along with an embedding per face."""
         if faces["boxes"].shape[0] == 0:
-            return []
+            return faces, np.empty((0, 0), dtype=np.float32)
         inputs = decode_cv2(inputs)
         cropped_faces = self._crop(inputs, faces)
-        embeddings = self._predict_batch(cropped_faces)
-        return self.postprocess(faces, embeddings)
+        return faces, self._predict_batch(cropped_faces)
+
+    def serialize(
+        self,
+        result: tuple[FaceDetectionOutput, NDArray[np.float32]],
+        packed: bool = False,
+        output: dict[str, Any] | None = None,
+    ) -> FacialRecognitionOutput:
+        faces, embeddings = result
+        if faces["boxes"].shape[0] == 0:
+            return []
+        return self.postprocess(faces, embeddings, parse_output(output), packed)
 
     def _predict_batch(self, cropped_faces: list[NDArray[np.uint8]]) -> NDArray[np.float32]:
         if not self.batch_size or len(cropped_faces) <= self.batch_size:
@@ -63,19 +80,58 @@ class FaceRecognizer(InferenceModel):
             batch_embeddings.append(self.model.get_feat(cropped_faces[i : i + self.batch_size]))
         return np.concatenate(batch_embeddings, axis=0)
 
-    def postprocess(self, faces: FaceDetectionOutput, embeddings: NDArray[np.float32]) -> FacialRecognitionOutput:
-        return [
-            {
-                "boundingBox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
-                "embedding": serialize_np_array(embedding),
-                "score": score,
-            }
-            for (x1, y1, x2, y2), embedding, score in zip(faces["boxes"], embeddings, faces["scores"])
-        ]
+    def postprocess(
+        self,
+        faces: FaceDetectionOutput,
+        embeddings: NDArray[np.float32],
+        output: EmbeddingOutput | None = None,
+        packed: bool = False,
+    ) -> FacialRecognitionOutput:
+        serialized = (
+            list(pack_embeddings(embeddings, self.model_name, output))
+            if packed
+            else serialize_embeddings(embeddings, self.model_name, output)
+        )
+        results: FacialRecognitionOutput = []
+        for (x1, y1, x2, y2), embedding, score in zip(faces["boxes"], serialized, faces["scores"]):
+            box: BoundingBox = {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+            if isinstance(embedding, dict):
+                results.append(
+                    {
+                        "boundingBox": box,
+                        "embedding": embedding["embedding"],
+                        "score": score,
+                        "scale": embedding["scale"],
+                    }
+                )
+            else:
+                results.append({"boundingBox": box, "embedding": embedding, "score": score})
+        return results
 
     def _crop(self, image: NDArray[np.uint8], faces: FaceDetectionOutput) -> list[NDArray[np.uint8]]:
         return [norm_crop(image, landmark) for landmark in faces["landmarks"]]
 
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        if not all_batch_sizes:
+            batch_sizes = [1]
+        elif isinstance(self.session, BatchedSession):
+            batch_sizes = self.session.batch_sizes
+        else:
+            batch_sizes = list(range(1, (self.batch_size or 1) + 1))
+        # landmarks at the reference positions make each crop the whole blank image
+        image = np.zeros((112, 112, 3), dtype=np.uint8)
+        return [
+            (
+                image,
+                {
+                    "boxes": np.zeros((batch_size, 4), dtype=np.float32),
+                    "scores": np.ones(batch_size, dtype=np.float32),
+                    "landmarks": np.tile(arcface_dst, (batch_size, 1, 1)),
+                },
+            )
+            for batch_size in batch_sizes
+        ]
+
     def _add_batch_axis(self, model_path: Path) -> None:
         log.debug(f"Adding batch axis to model {model_path}")
         proto = onnx.load(model_path)
@@ -6,12 +6,11 @@ from numpy.typing import NDArray
 from PIL import Image
 from rapidocr.ch_ppocr_det.utils import DBPostProcess
 from rapidocr.inference_engine.base import FileInfo, InferSession
-from rapidocr.utils.download_file import DownloadFile, DownloadFileInput
 from rapidocr.utils.typings import EngineType, LangDet, OCRVersion, TaskType
 from rapidocr.utils.typings import ModelType as RapidModelType
 
-from immich_ml.config import log
 from immich_ml.models.base import InferenceModel
+from immich_ml.models.download import download_file
 from immich_ml.schemas import ModelFormat, ModelSession, ModelTask, ModelType
 from immich_ml.sessions.ort import OrtSession
 
@@ -50,13 +49,7 @@ class TextDetector(InferenceModel):
                 model_type=RapidModelType.MOBILE if "mobile" in self.model_name else RapidModelType.SERVER,
             )
         )
-        download_params = DownloadFileInput(
-            file_url=model_info["model_dir"],
-            sha256=model_info["SHA256"],
-            save_path=self.model_path,
-            logger=log,
-        )
-        DownloadFile.run(download_params)
+        download_file(model_info["model_dir"], self.model_path, model_info["SHA256"])
 
     def _load(self) -> ModelSession:
         # TODO: support other runtime sessions
@@ -116,6 +109,9 @@ class TextDetector(InferenceModel):
         sorted_boxes: NDArray[np.float32] = dt_boxes[y_order[final_order]]
         return sorted_boxes
 
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        return [(Image.new("RGB", (self.max_resolution, self.max_resolution)),)]
+
     def configure(self, **kwargs: Any) -> None:
         if (max_resolution := kwargs.get("maxResolution")) is not None:
             self.max_resolution = max_resolution
@@ -6,13 +6,14 @@ from PIL import Image
 from rapidocr.ch_ppocr_rec import TextRecInput
 from rapidocr.ch_ppocr_rec import TextRecognizer as RapidTextRecognizer
 from rapidocr.inference_engine.base import FileInfo, InferSession
-from rapidocr.utils.download_file import DownloadFile, DownloadFileInput
 from rapidocr.utils.typings import EngineType, LangRec, OCRVersion, TaskType
 from rapidocr.utils.typings import ModelType as RapidModelType
 from rapidocr.utils.vis_res import VisRes
 
-from immich_ml.config import log, settings
+from immich_ml import timing
+from immich_ml.config import settings
 from immich_ml.models.base import InferenceModel
+from immich_ml.models.download import download_file
 from immich_ml.models.transforms import pil_to_cv2
 from immich_ml.schemas import ModelFormat, ModelSession, ModelTask, ModelType
 from immich_ml.sessions.ort import OrtSession
@@ -46,13 +47,7 @@ class TextRecognizer(InferenceModel):
                 model_type=RapidModelType.MOBILE if "mobile" in self.model_name else RapidModelType.SERVER,
             )
         )
-        download_params = DownloadFileInput(
-            file_url=model_info["model_dir"],
-            sha256=model_info["SHA256"],
-            save_path=self.model_path,
-            logger=log,
-        )
-        DownloadFile.run(download_params)
+        download_file(model_info["model_dir"], self.model_path, model_info["SHA256"])
 
     def _load(self) -> ModelSession:
         # TODO: support other runtimes
@@ -72,7 +67,10 @@ class TextRecognizer(InferenceModel):
         boxes, box_scores = texts["boxes"], texts["scores"]
         if boxes.shape[0] == 0:
             return self._empty
-        rec = self.model(TextRecInput(img=self.get_crop_img_list(img, boxes)))
+        crops = self.get_crop_img_list(img, boxes)
+        # RapidOCR runs the ORT session itself, so its own pre- and postprocessing count as inference
+        with timing.inference():
+            rec = self.model(TextRecInput(img=crops))
         if rec.txts is None:
             return self._empty
 
@@ -150,5 +148,16 @@ class TextRecognizer(InferenceModel):
             [H[:, 0, 0], H[:, 0, 1], H[:, 0, 2], H[:, 1, 0], H[:, 1, 1], H[:, 1, 2], H[:, 2, 0], H[:, 2, 1]]
         )  # pyright: ignore[reportReturnType]
 
+    def _warmup_inputs(self, all_batch_sizes: bool = False) -> list[tuple[Any, ...]]:
+        batch_sizes = range(1, self.model.rec_batch_num + 1) if all_batch_sizes else [1]
+        box = np.array([[0, 0], [320, 0], [320, 48], [0, 48]], dtype=np.float32)
+        return [
+            (
+                Image.new("RGB", (320, 48)),
+                {"boxes": np.tile(box, (batch_size, 1, 1)), "scores": np.ones(batch_size, dtype=np.float32)},
+            )
+            for batch_size in batch_sizes
+        ]
+
     def configure(self, **kwargs: Any) -> None:
         self.min_score = kwargs.get("minScore", self.min_score)
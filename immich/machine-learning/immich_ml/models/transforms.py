@@ -57,6 +57,19 @@ def decode_pil(image_bytes: bytes | IO[bytes] | Image.Image) -> Image.Image:
     return image
 
 
+def decode_raw(image_bytes: bytes | IO[bytes], width: int, height: int, stride: int | None = None) -> Image.Image:
+    """Wraps packed RGB pixels (e.g. from libvips) without decoding. `stride` is the size of each row in bytes."""
+    buffer = image_bytes if isinstance(image_bytes, bytes) else image_bytes.read()
+    stride = stride or width * 3
+    if width <= 0 or height <= 0 or stride < width * 3:
+        raise ValueError(f"Invalid raw image dimensions: {width}x{height} with stride {stride}")
+    if len(buffer) < stride * (height - 1) + width * 3:
+        raise ValueError(f"Raw image of {len(buffer)} bytes is too small for {width}x{height} with stride {stride}")
+    pixels = np.frombuffer(buffer, dtype=np.uint8, count=stride * (height - 1) + width * 3)
+    rows = np.lib.stride_tricks.as_strided(pixels, (height, width, 3), (stride, 3, 1), writeable=False)
+    return Image.fromarray(rows)
+
+
 def decode_cv2(image_bytes: NDArray[np.uint8] | bytes | Image.Image) -> NDArray[np.uint8]:
     match image_bytes:
         case bytes() | memoryview() | bytearray():
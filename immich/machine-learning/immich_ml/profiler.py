@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import TYPE_CHECKING, Any, Mapping, NamedTuple
+
+from .sessions.multi_device import DeviceBalancedSession
+from .sessions.ort import OrtSession
+
+if TYPE_CHECKING:
+    from .models.base import InferenceModel
+    from .schemas import ModelSession
+
+_PACKAGE_DIR = Path(__file__).parent.as_posix()
+# the request pool's worker loop is part of the package, but only waits for work
+_SCHEDULER_FILE = Path(__file__).with_name("scheduler.py").as_posix()
+_PYTHON_PID = 0
+
+
+class Frame(NamedTuple):
+    name: str
+    file: str
+    line: int
+
+
+class Sample(NamedTuple):
+    start_ns: int
+    end_ns: int
+    thread_id: int
+    thread_name: str
+    stack: tuple[Frame, ...]  # outermost call first
+
+
+class Profiler:
+    """
+    Samples the Python stacks of threads running this service's code, like py-spy but in-process, while ONNX Runtime
+    profiles the given models. Both are combined into one trace, so preprocessing shows up next to operator timings.
+
+    Models that don't run on ONNX Runtime only show up in the Python samples.
+    """
+
+    def __init__(self, models: Mapping[str, InferenceModel], interval_s: float) -> None:
+        self.models = models
+        self.interval_s = interval_s
+        self.samples: list[Sample] = []
+        self.sessions: list[tuple[str, OrtSession]] = []
+        self.ort_events: list[tuple[str, int, list[dict[str, Any]]]] = []
+        self.start_ns = 0
+        self.end_ns = 0
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self.start_ns = time.time_ns()  # ORT reports the start of profiling on the same clock
+        file_prefix = Path(tempfile.gettempdir()) / f"immich_ml_profile_{os.getpid()}"
+        for key, model in self.models.items():
+            for session in get_ort_sessions(model.session):
+                session.start_profiling(file_prefix)
+                self.sessions.append((key, session))
+        self.sampler.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.sampler.join()
+        self.end_ns = time.time_ns()
+        for key, session in self.sessions:
+            start_ns, events = session.end_profiling()
+            self.ort_events.append((key, start_ns, events))
+
+    def _sample(self) -> None:
+        last = time.time_ns()
+        while not self.stopped.wait(self.interval_s):
+            now = time.time_ns()
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                thread = threads.get(ident)
+                # idle threads are left out, as they aren't running any of this service's code
+                if thread is None or thread is self.sampler or (stack := get_stack(frame)) is None:
+                    continue
+                self.samples.append(Sample(last, now, thread.native_id or ident, thread.name, stack))
+            last = now
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """Python calls as nested spans per thread, followed by a process per ORT session with its events."""
+        events: list[dict[str, Any]] = [process_name(_PYTHON_PID, "Python")]
+        stacks: dict[int, tuple[tuple[Frame, ...], int]] = {}
+
+        def span(phase: str, frame: Frame, thread_id: int, ns: int) -> dict[str, Any]:
+            event = {"name": frame.name, "ph": phase, "pid": _PYTHON_PID, "tid": thread_id, "ts": self.to_us(ns)}
+            if phase == "B":
+                event["args"] = {"file": frame.file, "line": frame.line}
+            return event
+
+        def close(thread_id: int, depth: int) -> None:
+            stack, end_ns = stacks[thread_id]
+            events.extend(span("E", frame, thread_id, end_ns) for frame in reversed(stack[depth:]))
+
+        for sample in self.samples:
+            if sample.thread_id not in stacks:
+                events.append(thread_name(_PYTHON_PID, sample.thread_id, sample.thread_name))
+                stacks[sample.thread_id] = ((), sample.start_ns)
+            stack, end_ns = stacks[sample.thread_id]
+            # calls that were still on the stack in the previous sample are assumed to have continued in between
+            shared = common_depth(stack, sample.stack) if end_ns == sample.start_ns else 0
+            close(sample.thread_id, shared)
+            events.extend(span("B", frame, sample.thread_id, sample.start_ns) for frame in sample.stack[shared:])
+            stacks[sample.thread_id] = (sample.stack, sample.end_ns)
+        for thread_id in stacks:
+            close(thread_id, 0)
+
+        for pid, (key, start_ns, ort_events) in enumerate(self.ort_events, _PYTHON_PID + 1):
+            events.append(process_name(pid, f"ONNX Runtime: {key}"))
+            offset_us = self.to_us(start_ns)
+            events.extend(event | {"pid": pid, "ts": event["ts"] + offset_us} for event in ort_events)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_speedscope(self) -> dict[str, Any]:
+        """A sampled profile per Python thread and an evented profile per ORT session and thread."""
+        frames: list[dict[str, Any]] = []
+        frame_ids: dict[Frame, int] = {}
+
+        def frame_id(frame: Frame) -> int:
+            if frame not in frame_ids:
+                frame_ids[frame] = len(frames)
+                frames.append({"name": frame.name, "file": frame.file, "line": frame.line})
+            return frame_ids[frame]
+
+        profiles: dict[str, dict[str, Any]] = {}
+        for sample in self.samples:
+            name = f"{sample.thread_name} ({sample.thread_id})"
+            profile = profiles.setdefault(
+                name, self._speedscope_profile("sampled", name) | {"samples": [], "weights": []}
+            )
+            profile["samples"].append([frame_id(frame) for frame in sample.stack])
+            profile["weights"].append(sample.end_ns - sample.start_ns)
+
+        for key, start_ns, ort_events in self.ort_events:
+            by_thread: dict[int, list[dict[str, Any]]] = {}
+            for event in ort_events:
+                if event.get("ph") == "X":
+                    by_thread.setdefault(event["tid"], []).append(event)
+            for thread_id, thread_events in by_thread.items():
+                name = f"ONNX Runtime: {key} ({thread_id})"
+                profile = profiles[name] = self._speedscope_profile("evented", name) | {"events": []}
+                for at, phase, frame in nest(thread_events, start_ns):
+                    profile["events"].append({"type": phase, "frame": frame_id(frame), "at": at - self.start_ns})
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+            "name": "Immich ML",
+            "exporter": "immich_ml",
+        }
+
+    def _speedscope_profile(self, type: str, name: str) -> dict[str, Any]:
+        return {
+            "type": type,
+            "name": name,
+            "unit": "nanoseconds",
+            "startValue": 0,
+            "endValue": self.end_ns - self.start_ns,
+        }
+
+    def to_us(self, ns: int) -> float:
+        return (ns - self.start_ns) / 1000
+
+
+def get_ort_sessions(session: ModelSession) -> list[OrtSession]:
+    if isinstance(session, OrtSession):
+        return [session]
+    if isinstance(session, DeviceBalancedSession):
+        return [device.session for device in session.devices.values() if isinstance(device.session, OrtSession)]
+    return []
+
+
+def get_stack(frame: FrameType | None) -> tuple[Frame, ...] | None:
+    stack: list[Frame] = []
+    in_package = False
+    while frame is not None:
+        code = frame.f_code
+        in_package |= code.co_filename.startswith(_PACKAGE_DIR) and code.co_filename != _SCHEDULER_FILE
+        stack.append(Frame(code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(stack)) if in_package else None
+
+
+def common_depth(a: tuple[Frame, ...], b: tuple[Frame, ...]) -> int:
+    depth = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        depth += 1
+    return depth
+
+
+def nest(events: list[dict[str, Any]], start_ns: int) -> list[tuple[int, str, Frame]]:
+    """
+    Turns spans into open and close events (ns since the epoch), clipping any that outlast their parent so they nest.
+    """
+    result: list[tuple[int, str, Frame]] = []
+    open_spans: list[tuple[int, Frame]] = []
+    for event in sorted(events, key=lambda event: (event["ts"], -event["dur"])):
+        start = start_ns + event["ts"] * 1000
+        while open_spans and open_spans[-1][0] <= start:
+            end, frame = open_spans.pop()
+            result.append((end, "C", frame))
+        end = start + event["dur"] * 1000
+        if open_spans:
+            end = min(end, open_spans[-1][0])
+        frame = Frame(event["name"], event.get("cat", ""), 0)
+        open_spans.append((end, frame))
+        result.append((start, "O", frame))
+    while open_spans:
+        end, frame = open_spans.pop()
+        result.append((end, "C", frame))
+    return result
+
+
+def process_name(pid: int, name: str) -> dict[str, Any]:
+    return {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+
+
+def thread_name(pid: int, thread_id: int, name: str) -> dict[str, Any]:
+    return {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name}}
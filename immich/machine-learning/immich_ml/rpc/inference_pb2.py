@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: inference.proto
+# Protobuf Python Version: 6.31.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    1,
+    '',
+    'inference.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0finference.proto\x12\timmich_ml\"M\n\nModelEntry\x12\x0c\n\x04task\x18\x01 \x01(\t\x12\x0c\n\x04type\x18\x02 \x01(\t\x12\x12\n\nmodel_name\x18\x03 \x01(\t\x12\x0f\n\x07options\x18\x04 \x01(\t\"\xaf\x01\n\x0ePredictRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12&\n\x07\x65ntries\x18\x02 \x03(\x0b\x32\x15.immich_ml.ModelEntry\x12\x0f\n\x05image\x18\x03 \x01(\x0cH\x00\x12\x0e\n\x04text\x18\x04 \x01(\tH\x00\x12\r\n\x05width\x18\x05 \x01(\r\x12\x0e\n\x06height\x18\x06 \x01(\r\x12\x0e\n\x06stride\x18\x07 \x01(\r\x12\x10\n\x08priority\x18\x08 \x01(\tB\x07\n\x05input\"=\n\x0b\x42oundingBox\x12\n\n\x02x1\x18\x01 \x01(\x05\x12\n\n\x02y1\x18\x02 \x01(\x05\x12\n\n\x02x2\x18\x03 \x01(\x05\x12\n\n\x02y2\x18\x04 \x01(\x05\"V\n\x04\x46\x61\x63\x65\x12,\n\x0c\x62ounding_box\x18\x01 \x01(\x0b\x32\x16.immich_ml.BoundingBox\x12\x11\n\tembedding\x18\x02 \x01(\x0c\x12\r\n\x05score\x18\x03 \x01(\x02\"G\n\x03Ocr\x12\x0c\n\x04text\x18\x01 \x03(\t\x12\x0b\n\x03\x62ox\x18\x02 \x03(\x02\x12\x11\n\tbox_score\x18\x03 \x03(\x02\x12\x12\n\ntext_score\x18\x04 \x03(\x02\".\n\x0e\x43lassification\x12\r\n\x05label\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x02\"\x94\x02\n\x0fPredictResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\x04\x63lip\x18\x02 \x01(\x0cH\x00\x88\x01\x01\x12\x1e\n\x05\x66\x61\x63\x65s\x18\x03 \x03(\x0b\x32\x0f.immich_ml.Face\x12 \n\x03ocr\x18\x04 \x01(\x0b\x32\x0e.immich_ml.OcrH\x01\x88\x01\x01\x12\x14\n\x0cimage_height\x18\x05 \x01(\r\x12\x13\n\x0bimage_width\x18\x06 \x01(\r\x12\x12\n\x05\x65rror\x18\x07 \x01(\tH\x02\x88\x01\x01\x12\x13\n\x0bstatus_code\x18\x08 \x01(\r\x12\x31\n\x0e\x63lassification\x18\t \x03(\x0b\x32\x19.immich_ml.ClassificationB\x07\n\x05_clipB\x06\n\x04_ocrB\x08\n\x06_error2\x9f\x01\n\x0fMachineLearning\x12@\n\x07Predict\x12\x19.immich_ml.PredictRequest\x1a\x1a.immich_ml.PredictResponse\x12J\n\rPredictStream\x12\x19.immich_ml.PredictRequest\x1a\x1a.immich_ml.PredictResponse(\x01\x30\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'inference_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_MODELENTRY']._serialized_start=30
+  _globals['_MODELENTRY']._serialized_end=107
+  _globals['_PREDICTREQUEST']._serialized_start=110
+  _globals['_PREDICTREQUEST']._serialized_end=285
+  _globals['_BOUNDINGBOX']._serialized_start=287
+  _globals['_BOUNDINGBOX']._serialized_end=348
+  _globals['_FACE']._serialized_start=350
+  _globals['_FACE']._serialized_end=436
+  _globals['_OCR']._serialized_start=438
+  _globals['_OCR']._serialized_end=509
+  _globals['_CLASSIFICATION']._serialized_start=511
+  _globals['_CLASSIFICATION']._serialized_end=557
+  _globals['_PREDICTRESPONSE']._serialized_start=560
+  _globals['_PREDICTRESPONSE']._serialized_end=836
+  _globals['_MACHINELEARNING']._serialized_start=839
+  _globals['_MACHINELEARNING']._serialized_end=998
+# @@protoc_insertion_point(module_scope)
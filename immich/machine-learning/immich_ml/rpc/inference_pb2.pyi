@@ -0,0 +1,103 @@
+from google.protobuf.internal import containers as _containers
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import message as _message
+from collections.abc import Iterable as _Iterable, Mapping as _Mapping
+from typing import ClassVar as _ClassVar, Optional as _Optional, Union as _Union
+
+DESCRIPTOR: _descriptor.FileDescriptor
+
+class ModelEntry(_message.Message):
+    __slots__ = ("task", "type", "model_name", "options")
+    TASK_FIELD_NUMBER: _ClassVar[int]
+    TYPE_FIELD_NUMBER: _ClassVar[int]
+    MODEL_NAME_FIELD_NUMBER: _ClassVar[int]
+    OPTIONS_FIELD_NUMBER: _ClassVar[int]
+    task: str
+    type: str
+    model_name: str
+    options: str
+    def __init__(self, task: _Optional[str] = ..., type: _Optional[str] = ..., model_name: _Optional[str] = ..., options: _Optional[str] = ...) -> None: ...
+
+class PredictRequest(_message.Message):
+    __slots__ = ("id", "entries", "image", "text", "width", "height", "stride", "priority")
+    ID_FIELD_NUMBER: _ClassVar[int]
+    ENTRIES_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_FIELD_NUMBER: _ClassVar[int]
+    TEXT_FIELD_NUMBER: _ClassVar[int]
+    WIDTH_FIELD_NUMBER: _ClassVar[int]
+    HEIGHT_FIELD_NUMBER: _ClassVar[int]
+    STRIDE_FIELD_NUMBER: _ClassVar[int]
+    PRIORITY_FIELD_NUMBER: _ClassVar[int]
+    id: str
+    entries: _containers.RepeatedCompositeFieldContainer[ModelEntry]
+    image: bytes
+    text: str
+    width: int
+    height: int
+    stride: int
+    priority: str
+    def __init__(self, id: _Optional[str] = ..., entries: _Optional[_Iterable[_Union[ModelEntry, _Mapping]]] = ..., image: _Optional[bytes] = ..., text: _Optional[str] = ..., width: _Optional[int] = ..., height: _Optional[int] = ..., stride: _Optional[int] = ..., priority: _Optional[str] = ...) -> None: ...
+
+class BoundingBox(_message.Message):
+    __slots__ = ("x1", "y1", "x2", "y2")
+    X1_FIELD_NUMBER: _ClassVar[int]
+    Y1_FIELD_NUMBER: _ClassVar[int]
+    X2_FIELD_NUMBER: _ClassVar[int]
+    Y2_FIELD_NUMBER: _ClassVar[int]
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    def __init__(self, x1: _Optional[int] = ..., y1: _Optional[int] = ..., x2: _Optional[int] = ..., y2: _Optional[int] = ...) -> None: ...
+
+class Face(_message.Message):
+    __slots__ = ("bounding_box", "embedding", "score")
+    BOUNDING_BOX_FIELD_NUMBER: _ClassVar[int]
+    EMBEDDING_FIELD_NUMBER: _ClassVar[int]
+    SCORE_FIELD_NUMBER: _ClassVar[int]
+    bounding_box: BoundingBox
+    embedding: bytes
+    score: float
+    def __init__(self, bounding_box: _Optional[_Union[BoundingBox, _Mapping]] = ..., embedding: _Optional[bytes] = ..., score: _Optional[float] = ...) -> None: ...
+
+class Ocr(_message.Message):
+    __slots__ = ("text", "box", "box_score", "text_score")
+    TEXT_FIELD_NUMBER: _ClassVar[int]
+    BOX_FIELD_NUMBER: _ClassVar[int]
+    BOX_SCORE_FIELD_NUMBER: _ClassVar[int]
+    TEXT_SCORE_FIELD_NUMBER: _ClassVar[int]
+    text: _containers.RepeatedScalarFieldContainer[str]
+    box: _containers.RepeatedScalarFieldContainer[float]
+    box_score: _containers.RepeatedScalarFieldContainer[float]
+    text_score: _containers.RepeatedScalarFieldContainer[float]
+    def __init__(self, text: _Optional[_Iterable[str]] = ..., box: _Optional[_Iterable[float]] = ..., box_score: _Optional[_Iterable[float]] = ..., text_score: _Optional[_Iterable[float]] = ...) -> None: ...
+
+class Classification(_message.Message):
+    __slots__ = ("label", "score")
+    LABEL_FIELD_NUMBER: _ClassVar[int]
+    SCORE_FIELD_NUMBER: _ClassVar[int]
+    label: str
+    score: float
+    def __init__(self, label: _Optional[str] = ..., score: _Optional[float] = ...) -> None: ...
+
+class PredictResponse(_message.Message):
+    __slots__ = ("id", "clip", "faces", "ocr", "image_height", "image_width", "error", "status_code", "classification")
+    ID_FIELD_NUMBER: _ClassVar[int]
+    CLIP_FIELD_NUMBER: _ClassVar[int]
+    FACES_FIELD_NUMBER: _ClassVar[int]
+    OCR_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_HEIGHT_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_WIDTH_FIELD_NUMBER: _ClassVar[int]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    STATUS_CODE_FIELD_NUMBER: _ClassVar[int]
+    CLASSIFICATION_FIELD_NUMBER: _ClassVar[int]
+    id: str
+    clip: bytes
+    faces: _containers.RepeatedCompositeFieldContainer[Face]
+    ocr: Ocr
+    image_height: int
+    image_width: int
+    error: str
+    status_code: int
+    classification: _containers.RepeatedCompositeFieldContainer[Classification]
+    def __init__(self, id: _Optional[str] = ..., clip: _Optional[bytes] = ..., faces: _Optional[_Iterable[_Union[Face, _Mapping]]] = ..., ocr: _Optional[_Union[Ocr, _Mapping]] = ..., image_height: _Optional[int] = ..., image_width: _Optional[int] = ..., error: _Optional[str] = ..., status_code: _Optional[int] = ..., classification: _Optional[_Iterable[_Union[Classification, _Mapping]]] = ...) -> None: ...
@@ -0,0 +1,189 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, AsyncIterator
+
+import grpc
+import numpy as np
+import orjson
+from fastapi import HTTPException
+from numpy.typing import NDArray
+from pydantic import ValidationError
+
+from .. import main
+from ..config import log, settings
+from ..models.embedding import parse_output
+from ..scheduler import Priority, request_priority
+from ..schemas import InferenceEntries, InferenceResponse, ModelTask, ModelType, PipelineRequest
+from .inference_pb2 import DESCRIPTOR, BoundingBox, Classification, Face, Ocr, PredictRequest, PredictResponse
+
+SERVICE_NAME = DESCRIPTOR.services_by_name["MachineLearning"].full_name
+
+
+class MachineLearningServicer:
+    """
+    gRPC equivalent of `/predict`, sharing the same model cache, admission control and scheduler.
+
+    Failed requests are reported with `error` and `status_code` on the response instead of ending the stream.
+    """
+
+    async def Predict(self, request: PredictRequest, context: grpc.aio.ServicerContext[Any, Any]) -> PredictResponse:
+        return await predict(request)
+
+    async def PredictStream(
+        self, requests: AsyncIterator[PredictRequest], context: grpc.aio.ServicerContext[Any, Any]
+    ) -> AsyncIterator[PredictResponse]:
+        # requests are handled concurrently as they arrive, with each result sent as soon as it's ready
+        window = stream_window()
+        # a slot is taken before reading each request and freed once its response is sent, so a client sending
+        # faster than it's served is slowed down by HTTP/2 flow control instead of filling up memory
+        slots = asyncio.Semaphore(window)
+        results: asyncio.Queue[PredictResponse | None] = asyncio.Queue(window + 1)
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def handle(request: PredictRequest) -> None:
+            await results.put(await predict(request))
+
+        async def read() -> None:
+            try:
+                await slots.acquire()
+                async for request in requests:
+                    task = asyncio.create_task(handle(request))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    await slots.acquire()
+                await asyncio.gather(*tasks)
+            finally:
+                results.put_nowait(None)
+
+        reader = asyncio.create_task(read())
+        try:
+            while (response := await results.get()) is not None:
+                yield response
+                slots.release()
+            await reader
+        finally:
+            reader.cancel()
+            for task in tasks:
+                task.cancel()
+
+
+def stream_window() -> int:
+    """How many requests of a stream are read ahead of their responses being sent."""
+    if main.admission is not None:
+        return main.admission.max_in_flight + max(main.admission.max_queued, 0)
+    return max(settings.request_threads, 1)
+
+
+async def predict(request: PredictRequest) -> PredictResponse:
+    try:
+        with contextmanager(main.update_state)():
+            response = await run_inference(request)
+        return to_response(request.id, response)
+    except HTTPException as e:
+        return PredictResponse(id=request.id, error=str(e.detail), status_code=e.status_code)
+    except Exception as e:
+        log.exception(f"Failed to process request '{request.id}'", exc_info=e)
+        return PredictResponse(id=request.id, error="Internal server error", status_code=500)
+
+
+async def run_inference(request: PredictRequest) -> InferenceResponse:
+    entries = get_entries(request)
+    match request.WhichOneof("input"):
+        case "image":
+            request_priority.set(get_priority(request, Priority.BACKGROUND))
+            width, height = request.width or None, request.height or None
+            response, _ = await main.predict_image(
+                request.image, entries, width, height, request.stride or None, packed=True
+            )
+            return response
+        case "text":
+            request_priority.set(get_priority(request, Priority.INTERACTIVE))
+            return await main.run_inference(request.text, entries, packed=True)
+        case _:
+            raise HTTPException(400, "Either image or text must be provided")
+
+
+def get_priority(request: PredictRequest, default: Priority) -> Priority:
+    if not request.priority:
+        return default
+    try:
+        return Priority(request.priority)
+    except ValueError:
+        # the equivalent of INVALID_ARGUMENT, reported on the response so a stream isn't ended
+        raise HTTPException(400, f"Invalid priority '{request.priority}'")
+
+
+def get_entries(request: PredictRequest) -> InferenceEntries:
+    try:
+        pipeline: PipelineRequest = {}
+        for entry in request.entries:
+            options = orjson.loads(entry.options) if entry.options else {}
+            output = parse_output(options.get("output"))
+            if output is not None and output.dtype != "float32":
+                # embeddings are sent as packed float32, which has no room for other types or an int8 scale
+                raise HTTPException(400, f"Output dtype '{output.dtype}' is only supported over HTTP")
+            types = pipeline.setdefault(ModelTask(entry.task), {})
+            types[ModelType(entry.type)] = {"modelName": entry.model_name, "options": options}
+        return main.parse_entries(pipeline)
+    except (orjson.JSONDecodeError, ValidationError, ValueError, KeyError, AttributeError) as e:
+        log.error(f"Invalid request format: {e}")
+        raise HTTPException(422, "Invalid request format.")
+
+
+def to_response(id: str, response: InferenceResponse) -> PredictResponse:
+    message = PredictResponse(
+        id=id, image_height=response.get("imageHeight", 0), image_width=response.get("imageWidth", 0)
+    )
+    if ModelTask.SEARCH in response:
+        message.clip = to_bytes(response[ModelTask.SEARCH])
+    for face in response.get(ModelTask.FACIAL_RECOGNITION, []):
+        message.faces.append(
+            Face(
+                # the detector's coordinates are rounded float32s
+                bounding_box=BoundingBox(**{key: int(value) for key, value in face["boundingBox"].items()}),
+                embedding=to_bytes(face["embedding"]),
+                score=float(face["score"]),
+            )
+        )
+    for classification in response.get(ModelTask.CLASSIFICATION, []):
+        message.classification.append(Classification(label=classification["label"], score=classification["score"]))
+    if ModelTask.OCR in response:
+        ocr = response[ModelTask.OCR]
+        message.ocr.CopyFrom(
+            Ocr(
+                text=ocr["text"],
+                box=np.asarray(ocr["box"]).tolist(),
+                box_score=np.asarray(ocr["boxScore"]).tolist(),
+                text_score=np.asarray(ocr["textScore"]).tolist(),
+            )
+        )
+    return message
+
+
+def to_bytes(embedding: NDArray[np.float32]) -> bytes:
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+async def serve(address: str) -> grpc.aio.Server:
+    server = grpc.aio.server()
+    servicer = MachineLearningServicer()
+    handler = grpc.method_handlers_generic_handler(
+        SERVICE_NAME,
+        {
+            "Predict": grpc.unary_unary_rpc_method_handler(
+                servicer.Predict,
+                request_deserializer=PredictRequest.FromString,
+                response_serializer=PredictResponse.SerializeToString,
+            ),
+            "PredictStream": grpc.stream_stream_rpc_method_handler(
+                servicer.PredictStream,
+                request_deserializer=PredictRequest.FromString,
+                response_serializer=PredictResponse.SerializeToString,
+            ),
+        },
+    )
+    server.add_generic_rpc_handlers((handler,))
+    # workers share the port, with the kernel spreading connections between them
+    server.add_insecure_port(address)
+    await server.start()
+    return server
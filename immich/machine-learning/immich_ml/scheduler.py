@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from .schemas import StrEnum, T
+
+
+class Priority(StrEnum):
+    # in order of precedence
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+
+# set per request; read when work is submitted, which happens on the event loop in the request's context
+request_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.BACKGROUND)
+
+
+class _WorkItem:
+    def __init__(self, future: Future[Any], fn: Callable[..., Any], args: tuple[Any, ...], kwargs: dict[str, Any]):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self) -> None:
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class PriorityExecutor(Executor):
+    """
+    Thread pool that runs interactive work ahead of background work.
+
+    Shared workers always take the oldest interactive item before any background item. Reserved workers only take
+    interactive items, so a search request can start right away even when every shared worker is busy with a long
+    queue of image jobs.
+    """
+
+    def __init__(self, max_workers: int, reserved_workers: int = 0, thread_name_prefix: str = "") -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self.queues: dict[Priority, deque[_WorkItem]] = {priority: deque() for priority in Priority}
+        self.condition = threading.Condition()
+        self.is_shutdown = False
+        self.threads = [
+            threading.Thread(target=self._work, args=(tuple(Priority),), name=f"{thread_name_prefix}_{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        self.threads += [
+            threading.Thread(
+                target=self._work,
+                args=((Priority.INTERACTIVE,),),
+                name=f"{thread_name_prefix}_reserved_{i}",
+                daemon=True,
+            )
+            for i in range(reserved_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+        future: Future[T] = Future()
+        with self.condition:
+            if self.is_shutdown:
+                raise RuntimeError("Cannot schedule new work after shutdown")
+            self.queues[request_priority.get()].append(_WorkItem(future, fn, args, kwargs))
+            self.condition.notify_all()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self.condition:
+            self.is_shutdown = True
+            if cancel_futures:
+                for queue in self.queues.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def _work(self, priorities: tuple[Priority, ...]) -> None:
+        while True:
+            with self.condition:
+                while not (queue := next((self.queues[p] for p in priorities if self.queues[p]), None)):
+                    if self.is_shutdown:
+                        return
+                    self.condition.wait()
+                item = queue.popleft()
+            item.run()
@@ -3,7 +3,7 @@ from typing import Any, Literal, Protocol, TypeGuard, TypeVar
 
 import numpy as np
 import numpy.typing as npt
-from typing_extensions import TypedDict
+from typing_extensions import NotRequired, TypedDict
 
 
 class StrEnum(str, Enum):
@@ -24,6 +24,7 @@ class ModelTask(StrEnum):
     FACIAL_RECOGNITION = "facial-recognition"
     SEARCH = "clip"
     OCR = "ocr"
+    CLASSIFICATION = "classification"
 
 
 class ModelType(StrEnum):
@@ -87,13 +88,24 @@ class FaceDetectionOutput(TypedDict):
 
 class DetectedFace(TypedDict):
     boundingBox: BoundingBox
-    embedding: str
+    embedding: str | npt.NDArray[np.float32]  # an array if packed for the gRPC API
     score: float
+    scale: NotRequired[float]  # if the embedding is quantized to int8
+
+
+class QuantizedEmbedding(TypedDict):
+    embedding: str
+    scale: float
 
 
 FacialRecognitionOutput = list[DetectedFace]
 
 
+class Classification(TypedDict):
+    label: str
+    score: float
+
+
 class PipelineEntry(TypedDict):
     modelName: str
     options: dict[str, Any]
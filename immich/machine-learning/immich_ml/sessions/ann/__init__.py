@@ -1,20 +1,25 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 from typing import Any, NamedTuple
 
 import numpy as np
 from numpy.typing import NDArray
 
+from immich_ml import timing
 from immich_ml.config import log, settings
 from immich_ml.schemas import SessionNode
 
-from .loader import Ann
+from .loader import Ann, AnnContext
 
 
 class AnnSession:
     """
     Wrapper for ANN to be drop-in replacement for ONNX session.
+
+    Each thread gets its own preallocated outputs. `run` returns copies of them, unless `outputs` are passed, in which
+    case those are written to and returned.
     """
 
     def __init__(self, model_path: Path, cache_dir: Path = settings.cache_folder) -> None:
@@ -29,6 +34,7 @@ class AnnSession:
             fp16=settings.ann_fp16_turbo,
         )
         log.info("Loaded ANN model with ID %d", self.model)
+        self.contexts = threading.local()
 
     def __del__(self) -> None:
         self.ann.unload(self.model)
@@ -48,9 +54,18 @@ class AnnSession:
         output_names: list[str] | None,
         input_feed: dict[str, NDArray[np.float32]] | dict[str, NDArray[np.int32]],
         run_options: Any = None,
+        outputs: list[NDArray[np.float32]] | None = None,
     ) -> list[NDArray[np.float32]]:
         inputs: list[NDArray[np.float32]] = [np.ascontiguousarray(v) for v in input_feed.values()]
-        return self.ann.execute(self.model, inputs)
+        with timing.inference():
+            return self.context.execute(inputs, outputs)
+
+    @property
+    def context(self) -> AnnContext:
+        context: AnnContext | None = getattr(self.contexts, "context", None)
+        if context is None:
+            context = self.contexts.context = AnnContext(self.ann, self.model)
+        return context
 
 
 class AnnNode(NamedTuple):
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import threading
 from ctypes import CDLL, Array, c_bool, c_char_p, c_int, c_ulong, c_void_p
 from os.path import exists
-from typing import Any, Protocol, TypeVar
+from typing import Any, Protocol, Sequence, TypeVar
 
 import numpy as np
 from numpy.typing import NDArray
@@ -64,6 +65,8 @@ class Ann(metaclass=_Singleton):
         self.output_shapes: dict[int, tuple[tuple[int], ...]] = {}
         self.input_shapes: dict[int, tuple[tuple[int], ...]] = {}
         self.ann: int | None = None
+        # models are loaded and unloaded from different threads, but share the context and its reference count
+        self.lock = threading.Lock()
         self.new()
 
         if self.tuning_file is not None:
@@ -73,21 +76,23 @@ class Ann(metaclass=_Singleton):
             open(self.tuning_file, "a").close()
 
     def new(self) -> None:
-        if self.ann is None:
-            self.ann = libann.init(
-                self.log_level,
-                self.tuning_level,
-                self.tuning_file.encode() if self.tuning_file is not None else None,
-            )
-            self.ref_count = 0
+        with self.lock:
+            if self.ann is None:
+                self.ann = libann.init(
+                    self.log_level,
+                    self.tuning_level,
+                    self.tuning_file.encode() if self.tuning_file is not None else None,
+                )
+                self.ref_count = 0
 
-        self.ref_count += 1
+            self.ref_count += 1
 
     def destroy(self) -> None:
-        self.ref_count -= 1
-        if self.ref_count <= 0 and self.ann is not None:
-            libann.destroy(self.ann)
-            self.ann = None
+        with self.lock:
+            self.ref_count -= 1
+            if self.ref_count <= 0 and self.ann is not None:
+                libann.destroy(self.ann)
+                self.ann = None
 
     def __del__(self) -> None:
         if self.ann is not None:
@@ -112,49 +117,30 @@ class Ann(metaclass=_Singleton):
             # create empty model cache file
             open(cached_network_path, "a").close()
 
-        net_id: int = libann.load(
-            self.ann,
-            model_path.encode(),
-            fast_math,
-            fp16,
-            save_cached_network,
-            cached_network_path.encode() if cached_network_path is not None else None,
-        )
-        if net_id < 0:
-            raise ValueError("Cannot load model!")
-
-        self.input_shapes[net_id] = tuple(
-            self.shape(net_id, input=True, index=i) for i in range(self.tensors(net_id, input=True))
-        )
-        self.output_shapes[net_id] = tuple(
-            self.shape(net_id, input=False, index=i) for i in range(self.tensors(net_id, input=False))
-        )
+        with self.lock:
+            net_id: int = libann.load(
+                self.ann,
+                model_path.encode(),
+                fast_math,
+                fp16,
+                save_cached_network,
+                cached_network_path.encode() if cached_network_path is not None else None,
+            )
+            if net_id < 0:
+                raise ValueError("Cannot load model!")
+
+            self.input_shapes[net_id] = tuple(
+                self.shape(net_id, input=True, index=i) for i in range(self.tensors(net_id, input=True))
+            )
+            self.output_shapes[net_id] = tuple(
+                self.shape(net_id, input=False, index=i) for i in range(self.tensors(net_id, input=False))
+            )
         return net_id
 
     def unload(self, network_id: int) -> None:
-        libann.unload(self.ann, network_id)
-        del self.output_shapes[network_id]
-
-    def execute(self, network_id: int, input_tensors: list[NDArray[np.float32]]) -> list[NDArray[np.float32]]:
-        if not isinstance(input_tensors, list):
-            raise ValueError("input_tensors needs to be a list!")
-        net_input_shapes = self.input_shapes[network_id]
-        if len(input_tensors) != len(net_input_shapes):
-            raise ValueError(f"input_tensors lengths {len(input_tensors)} != network inputs {len(net_input_shapes)}")
-        for net_input_shape, input_tensor in zip(net_input_shapes, input_tensors):
-            if net_input_shape != input_tensor.shape:
-                raise ValueError(f"input_tensor shape {input_tensor.shape} != network input shape {net_input_shape}")
-            if not input_tensor.flags.c_contiguous:
-                raise ValueError("input_tensors must be c_contiguous numpy ndarrays")
-        output_tensors: list[NDArray[np.float32]] = [
-            np.ndarray(s, dtype=np.float32) for s in self.output_shapes[network_id]
-        ]
-        input_type = c_void_p * len(input_tensors)
-        inputs = input_type(*[t.ctypes.data_as(c_void_p) for t in input_tensors])
-        output_type = c_void_p * len(output_tensors)
-        outputs = output_type(*[t.ctypes.data_as(c_void_p) for t in output_tensors])
-        libann.execute(self.ann, network_id, inputs, outputs)
-        return output_tensors
+        with self.lock:
+            libann.unload(self.ann, network_id)
+            del self.output_shapes[network_id]
 
     def shape(self, network_id: int, input: bool = False, index: int = 0) -> tuple[int]:
         s = libann.shape(self.ann, network_id, input, index)
@@ -167,3 +153,65 @@ class Ann(metaclass=_Singleton):
     def tensors(self, network_id: int, input: bool = False) -> int:
         tensors: int = libann.tensors(self.ann, network_id, input)
         return tensors
+
+
+class AnnContext:
+    """
+    Reusable execution state for a single network.
+
+    Output tensors and the ctypes pointer arrays are allocated once, and an input or output array is only validated
+    when a different array object is passed in its position. Unless the caller passes its own outputs, copies of the
+    preallocated outputs are returned, as those are overwritten by the next call. A context must not be shared between
+    threads.
+    """
+
+    def __init__(self, ann: Ann, network_id: int) -> None:
+        self.ann = ann
+        self.network_id = network_id
+        self.input_shapes = ann.input_shapes[network_id]
+        self.output_shapes = ann.output_shapes[network_id]
+        self.outputs: list[NDArray[np.float32]] = [np.empty(s, dtype=np.float32) for s in self.output_shapes]
+        self.input_ptrs = (c_void_p * len(self.input_shapes))()
+        self.output_ptrs = (c_void_p * len(self.output_shapes))(*[t.ctypes.data for t in self.outputs])
+        self._inputs: list[NDArray[np.float32] | None] = [None] * len(self.input_shapes)
+        self._outputs: list[NDArray[np.float32] | None] = list(self.outputs)
+
+    def execute(
+        self,
+        input_tensors: Sequence[NDArray[np.float32]],
+        output_tensors: Sequence[NDArray[np.float32]] | None = None,
+    ) -> list[NDArray[np.float32]]:
+        if len(input_tensors) != len(self.input_shapes):
+            raise ValueError(f"input_tensors lengths {len(input_tensors)} != network inputs {len(self.input_shapes)}")
+        for i, tensor in enumerate(input_tensors):
+            if tensor is not self._inputs[i]:
+                _validate(tensor, self.input_shapes[i], "input")
+                self.input_ptrs[i] = tensor.ctypes.data
+                self._inputs[i] = tensor
+
+        copy_outputs = output_tensors is None
+        if output_tensors is None:
+            output_tensors = self.outputs
+        elif len(output_tensors) != len(self.output_shapes):
+            raise ValueError(
+                f"output_tensors lengths {len(output_tensors)} != network outputs {len(self.output_shapes)}"
+            )
+        for i, tensor in enumerate(output_tensors):
+            if tensor is not self._outputs[i]:
+                _validate(tensor, self.output_shapes[i], "output")
+                self.output_ptrs[i] = tensor.ctypes.data
+                self._outputs[i] = tensor
+
+        libann.execute(self.ann.ann, self.network_id, self.input_ptrs, self.output_ptrs)
+        # callers may keep results across calls, e.g. when running a batch in chunks
+        return [tensor.copy() for tensor in output_tensors] if copy_outputs else list(output_tensors)
+
+
+def _validate(tensor: NDArray[np.float32], shape: tuple[int, ...], kind: str) -> None:
+    if tensor.shape != shape:
+        raise ValueError(f"{kind}_tensor shape {tensor.shape} != network {kind} shape {shape}")
+    # input types are defined by the network (e.g. int32 tokens), but outputs are always read as float32
+    if kind == "output" and tensor.dtype != np.float32:
+        raise ValueError("output_tensors must be float32 numpy ndarrays")
+    if not tensor.flags.c_contiguous:
+        raise ValueError(f"{kind}_tensors must be c_contiguous numpy ndarrays")
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Any, Mapping, NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from immich_ml.schemas import ModelSession, SessionNode
+from immich_ml.sessions.ann import AnnSession
+
+_BATCH_SUFFIX = re.compile(r"\.b(\d+)\.[^./]+$")
+
+
+def get_batch_size(model_path: Path) -> int:
+    match = _BATCH_SUFFIX.search(str(model_path))
+    return int(match.group(1)) if match else 1
+
+
+def get_batch_variants(model_path: Path) -> list[Path]:
+    """Returns fixed batch size variants of a model, e.g. `model.b4.armnn` and `model.b8.armnn` for `model.armnn`."""
+    # the glob also matches names like `model.backup.armnn`, which aren't variants
+    variants = model_path.parent.glob(f"{model_path.stem}.b*{model_path.suffix}")
+    return sorted((path for path in variants if _BATCH_SUFFIX.search(path.name)), key=get_batch_size)
+
+
+class BatchedSession:
+    """
+    Wraps sessions compiled for fixed batch sizes to accept inputs of any batch size.
+
+    Inputs are split into chunks of the largest variant, with the remainder zero-padded to the smallest variant
+    that fits it. All inputs and outputs must have a leading batch axis. ARM NN sessions write full chunks directly
+    into the returned arrays, so the only allocation for those is the result itself, which callers keep.
+    """
+
+    def __init__(self, sessions: Mapping[int, ModelSession]) -> None:
+        self.sessions = dict(sorted(sessions.items()))
+        self.batch_sizes = list(self.sessions)
+        self.base = self.sessions[self.batch_sizes[0]]
+
+    def get_inputs(self) -> list[SessionNode]:
+        return [BatchedNode(node.name, ("batch", *node.shape[1:])) for node in self.base.get_inputs()]
+
+    def get_outputs(self) -> list[SessionNode]:
+        return [BatchedNode(node.name, ("batch", *node.shape[1:])) for node in self.base.get_outputs()]
+
+    def run(
+        self,
+        output_names: list[str] | None,
+        input_feed: dict[str, NDArray[np.float32]] | dict[str, NDArray[np.int32]],
+        run_options: Any = None,
+    ) -> list[NDArray[np.float32]]:
+        total = next(iter(input_feed.values())).shape[0]
+        plan = self.plan(total)
+        results: list[NDArray[np.float32]] = []
+        start = 0
+        for batch_size, count in plan:
+            session = self.sessions[batch_size]
+            feed = {name: pad_batch(v[start : start + count], batch_size) for name, v in input_feed.items()}
+            if count == batch_size and isinstance(session, AnnSession):
+                # full chunks are written straight into the results rather than copied out of the session's buffers
+                if not results:
+                    results = [np.empty((total, *node.shape[1:]), dtype=np.float32) for node in session.get_outputs()]
+                session.run(
+                    output_names, feed, run_options, outputs=[result[start : start + count] for result in results]
+                )
+            else:
+                # sessions may reuse their output buffers, so each chunk is copied out before the next runs
+                outputs = session.run(output_names, feed, run_options)
+                if len(plan) == 1:
+                    return [output[:count] for output in outputs]
+                if not results:
+                    results = [np.empty((total, *output.shape[1:]), dtype=output.dtype) for output in outputs]
+                for result, output in zip(results, outputs):
+                    result[start : start + count] = output[:count]
+            start += count
+        return results
+
+    def plan(self, total: int) -> list[tuple[int, int]]:
+        """Returns (variant batch size, number of real inputs) for each call needed to process `total` inputs."""
+        largest = self.batch_sizes[-1]
+        full, remainder = divmod(total, largest)
+        plan = [(largest, largest)] * full
+        if remainder:
+            plan.append((next(size for size in self.batch_sizes if size >= remainder), remainder))
+        return plan
+
+
+def pad_batch(array: NDArray[Any], batch_size: int) -> NDArray[Any]:
+    """Pads the batch axis with zeros, for models that only run batches of a fixed size."""
+    if array.shape[0] == batch_size:
+        return array
+    padding = np.zeros((batch_size - array.shape[0], *array.shape[1:]), dtype=array.dtype)
+    return np.concatenate([array, padding], axis=0)
+
+
+class BatchedNode(NamedTuple):
+    name: str | None
+    shape: tuple[Any, ...]
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Mapping
+
+import numpy as np
+from numpy.typing import NDArray
+
+from immich_ml.schemas import ModelSession, SessionNode
+
+# weight of the latest call in the moving average latency used to break ties between devices
+_LATENCY_SMOOTHING = 0.2
+
+
+class DeviceState:
+    def __init__(self, session: ModelSession) -> None:
+        self.session = session
+        self.in_flight = 0
+        self.calls = 0
+        self.busy_s = 0.0
+        self.latency_s = 0.0
+
+
+class DeviceBalancedSession:
+    """
+    Holds a session for the same model on each of several devices.
+
+    Each call runs on the device with the fewest in-flight calls, preferring the one with the lowest recent latency
+    when tied. This lets a single worker spread load across all GPUs instead of being pinned to one.
+    """
+
+    def __init__(self, sessions: Mapping[str, ModelSession]) -> None:
+        if not sessions:
+            raise ValueError("At least one device session is required")
+        self.devices = {device_id: DeviceState(session) for device_id, session in sessions.items()}
+        self.lock = threading.Lock()
+        self.created = time.monotonic()
+
+    def get_inputs(self) -> list[SessionNode]:
+        return next(iter(self.devices.values())).session.get_inputs()
+
+    def get_outputs(self) -> list[SessionNode]:
+        return next(iter(self.devices.values())).session.get_outputs()
+
+    def run(
+        self,
+        output_names: list[str] | None,
+        input_feed: dict[str, NDArray[np.float32]] | dict[str, NDArray[np.int32]],
+        run_options: Any = None,
+    ) -> list[NDArray[np.float32]]:
+        with self.lock:
+            device = min(self.devices.values(), key=lambda d: (d.in_flight, d.latency_s))
+            device.in_flight += 1
+
+        start = time.perf_counter()
+        try:
+            return device.session.run(output_names, input_feed, run_options)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                device.in_flight -= 1
+                device.busy_s += elapsed
+                device.latency_s = (
+                    elapsed
+                    if device.calls == 0
+                    else device.latency_s + _LATENCY_SMOOTHING * (elapsed - device.latency_s)
+                )
+                device.calls += 1
+
+    def utilization(self) -> dict[str, dict[str, float]]:
+        """Per-device stats, where `utilization` is the average number of in-flight calls since the session loaded."""
+        elapsed = max(time.monotonic() - self.created, 1e-9)
+        with self.lock:
+            return {
+                device_id: {
+                    "inFlight": device.in_flight,
+                    "calls": device.calls,
+                    "busySeconds": device.busy_s,
+                    "latencyMs": device.latency_s * 1000,
+                    "utilization": device.busy_s / elapsed,
+                }
+                for device_id, device in self.devices.items()
+            }
@@ -5,11 +5,13 @@ from typing import Any
 
 import numpy as np
 import onnxruntime as ort
+import orjson
 from numpy.typing import NDArray
 
 from immich_ml.models.constants import SUPPORTED_PROVIDERS
 from immich_ml.schemas import ModelPrecision, SessionNode
 
+from .. import timing
 from ..config import log, settings
 
 
@@ -22,12 +24,17 @@ class OrtSession:
         providers: list[str] | None = None,
         provider_options: list[dict[str, Any]] | None = None,
         sess_options: ort.SessionOptions | None = None,
+        device_id: str | None = None,
     ):
         self.model_path = Path(model_path)
+        self.device_id = device_id if device_id is not None else settings.device_id
         self.providers = providers if providers is not None else self._providers_default
         self.provider_options = provider_options if provider_options is not None else self._provider_options_default
         self.sess_options = sess_options if sess_options is not None else self._sess_options_default
-        self.session = ort.InferenceSession(
+        self.session = self._create_session()
+
+    def _create_session(self) -> ort.InferenceSession:
+        return ort.InferenceSession(
             self.model_path.as_posix(),
             providers=self.providers,
             provider_options=self.provider_options,
@@ -48,9 +55,28 @@ class OrtSession:
         input_feed: dict[str, NDArray[np.float32]] | dict[str, NDArray[np.int32]],
         run_options: Any = None,
     ) -> list[NDArray[np.float32]]:
-        outputs: list[NDArray[np.float32]] = self.session.run(output_names, input_feed, run_options)
+        with timing.inference():
+            outputs: list[NDArray[np.float32]] = self.session.run(output_names, input_feed, run_options)
         return outputs
 
+    def start_profiling(self, file_prefix: Path) -> None:
+        """Replaces the session with one that profiles each run, since profiling can't be enabled afterwards."""
+        self.sess_options.enable_profiling = True
+        self.sess_options.profile_file_prefix = file_prefix.as_posix()
+        try:
+            self.session = self._create_session()
+        finally:
+            self.sess_options.enable_profiling = False
+
+    def end_profiling(self) -> tuple[int, list[dict[str, Any]]]:
+        """Stops profiling, returning when it started (ns since the epoch) and its events in Chrome trace format."""
+        path = Path(self.session.end_profiling())
+        try:
+            events: list[dict[str, Any]] = orjson.loads(path.read_bytes())
+        finally:
+            path.unlink(missing_ok=True)
+        return self.session.get_profiling_start_time_ns(), events
+
     @property
     def providers(self) -> list[str]:
         return self._providers
@@ -83,13 +109,13 @@ class OrtSession:
                 case "CPUExecutionProvider":
                     options = {"arena_extend_strategy": "kSameAsRequested"}
                 case "CUDAExecutionProvider":
-                    options = {"arena_extend_strategy": "kSameAsRequested", "device_id": settings.device_id}
+                    options = {"arena_extend_strategy": "kSameAsRequested", "device_id": self.device_id}
                 case "MIGraphXExecutionProvider":
                     migraphx_dir = self.model_path.parent / "migraphx"
                     # MIGraphX does not create the underlying folder and will crash if it does not exist
                     migraphx_dir.mkdir(parents=True, exist_ok=True)
                     options = {
-                        "device_id": settings.device_id,
+                        "device_id": self.device_id,
                         "migraphx_model_cache_dir": migraphx_dir.as_posix(),
                         "migraphx_fp16_enable": "1" if settings.rocm_precision == ModelPrecision.FP16 else "0",
                     }
@@ -98,7 +124,7 @@ class OrtSession:
                     # Check for available devices, preferring GPU over CPU
                     gpu_devices = [d for d in device_ids if d.startswith("GPU")]
                     if gpu_devices:
-                        device_type = f"GPU.{settings.device_id}"
+                        device_type = f"GPU.{self.device_id}"
                         log.debug(f"OpenVINO: Using GPU device {device_type}")
                     else:
                         device_type = "CPU"
@@ -6,9 +6,11 @@ from typing import Any, NamedTuple
 import numpy as np
 from numpy.typing import NDArray
 
+from immich_ml import timing
 from immich_ml.config import log, settings
 from immich_ml.schemas import SessionNode
 
+from ..batch import get_batch_size
 from .rknnpool import RknnPoolExecutor, is_available, soc_name
 
 is_available = is_available and settings.rknn
@@ -23,6 +25,7 @@ def run_inference(rknn_lite: Any, input: list[NDArray[np.float32]]) -> list[NDAr
 input_output_mapping: dict[str, dict[str, Any]] = {
     "detection": {
         "input": {"norm_tensor:0": (1, 3, 640, 640)},
+        "batched_outputs": False,
         "output": {
             "norm_tensor:1": (12800, 1),
             "norm_tensor:2": (3200, 1),
@@ -35,13 +38,18 @@ input_output_mapping: dict[str, dict[str, Any]] = {
             "norm_tensor:9": (800, 10),
         },
     },
-    "recognition": {"input": {"norm_tensor:0": (1, 3, 112, 112)}, "output": {"norm_tensor:1": (1, 512)}},
+    "recognition": {
+        "input": {"norm_tensor:0": (1, 3, 112, 112)},
+        "batched_outputs": True,
+        "output": {"norm_tensor:1": (1, 512)},
+    },
 }
 
 
 class RknnSession:
     def __init__(self, model_path: Path) -> None:
         self.model_type = "detection" if "detection" in model_path.parts else "recognition"
+        self.batch_size = get_batch_size(model_path)
         self.tpe = settings.rknn_threads
 
         log.info(f"Loading RKNN model from {model_path} with {self.tpe} threads.")
@@ -49,10 +57,14 @@ class RknnSession:
         log.info(f"Loaded RKNN model from {model_path} with {self.tpe} threads.")
 
     def get_inputs(self) -> list[SessionNode]:
-        return [RknnNode(name=k, shape=v) for k, v in input_output_mapping[self.model_type]["input"].items()]
+        mapping = input_output_mapping[self.model_type]
+        return [RknnNode(name=k, shape=(self.batch_size, *v[1:])) for k, v in mapping["input"].items()]
 
     def get_outputs(self) -> list[SessionNode]:
-        return [RknnNode(name=k, shape=v) for k, v in input_output_mapping[self.model_type]["output"].items()]
+        mapping = input_output_mapping[self.model_type]
+        if not mapping["batched_outputs"]:
+            return [RknnNode(name=k, shape=v) for k, v in mapping["output"].items()]
+        return [RknnNode(name=k, shape=(self.batch_size, *v[1:])) for k, v in mapping["output"].items()]
 
     def run(
         self,
@@ -61,11 +73,8 @@ class RknnSession:
         run_options: Any = None,
     ) -> list[NDArray[np.float32]]:
         input_data: list[NDArray[np.float32]] = [np.ascontiguousarray(v) for v in input_feed.values()]
-        self.rknnpool.put(input_data)
-        res = self.rknnpool.get()
-        if res is None:
-            raise RuntimeError("RKNN inference failed!")
-        return res
+        with timing.inference():
+            return self.rknnpool.run(input_data)
 
 
 class RknnNode(NamedTuple):
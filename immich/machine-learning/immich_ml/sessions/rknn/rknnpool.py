@@ -11,7 +11,7 @@ import numpy as np
 from numpy.typing import NDArray
 
 from immich_ml.config import log
-from immich_ml.models.constants import RKNN_COREMASK_SUPPORTED_SOCS, RKNN_SUPPORTED_SOCS
+from immich_ml.models.constants import RKNN_COREMASK_SUPPORTED_SOCS, RKNN_SOC_CORES, RKNN_SUPPORTED_SOCS
 
 
 def get_soc(device_tree_path: Path | str) -> str | None:
@@ -38,7 +38,17 @@ except ImportError:
     log.debug("RKNN is not available")
 
 
-def init_rknn(model_path: str) -> "RKNNLite":
+def get_core_masks(tpes: int) -> list[int | None]:
+    if soc_name not in RKNN_COREMASK_SUPPORTED_SOCS:
+        return [None] * tpes  # Please do not set this parameter on other platforms.
+    if tpes == 1:
+        return [RKNNLite.NPU_CORE_AUTO]
+    # pin each context to its own core so concurrent inferences run in parallel instead of contending for one
+    cores = [RKNNLite.NPU_CORE_0, RKNNLite.NPU_CORE_1, RKNNLite.NPU_CORE_2][: RKNN_SOC_CORES[soc_name]]
+    return [cores[i % len(cores)] for i in range(tpes)]
+
+
+def init_rknn(model_path: str, core_mask: int | None = None) -> "RKNNLite":
     if not is_available:
         raise RuntimeError("rknn is not available!")
     rknn_lite = RKNNLite()
@@ -47,11 +57,7 @@ def init_rknn(model_path: str) -> "RKNNLite":
     if ret != 0:
         raise RuntimeError("Failed to load RKNN model")
 
-    if soc_name in RKNN_COREMASK_SUPPORTED_SOCS:
-        ret = rknn_lite.init_runtime(core_mask=RKNNLite.NPU_CORE_AUTO)
-    else:
-        ret = rknn_lite.init_runtime()  # Please do not set this parameter on other platforms.
-
+    ret = rknn_lite.init_runtime() if core_mask is None else rknn_lite.init_runtime(core_mask=core_mask)
     if ret != 0:
         raise RuntimeError("Failed to initialize RKNN runtime environment")
 
@@ -59,6 +65,13 @@ def init_rknn(model_path: str) -> "RKNNLite":
 
 
 class RknnPoolExecutor:
+    """
+    Runs inference on a bounded pool of RKNN contexts.
+
+    Each submitted call waits for a free context, so up to `tpes` inferences can be in flight at once
+    and every caller receives its own future.
+    """
+
     def __init__(
         self,
         model_path: str,
@@ -66,21 +79,25 @@ class RknnPoolExecutor:
         func: Callable[["RKNNLite", list[NDArray[np.float32]]], list[NDArray[np.float32]]],
     ) -> None:
         self.tpes = tpes
-        self.queue: Queue[Future[list[NDArray[np.float32]]]] = Queue()
-        self.rknn_pool = [init_rknn(model_path) for _ in range(tpes)]
-        self.pool = ThreadPoolExecutor(max_workers=tpes)
+        self.rknn_pool = [init_rknn(model_path, core_mask) for core_mask in get_core_masks(tpes)]
+        self.free: Queue["RKNNLite"] = Queue()
+        for rknn_lite in self.rknn_pool:
+            self.free.put(rknn_lite)
+        self.pool = ThreadPoolExecutor(max_workers=tpes, thread_name_prefix="rknn")
         self.func = func
-        self.num = 0
 
-    def put(self, inputs: list[NDArray[np.float32]]) -> None:
-        self.queue.put(self.pool.submit(self.func, self.rknn_pool[self.num % self.tpes], inputs))
-        self.num += 1
+    def submit(self, inputs: list[NDArray[np.float32]]) -> Future[list[NDArray[np.float32]]]:
+        return self.pool.submit(self._run, inputs)
+
+    def run(self, inputs: list[NDArray[np.float32]]) -> list[NDArray[np.float32]]:
+        return self.submit(inputs).result()
 
-    def get(self) -> list[NDArray[np.float32]] | None:
-        if self.queue.empty():
-            return None
-        fut = self.queue.get()
-        return fut.result()
+    def _run(self, inputs: list[NDArray[np.float32]]) -> list[NDArray[np.float32]]:
+        rknn_lite = self.free.get()
+        try:
+            return self.func(rknn_lite, inputs)
+        finally:
+            self.free.put(rknn_lite)
 
     def release(self) -> None:
         self.pool.shutdown()
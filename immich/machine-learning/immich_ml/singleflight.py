@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+from typing import IO, Any, Awaitable, Callable, Generic, TypeVar
+
+import orjson
+
+R = TypeVar("R")
+
+
+class SingleFlight(Generic[R]):
+    """
+    Coalesces concurrent calls with the same key, so only the first one runs and the rest await its result.
+
+    Each caller awaits the call through `asyncio.shield`, so cancelling a caller, including the one that started it,
+    only stops that caller from waiting. The call runs to completion even if every caller is cancelled, and callers
+    that are still waiting get its result. `func` therefore mustn't use anything owned by the caller that started it,
+    like its request's upload, which may be closed before the call runs.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[bytes, asyncio.Future[R]] = {}
+
+    async def run(self, key: bytes, func: Callable[[], Awaitable[R]]) -> R:
+        call = self.calls.get(key)
+        if call is None:
+            call = self.calls[key] = asyncio.ensure_future(func())
+            call.add_done_callback(lambda _: self.calls.pop(key, None))
+        return await asyncio.shield(call)
+
+
+def hash_request(payload: bytes | IO[bytes], *args: Any) -> bytes:
+    """Fast content hash of a payload, along with any other arguments that affect the result."""
+    digest = hashlib.blake2b(orjson.dumps(args, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    if isinstance(payload, bytes):
+        digest.update(payload)
+    else:
+        while chunk := payload.read(2**20):
+            digest.update(chunk)
+        payload.seek(0)
+    return digest.digest()
@@ -0,0 +1,134 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .schemas import T
+
+
+class Timings:
+    """Durations (ns) of the stages of a request, in the order they finished."""
+
+    def __init__(self) -> None:
+        self.start_ns = time.perf_counter_ns()
+        self.spans: dict[str, int] = {}
+
+    def add(self, name: str, duration_ns: int) -> None:
+        self.spans[name] = self.spans.get(name, 0) + duration_ns
+
+    def to_header(self) -> str:
+        spans = [*self.spans.items(), ("total", time.perf_counter_ns() - self.start_ns)]
+        return ", ".join(f"{name};dur={duration_ns / 1e6:.2f}" for name, duration_ns in spans)
+
+
+class ModelStages:
+    """
+    Splits a model's prediction into preprocessing, inference and postprocessing around the session calls it makes.
+
+    Anything between the first and last session call counts as inference.
+    """
+
+    def __init__(self) -> None:
+        self.start_ns = time.perf_counter_ns()
+        self.infer_start_ns: int | None = None
+        self.infer_end_ns: int | None = None
+
+
+# set per request; copied into the thread pool along with the rest of the request's context
+request_timings: ContextVar[Timings | None] = ContextVar("request_timings", default=None)
+model_stages: ContextVar[ModelStages | None] = ContextVar("model_stages", default=None)
+
+
+def add(name: str, duration_ns: int) -> None:
+    if (timings := request_timings.get()) is not None:
+        timings.add(name, duration_ns)
+
+
+def since_start(name: str) -> None:
+    """Records the time from the start of the request until now, e.g. to time parsing the request before the handler."""
+    if (timings := request_timings.get()) is not None:
+        timings.add(name, time.perf_counter_ns() - timings.start_ns)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter_ns() - start)
+
+
+def timed(name: str, func: Callable[..., T]) -> Callable[..., T]:
+    """Wraps `func` to record the duration of each call, e.g. so work in the thread pool doesn't include its wait."""
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def model(prefix: str) -> Iterator[None]:
+    """Records `<prefix>.preprocess`, `<prefix>.infer` and `<prefix>.postprocess` for a model's prediction."""
+    if request_timings.get() is None:
+        yield
+        return
+    stages = ModelStages()
+    token = model_stages.set(stages)
+    try:
+        yield
+    finally:
+        model_stages.reset(token)
+        end = time.perf_counter_ns()
+        infer_start = stages.infer_start_ns or end
+        infer_end = stages.infer_end_ns or end
+        add(f"{prefix}.preprocess", infer_start - stages.start_ns)
+        add(f"{prefix}.infer", infer_end - infer_start)
+        add(f"{prefix}.postprocess", end - infer_end)
+
+
+@contextmanager
+def inference() -> Iterator[None]:
+    """Marks a session call for the model currently predicting, if its stages are being timed."""
+    stages = model_stages.get()
+    if stages is None:
+        yield
+        return
+    if stages.infer_start_ns is None:
+        stages.infer_start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        stages.infer_end_ns = time.perf_counter_ns()
+
+
+class ServerTimingMiddleware:
+    """Collects the timings of each HTTP request and reports them in a `Server-Timing` header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings()
+        token = request_timings.set(timings)
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start" and timings.spans:
+                MutableHeaders(scope=message).append("Server-Timing", timings.to_header())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
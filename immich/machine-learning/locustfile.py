@@ -1,81 +1,216 @@
 import json
+import logging
+import random
 from argparse import ArgumentParser
 from io import BytesIO
+from pathlib import Path
 from typing import Any
 
+import gevent
+import numpy as np
 from locust import HttpUser, events, task
 from locust.env import Environment
-from PIL import Image
-
-byte_image = BytesIO()
+from PIL import Image, ImageDraw, ImageFont
+
+# previews at Immich's default size in different aspect ratios, along with smaller uploads
+RESOLUTIONS = [(1440, 1080), (1080, 1440), (1440, 1440), (1440, 810), (1024, 768), (640, 480)]
+FACE_COUNTS = [0, 0, 1, 1, 2, 3, 5, 12]
+TEXT_LINES = [0, 0, 0, 2, 5, 20]
+# Immich sends JPEG previews by default and WebP if configured
+FORMATS = ["jpeg", "jpeg", "jpeg", "webp", "png"]
+SKIN_TONES = [(255, 219, 172), (241, 194, 125), (224, 172, 105), (141, 85, 36)]
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif", ".avif"}
+WORDS = "the quick brown fox jumps over lazy dog menu receipt total street sign open closed exit 2024 $12.99".split()
+QUERIES = [
+    "dog",
+    "sunset at the beach",
+    "birthday cake with candles",
+    "people hiking in the mountains",
+    "screenshot of a receipt",
+    "snowy street at night",
+    "cat sleeping on a couch",
+    "family photo in front of a christmas tree",
+]
+
+corpus: list[bytes] = []
 
 
 @events.init_command_line_parser.add_listener
 def _(parser: ArgumentParser) -> None:
     parser.add_argument("--clip-model", type=str, default="ViT-B-32::openai")
     parser.add_argument("--face-model", type=str, default="buffalo_l")
+    parser.add_argument("--face-min-score", type=float, default=0.7)
+    parser.add_argument("--ocr-model", type=str, default="PP-OCRv5_mobile")
+    parser.add_argument("--ocr-max-resolution", type=int, default=736)
+    parser.add_argument(
+        "--corpus-dir",
+        type=str,
+        default="",
+        help="Directory of images to send, searched recursively. If empty, a corpus of synthetic images is generated.",
+    )
+    parser.add_argument("--corpus-size", type=int, default=64, help="Maximum number of images to load or generate.")
+    # the defaults follow the concurrency of Immich's job queues: 2 for smart search, 2 for face detection, 1 for OCR
+    parser.add_argument("--clip-text-weight", type=int, default=1)
+    parser.add_argument("--clip-visual-weight", type=int, default=2)
+    parser.add_argument("--face-weight", type=int, default=2)
+    parser.add_argument("--ocr-weight", type=int, default=1)
     parser.add_argument(
-        "--face-min-score",
+        "--pipeline-weight",
         type=int,
-        default=0.034,
-        help=(
-            "Returns all faces at or above this score. The default returns 1 face per request; "
-            "setting this to 0 blows up the number of faces to the thousands."
-        ),
+        default=0,
+        help="Users sending CLIP, facial recognition and OCR in one request. Immich sends them separately.",
     )
-    parser.add_argument("--image-size", type=int, default=1000)
+
+
+# the corpus is shared by all users in a process, and built before the test so it doesn't count towards run time
+@events.init.add_listener
+def on_init(environment: Environment, **kwargs: Any) -> None:
+    options = environment.parsed_options
+    if options is None or options.master:
+        return
+    if options.corpus_dir:
+        corpus.extend(load_corpus(Path(options.corpus_dir), options.corpus_size))
+    else:
+        corpus.extend(generate_corpus(options.corpus_size))
+    if not corpus:
+        raise ValueError(f"No images found in {options.corpus_dir}")
+    logging.info(f"Loaded {len(corpus)} images, {sum(map(len, corpus)) / len(corpus) / 1024:.0f} KiB on average")
+    # the event loop's clock isn't updated while it's blocked, which would otherwise cut the run time short
+    gevent.get_hub().loop.update_now()
 
 
 @events.test_start.add_listener
 def on_test_start(environment: Environment, **kwargs: Any) -> None:
-    global byte_image
-    assert environment.parsed_options is not None
-    image = Image.new("RGB", (environment.parsed_options.image_size, environment.parsed_options.image_size))
-    image.save(byte_image, format="jpeg")
+    options = environment.parsed_options
+    assert options is not None
+    weights = {
+        CLIPTextFormDataLoadTest: options.clip_text_weight,
+        CLIPVisionFormDataLoadTest: options.clip_visual_weight,
+        RecognitionFormDataLoadTest: options.face_weight,
+        OCRFormDataLoadTest: options.ocr_weight,
+        PipelineFormDataLoadTest: options.pipeline_weight,
+    }
+    for user_class, weight in weights.items():
+        user_class.weight = weight
+
+
+def load_corpus(corpus_dir: Path, size: int) -> list[bytes]:
+    paths = sorted(path for path in corpus_dir.rglob("*") if path.suffix.lower() in EXTENSIONS)
+    random.Random(0).shuffle(paths)
+    return [path.read_bytes() for path in paths[:size]]
+
+
+def generate_corpus(size: int) -> list[bytes]:
+    """
+    Draws images covering a range of resolutions, face counts, text density and formats.
+
+    The faces are simple drawings, so a directory of real photos gives more realistic facial recognition load.
+    """
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(size):
+        width, height = RESOLUTIONS[i % len(RESOLUTIONS)]
+        image = draw_background(width, height, rng)
+        draw = ImageDraw.Draw(image)
+        for _ in range(FACE_COUNTS[i % len(FACE_COUNTS)]):
+            draw_face(draw, width, height, rng)
+        draw_text(draw, width, height, TEXT_LINES[i % len(TEXT_LINES)], rng)
+
+        buffer = BytesIO()
+        image.save(buffer, format=FORMATS[i % len(FORMATS)], quality=80)
+        images.append(buffer.getvalue())
+    return images
+
+
+def draw_background(width: int, height: int, rng: np.random.Generator) -> Image.Image:
+    # smooth gradients with noise, which compress and decode more like a photo than a flat color does
+    start, end = rng.integers(0, 236, (2, 3), dtype=np.uint8)
+    ramp = np.linspace(start, end, width, dtype=np.uint8)
+    pixels = ramp[None] + rng.integers(0, 20, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def draw_face(draw: ImageDraw.ImageDraw, width: int, height: int, rng: np.random.Generator) -> None:
+    size = int(rng.uniform(0.08, 0.3) * min(width, height))
+    x, y = int(rng.uniform(0, width - size)), int(rng.uniform(0, height - size * 1.3))
+    draw.ellipse((x, y, x + size, y + size * 1.3), fill=SKIN_TONES[rng.integers(len(SKIN_TONES))])
+    eye = size // 10
+    for eye_x in (x + size * 0.3, x + size * 0.7):
+        draw.ellipse((eye_x - eye, y + size * 0.45 - eye, eye_x + eye, y + size * 0.45 + eye), fill=(30, 30, 30))
+    draw.arc((x + size * 0.3, y + size * 0.8, x + size * 0.7, y + size * 1.05), 20, 160, fill=(150, 40, 40), width=eye)
+
+
+def draw_text(draw: ImageDraw.ImageDraw, width: int, height: int, lines: int, rng: np.random.Generator) -> None:
+    for _ in range(lines):
+        font = ImageFont.load_default(size=int(rng.uniform(0.015, 0.05) * height))
+        text = " ".join(rng.choice(WORDS, int(rng.integers(1, 6))))
+        x, y = int(rng.uniform(0, width * 0.6)), int(rng.uniform(0, height * 0.95))
+        draw.text((x, y), text, fill=(0, 0, 0) if rng.random() < 0.5 else (255, 255, 255), font=font)
 
 
 class InferenceLoadTest(HttpUser):
     abstract: bool = True
     host = "http://127.0.0.1:3003"
-    data: bytes
 
-    # re-use the image across all instances in a process
-    def on_start(self) -> None:
-        self.data = byte_image.getvalue()
+    def predict(self, name: str, request: dict[str, Any], text: str | None = None) -> None:
+        data = [("entries", json.dumps(request))]
+        if text is None:
+            files = {"image": random.choice(corpus)}
+            self.client.post("/predict", data=data, files=files, name=name)
+        else:
+            data.append(("text", text))
+            self.client.post("/predict", data=data, name=name)
+
+    def clip_visual_request(self) -> dict[str, Any]:
+        return {"clip": {"visual": {"modelName": self.environment.parsed_options.clip_model, "options": {}}}}
+
+    def face_request(self) -> dict[str, Any]:
+        options = self.environment.parsed_options
+        return {
+            "facial-recognition": {
+                "detection": {"modelName": options.face_model, "options": {"minScore": options.face_min_score}},
+                "recognition": {"modelName": options.face_model},
+            }
+        }
+
+    def ocr_request(self) -> dict[str, Any]:
+        options = self.environment.parsed_options
+        detection_options = {"minScore": 0.5, "maxResolution": options.ocr_max_resolution}
+        return {
+            "ocr": {
+                "detection": {"modelName": options.ocr_model, "options": detection_options},
+                "recognition": {"modelName": options.ocr_model, "options": {"minScore": 0.8}},
+            }
+        }
 
 
 class CLIPTextFormDataLoadTest(InferenceLoadTest):
     @task
     def encode_text(self) -> None:
         request = {"clip": {"textual": {"modelName": self.environment.parsed_options.clip_model}}}
-        data = [("entries", json.dumps(request)), ("text", "test search query")]
-        self.client.post("/predict", data=data)
+        self.predict("clip-textual", request, random.choice(QUERIES))
 
 
 class CLIPVisionFormDataLoadTest(InferenceLoadTest):
     @task
     def encode_image(self) -> None:
-        request = {"clip": {"visual": {"modelName": self.environment.parsed_options.clip_model, "options": {}}}}
-        data = [("entries", json.dumps(request))]
-        files = {"image": self.data}
-        self.client.post("/predict", data=data, files=files)
+        self.predict("clip-visual", self.clip_visual_request())
 
 
 class RecognitionFormDataLoadTest(InferenceLoadTest):
     @task
     def recognize(self) -> None:
-        request = {
-            "facial-recognition": {
-                "recognition": {
-                    "modelName": self.environment.parsed_options.face_model,
-                },
-                "detection": {
-                    "modelName": self.environment.parsed_options.face_model,
-                    "options": {"minScore": self.environment.parsed_options.face_min_score},
-                },
-            }
-        }
-        data = [("entries", json.dumps(request))]
-        files = {"image": self.data}
+        self.predict("facial-recognition", self.face_request())
 
-        self.client.post("/predict", data=data, files=files)
+
+class OCRFormDataLoadTest(InferenceLoadTest):
+    @task
+    def ocr(self) -> None:
+        self.predict("ocr", self.ocr_request())
+
+
+class PipelineFormDataLoadTest(InferenceLoadTest):
+    @task
+    def pipeline(self) -> None:
+        request = self.clip_visual_request() | self.face_request() | self.ocr_request()
+        self.predict("pipeline", request)
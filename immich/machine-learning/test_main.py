@@ -1,38 +1,72 @@
+import asyncio
+import hashlib
 import json
 import os
+import socket
+import subprocess
+import sys
+import threading
+import time
 from io import BytesIO
 from pathlib import Path
 from random import randint
 from types import SimpleNamespace
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Callable
 from unittest import mock
 
 import cv2
+import grpc
 import numpy as np
 import onnxruntime as ort
 import orjson
 import pytest
+import pytest_asyncio
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from numpy.typing import NDArray
 from PIL import Image
 from pytest import MonkeyPatch
 from pytest_mock import MockerFixture
 
-from immich_ml.config import MaxBatchSize, Settings, settings
+from immich_ml import main, timing
+from immich_ml.admission import AdmissionController
+from immich_ml.config import (
+    ClipSettings,
+    FacialRecognitionSettings,
+    MaxBatchSize,
+    PreloadModelData,
+    Settings,
+    settings,
+)
 from immich_ml.main import load, preload_models
 from immich_ml.models.base import InferenceModel
 from immich_ml.models.cache import ModelCache
+from immich_ml.models.clip.classification import ZeroShotClassifier
+from immich_ml.models.clip.labels import LabelSet, LabelSetNotFoundError, embeddings_dir, save_label_set
 from immich_ml.models.clip.textual import MClipTextualEncoder, OpenClipTextualEncoder
 from immich_ml.models.clip.visual import OpenClipVisualEncoder
+from immich_ml.models.download import download_file, verify_checksums
+from immich_ml.models.embedding import EmbeddingOutput, InvalidOutputError, parse_output, transform
 from immich_ml.models.facial_recognition.detection import FaceDetector
 from immich_ml.models.facial_recognition.recognition import FaceRecognizer
 from immich_ml.models.ocr.detection import TextDetector
 from immich_ml.models.ocr.recognition import TextRecognizer
 from immich_ml.models.ocr.schemas import OcrOptions
+from immich_ml.models.transforms import decode_raw
+from immich_ml.profiler import Profiler
+from immich_ml.rpc.inference_pb2 import ModelEntry, PredictRequest, PredictResponse
+from immich_ml.rpc.server import SERVICE_NAME, MachineLearningServicer, serve
+from immich_ml.scheduler import Priority, PriorityExecutor, request_priority
 from immich_ml.schemas import ModelFormat, ModelPrecision, ModelTask, ModelType
 from immich_ml.sessions.ann import AnnSession
+from immich_ml.sessions.ann.loader import AnnContext
+from immich_ml.sessions.batch import BatchedSession, get_batch_size, get_batch_variants
+from immich_ml.sessions.multi_device import DeviceBalancedSession
 from immich_ml.sessions.ort import OrtSession
 from immich_ml.sessions.rknn import RknnSession, run_inference
+from immich_ml.sessions.rknn.rknnpool import RknnPoolExecutor, get_core_masks
+from immich_ml.singleflight import SingleFlight, hash_request
+from immich_ml.timing import Timings, request_timings
 
 
 class TestBase:
@@ -137,6 +171,8 @@ class TestBase:
             cache_dir=encoder.cache_dir,
             local_dir=encoder.cache_dir,
             ignore_patterns=["*.armnn", "*.rknn"],
+            max_workers=8,
+            endpoint=None,
         )
 
     def test_download_downloads_armnn_if_preferred_format(self, snapshot_download: mock.Mock) -> None:
@@ -148,6 +184,8 @@ class TestBase:
             cache_dir=encoder.cache_dir,
             local_dir=encoder.cache_dir,
             ignore_patterns=["*.rknn"],
+            max_workers=8,
+            endpoint=None,
         )
 
     def test_download_downloads_rknn_if_preferred_format(self, snapshot_download: mock.Mock) -> None:
@@ -159,8 +197,86 @@ class TestBase:
             cache_dir=encoder.cache_dir,
             local_dir=encoder.cache_dir,
             ignore_patterns=["*.armnn"],
+            max_workers=8,
+            endpoint=None,
         )
 
+    def test_download_copies_from_mirror(
+        self, snapshot_download: mock.Mock, tmp_path: Path, mocker: MockerFixture
+    ) -> None:
+        mirror = tmp_path / "mirror" / "ViT-B-32__openai"
+        (mirror / "textual").mkdir(parents=True)
+        (mirror / "textual" / "model.onnx").write_bytes(b"onnx")
+        (mirror / "textual" / "model.armnn").write_bytes(b"armnn")
+        (mirror / "sha256sums").write_text(f"{hashlib.sha256(b'onnx').hexdigest()}  ./textual/model.onnx\n")
+        mocker.patch.object(settings, "model_mirror", str(tmp_path / "mirror"))
+
+        encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir=tmp_path / "cache")
+        encoder.download()
+
+        snapshot_download.assert_not_called()
+        assert (tmp_path / "cache" / "textual" / "model.onnx").read_bytes() == b"onnx"
+        assert not (tmp_path / "cache" / "textual" / "model.armnn").exists()
+
+    def test_download_rejects_tampered_mirror_file(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        mirror = tmp_path / "mirror" / "ViT-B-32__openai"
+        (mirror / "textual").mkdir(parents=True)
+        (mirror / "textual" / "model.onnx").write_bytes(b"tampered")
+        (mirror / "sha256sums").write_text(f"{hashlib.sha256(b'onnx').hexdigest()}  textual/model.onnx\n")
+        mocker.patch.object(settings, "model_mirror", str(tmp_path / "mirror"))
+
+        encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir=tmp_path / "cache")
+        with pytest.raises(OSError, match="Checksum mismatch"):
+            encoder.download()
+
+        assert not (tmp_path / "cache" / "textual" / "model.onnx").exists()
+
+    @pytest.mark.parametrize("manifest", [None, ""])
+    def test_download_rejects_mirror_without_checksums(
+        self, manifest: str | None, tmp_path: Path, mocker: MockerFixture
+    ) -> None:
+        mirror = tmp_path / "mirror" / "ViT-B-32__openai"
+        (mirror / "textual").mkdir(parents=True)
+        (mirror / "textual" / "model.onnx").write_bytes(b"onnx")
+        if manifest is not None:
+            (mirror / "sha256sums").write_text(manifest)
+        mocker.patch.object(settings, "model_mirror", str(tmp_path / "mirror"))
+
+        encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir=tmp_path / "cache")
+        with pytest.raises(OSError):
+            encoder.download()
+
+        assert not (tmp_path / "cache" / "textual" / "model.onnx").exists()
+
+    def test_download_removes_file_with_wrong_checksum(self, tmp_path: Path) -> None:
+        metadata_dir = tmp_path / ".cache" / "huggingface" / "download" / "textual"
+        metadata_dir.mkdir(parents=True)
+        (tmp_path / "textual").mkdir()
+        (tmp_path / "textual" / "model.onnx").write_bytes(b"onnx")
+        (tmp_path / "textual" / "tokenizer.json").write_bytes(b"{}")
+        (metadata_dir / "model.onnx.metadata").write_text(f"abc\n{hashlib.sha256(b'onnx').hexdigest()}\n0\n")
+        (metadata_dir / "tokenizer.json.metadata").write_text(f"abc\n{'0' * 40}\n0\n")
+
+        with pytest.raises(OSError):
+            verify_checksums(tmp_path)
+
+        assert (tmp_path / "textual" / "model.onnx").exists()
+        assert not (tmp_path / "textual" / "tokenizer.json").exists()
+
+    def test_download_file_verifies_sha256(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        (tmp_path / "mirror").mkdir()
+        (tmp_path / "mirror" / "det.onnx").write_bytes(b"onnx")
+        mocker.patch.object(settings, "model_mirror", str(tmp_path / "mirror"))
+
+        download_file(
+            "https://example.com/models/det.onnx", tmp_path / "model.onnx", hashlib.sha256(b"onnx").hexdigest()
+        )
+        with pytest.raises(OSError):
+            download_file("https://example.com/models/det.onnx", tmp_path / "other.onnx", "0" * 64)
+
+        assert (tmp_path / "model.onnx").read_bytes() == b"onnx"
+        assert not (tmp_path / "other.onnx").exists()
+
     def test_throws_exception_if_model_path_does_not_exist(
         self, snapshot_download: mock.Mock, ort_session: mock.Mock, path: mock.Mock
     ) -> None:
@@ -300,6 +416,13 @@ class TestOrtSession:
 
         assert session.provider_options == [{"arena_extend_strategy": "kSameAsRequested", "device_id": "1"}]
 
+    def test_sets_device_id_kwarg(self) -> None:
+        os.environ["MACHINE_LEARNING_DEVICE_ID"] = "1"
+
+        session = OrtSession("ViT-B-32__openai", providers=["CUDAExecutionProvider"], device_id="2")
+
+        assert session.provider_options == [{"arena_extend_strategy": "kSameAsRequested", "device_id": "2"}]
+
     def test_sets_provider_options_for_rocm(self, mocker: MockerFixture) -> None:
         model_path = "/cache/ViT-B-32__openai/textual/model.onnx"
         os.environ["MACHINE_LEARNING_DEVICE_ID"] = "1"
@@ -456,6 +579,7 @@ class TestAnnSession:
 
     def test_run(self, ann_session: mock.Mock, mocker: MockerFixture) -> None:
         ann_session.return_value.load.return_value = 123
+        ann_context = mocker.patch("immich_ml.sessions.ann.AnnContext")
         np_spy = mocker.spy(np, "ascontiguousarray")
         session = AnnSession(Path("ViT-B-32__openai"))
         [input1, input2] = [np.random.rand(1, 3, 224, 224).astype(np.float32) for _ in range(2)]
@@ -463,10 +587,105 @@ class TestAnnSession:
 
         session.run(None, input_feed)
 
-        ann_session.return_value.execute.assert_called_once_with(123, [input1, input2])
+        ann_context.assert_called_once_with(ann_session.return_value, 123)
+        ann_context.return_value.execute.assert_called_once_with([input1, input2], None)
         assert np_spy.call_count == 2
         np_spy.assert_has_calls([mock.call(input1), mock.call(input2)])
 
+    def test_run_results_survive_later_calls(self, ann_session: mock.Mock, mocker: MockerFixture) -> None:
+        ann_session.return_value.load.return_value = 0
+        ann_session.return_value.input_shapes = {0: ((1, 4),)}
+        ann_session.return_value.output_shapes = {0: ((1, 4),)}
+        session = AnnSession(Path("buffalo_l"))
+        libann = mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+
+        def execute(*args: Any) -> None:
+            inputs = session.context._inputs[0]
+            assert inputs is not None
+            np.copyto(session.context.outputs[0], inputs * 2)
+
+        libann.execute.side_effect = execute
+
+        # more inputs than the batch size of 1, like FaceRecognizer on ARM NN without batch variants
+        results = [session.run(None, {"input.1": np.full((1, 4), i, dtype=np.float32)})[0] for i in range(3)]
+
+        assert [result[0, 0] for result in results] == [0.0, 2.0, 4.0]
+
+    def test_run_reuses_context_per_thread(self, ann_session: mock.Mock, mocker: MockerFixture) -> None:
+        ann_context = mocker.patch("immich_ml.sessions.ann.AnnContext")
+        session = AnnSession(Path("ViT-B-32__openai"))
+        input_feed = {"input.1": np.random.rand(1, 3, 224, 224).astype(np.float32)}
+
+        session.run(None, input_feed)
+        session.run(None, input_feed)
+        thread = threading.Thread(target=session.run, args=(None, input_feed))
+        thread.start()
+        thread.join()
+
+        assert ann_context.call_count == 2
+        assert ann_context.return_value.execute.call_count == 3
+
+
+class TestAnnContext:
+    def make_context(self) -> AnnContext:
+        ann: Any = SimpleNamespace(ann=1, input_shapes={0: ((1, 3, 8, 8),)}, output_shapes={0: ((1, 16),)})
+        return AnnContext(ann, 0)
+
+    def test_reuses_outputs(self, mocker: MockerFixture) -> None:
+        libann = mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+        context = self.make_context()
+        inputs = [np.random.rand(1, 3, 8, 8).astype(np.float32)]
+
+        output_ptr = context.output_ptrs[0]
+        first = context.execute(inputs)
+        second = context.execute(inputs)
+
+        # the native outputs are reused, but callers get copies they can keep
+        assert context.output_ptrs[0] == output_ptr == context.outputs[0].ctypes.data
+        assert first[0] is not second[0]
+        assert first[0] is not context.outputs[0] and second[0] is not context.outputs[0]
+        assert libann.execute.call_count == 2
+        assert context.input_ptrs[0] == inputs[0].ctypes.data
+
+    def test_validates_only_new_arrays(self, mocker: MockerFixture) -> None:
+        mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+        validate = mocker.patch("immich_ml.sessions.ann.loader._validate")
+        context = self.make_context()
+        inputs = [np.random.rand(1, 3, 8, 8).astype(np.float32)]
+
+        context.execute(inputs)
+        context.execute(inputs)
+        context.execute([inputs[0].copy()])
+
+        assert validate.call_count == 2
+
+    def test_uses_caller_outputs(self, mocker: MockerFixture) -> None:
+        mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+        context = self.make_context()
+        outputs = [np.empty((1, 16), dtype=np.float32)]
+
+        res = context.execute([np.random.rand(1, 3, 8, 8).astype(np.float32)], outputs)
+
+        assert res[0] is outputs[0]
+        assert context.output_ptrs[0] == outputs[0].ctypes.data
+
+    def test_accepts_int_inputs(self, mocker: MockerFixture) -> None:
+        libann = mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+        context = self.make_context()
+
+        context.execute([np.zeros((1, 3, 8, 8), dtype=np.int32)])
+
+        libann.execute.assert_called_once()
+
+    def test_raises_on_wrong_shape(self, mocker: MockerFixture) -> None:
+        libann = mocker.patch("immich_ml.sessions.ann.loader.libann", create=True)
+        context = self.make_context()
+
+        with pytest.raises(ValueError):
+            context.execute([np.random.rand(1, 3, 4, 4).astype(np.float32)])
+
+        libann.execute.assert_not_called()
+
 
 class TestRknnSession:
     def test_creates_rknn_session(self, rknn_session: mock.Mock, info: mock.Mock, mocker: MockerFixture) -> None:
@@ -490,11 +709,217 @@ class TestRknnSession:
 
         session.run(None, input_feed)
 
-        rknn_session.return_value.put.assert_called_once_with([input1, input2])
+        rknn_session.return_value.run.assert_called_once_with([input1, input2])
         assert np_spy.call_count == 2
         np_spy.assert_has_calls([mock.call(input1), mock.call(input2)])
 
 
+class TestRknnPoolExecutor:
+    def test_pins_contexts_to_cores(self, mocker: MockerFixture) -> None:
+        rknn_lite = mocker.patch("immich_ml.sessions.rknn.rknnpool.RKNNLite", create=True)
+        mocker.patch("immich_ml.sessions.rknn.rknnpool.soc_name", "rk3588")
+
+        assert get_core_masks(1) == [rknn_lite.NPU_CORE_AUTO]
+        assert get_core_masks(4) == [
+            rknn_lite.NPU_CORE_0,
+            rknn_lite.NPU_CORE_1,
+            rknn_lite.NPU_CORE_2,
+            rknn_lite.NPU_CORE_0,
+        ]
+
+    def test_does_not_set_core_mask_if_unsupported(self, mocker: MockerFixture) -> None:
+        mocker.patch("immich_ml.sessions.rknn.rknnpool.soc_name", "rk3566")
+
+        assert get_core_masks(2) == [None, None]
+
+    def test_runs_calls_concurrently_on_separate_contexts(self, mocker: MockerFixture) -> None:
+        mocker.patch("immich_ml.sessions.rknn.rknnpool.get_core_masks", return_value=[0, 1, 2])
+        mocker.patch("immich_ml.sessions.rknn.rknnpool.init_rknn", side_effect=lambda *_: mock.Mock())
+        barrier = threading.Barrier(3, timeout=5)
+        in_use: set[int] = set()
+        used: list[int] = []
+
+        def func(rknn_lite: Any, inputs: list[NDArray[np.float32]]) -> list[NDArray[np.float32]]:
+            assert id(rknn_lite) not in in_use
+            in_use.add(id(rknn_lite))
+            used.append(id(rknn_lite))
+            barrier.wait()  # deadlocks unless all three calls are in flight at once
+            in_use.remove(id(rknn_lite))
+            return inputs
+
+        pool = RknnPoolExecutor(model_path="model.rknn", tpes=3, func=func)
+        inputs = [[np.full((1,), i, dtype=np.float32)] for i in range(3)]
+        futures = [pool.submit(x) for x in inputs]
+
+        for future, x in zip(futures, inputs):
+            assert future.result() is x
+        assert len(set(used)) == 3
+
+
+class TestBatchedSession:
+    def make_session(self, batch_size: int) -> mock.Mock:
+        session = mock.Mock()
+        session.get_inputs.return_value = [SimpleNamespace(name="input.1", shape=(batch_size, 3, 112, 112))]
+        session.get_outputs.return_value = [SimpleNamespace(name="output.1", shape=(batch_size, 512))]
+        session.run.side_effect = lambda _, feed, *args: [feed["input.1"][:, 0, 0, :4] + batch_size]
+        return session
+
+    def test_get_batch_size(self) -> None:
+        assert get_batch_size(Path("recognition/model.armnn")) == 1
+        assert get_batch_size(Path("recognition/model.b8.armnn")) == 8
+        assert get_batch_size(Path("rknpu/rk3588/model.b4.rknn")) == 4
+
+    def test_get_batch_variants(self, tmp_path: Path) -> None:
+        for name in ["model.armnn", "model.b8.armnn", "model.b4.armnn", "model.backup.armnn", "model.b4.onnx"]:
+            (tmp_path / name).touch()
+
+        variants = get_batch_variants(tmp_path / "model.armnn")
+
+        assert variants == [tmp_path / "model.b4.armnn", tmp_path / "model.b8.armnn"]
+
+    def test_plan(self) -> None:
+        session = BatchedSession({size: self.make_session(size) for size in (1, 4, 8)})
+
+        assert session.plan(1) == [(1, 1)]
+        assert session.plan(3) == [(4, 3)]
+        assert session.plan(8) == [(8, 8)]
+        assert session.plan(19) == [(8, 8), (8, 8), (4, 3)]
+
+    def test_get_inputs_has_dynamic_batch_axis(self) -> None:
+        session = BatchedSession({size: self.make_session(size) for size in (4, 1)})
+
+        assert session.get_inputs()[0].shape == ("batch", 3, 112, 112)
+        assert session.get_outputs()[0].shape == ("batch", 512)
+
+    def test_run_splits_and_pads_inputs(self) -> None:
+        sessions = {size: self.make_session(size) for size in (1, 4)}
+        session = BatchedSession(sessions)
+        faces = np.random.rand(6, 3, 112, 112).astype(np.float32)
+
+        [embeddings] = session.run(None, {"input.1": faces})
+
+        assert embeddings.shape == (6, 4)
+        assert np.allclose(embeddings, faces[:, 0, 0, :4] + 4)
+        assert sessions[1].run.call_count == 0
+        assert sessions[4].run.call_count == 2
+        assert sessions[4].run.call_args_list[1].args[1]["input.1"].shape == (4, 3, 112, 112)
+
+    def test_run_writes_full_ann_chunks_into_results(self) -> None:
+        sessions = {size: mock.Mock(spec=AnnSession, wraps=self.make_session(size)) for size in (1, 4)}
+        sessions[4].get_outputs.return_value = [SimpleNamespace(name=None, shape=(4, 4))]
+
+        def run(_: Any, feed: dict[str, NDArray[np.float32]], *args: Any, outputs: Any = None) -> Any:
+            res = feed["input.1"][:, 0, 0, :4] + 4
+            if outputs is None:
+                return [res]
+            np.copyto(outputs[0], res)
+            return outputs
+
+        sessions[4].run.side_effect = run
+        faces = np.random.rand(6, 3, 112, 112).astype(np.float32)
+
+        [embeddings] = BatchedSession(sessions).run(None, {"input.1": faces})
+
+        assert np.allclose(embeddings, faces[:, 0, 0, :4] + 4)
+        [full, remainder] = sessions[4].run.call_args_list
+        # only the padded remainder is copied out of the session
+        assert np.shares_memory(full.kwargs["outputs"][0], embeddings)
+        assert "outputs" not in remainder.kwargs
+
+    def test_makes_batched_session_from_variants(self, mocker: MockerFixture) -> None:
+        ann_session = mocker.patch("immich_ml.models.base.AnnSession")
+        model_path = mock.MagicMock(spec=Path)
+        model_path.suffix = ".armnn"
+        variant = mock.MagicMock(spec=Path)
+        variant.suffix = ".armnn"
+        variant.is_file.return_value = True
+        mocker.patch("immich_ml.models.base.get_batch_variants", side_effect=[[variant], []])
+        ann_session.return_value.get_inputs.side_effect = [
+            [SimpleNamespace(name=None, shape=(1, 3, 112, 112))],
+            [SimpleNamespace(name=None, shape=(8, 3, 112, 112))],
+        ]
+
+        session = FaceRecognizer("buffalo_l", cache_dir="test_cache")._make_session(model_path)
+
+        assert isinstance(session, BatchedSession)
+        assert session.batch_sizes == [1, 8]
+
+    def test_recognition_uses_session_batching(self, path: mock.Mock, mocker: MockerFixture) -> None:
+        mocker.patch("immich_ml.models.base.InferenceModel.download")
+        mocker.patch("immich_ml.models.facial_recognition.recognition.ArcFaceONNX")
+        batched = BatchedSession({size: self.make_session(size) for size in (1, 4)})
+        mocker.patch.object(FaceRecognizer, "_make_session", return_value=batched)
+
+        face_recognizer = FaceRecognizer("buffalo_l", model_format=ModelFormat.ARMNN, cache_dir=path)
+        assert face_recognizer.batch_size == 1
+        face_recognizer.load()
+
+        assert face_recognizer.batch_size is None
+
+
+class TestDeviceBalancedSession:
+    def test_runs_on_least_loaded_device(self) -> None:
+        sessions = {"0": mock.Mock(), "1": mock.Mock()}
+        session = DeviceBalancedSession(sessions)
+        session.devices["0"].in_flight = 1
+        input_feed = {"input.1": np.zeros((1, 3, 224, 224), dtype=np.float32)}
+
+        session.run(None, input_feed)
+
+        sessions["0"].run.assert_not_called()
+        sessions["1"].run.assert_called_once_with(None, input_feed, None)
+        assert session.devices["1"].in_flight == 0
+        assert session.devices["1"].calls == 1
+
+    def test_prefers_lower_latency_when_tied(self) -> None:
+        sessions = {"0": mock.Mock(), "1": mock.Mock()}
+        session = DeviceBalancedSession(sessions)
+        session.devices["0"].latency_s = 0.5
+        session.devices["1"].latency_s = 0.1
+
+        session.run(None, {})
+
+        sessions["1"].run.assert_called_once()
+
+    def test_spreads_concurrent_calls(self) -> None:
+        barrier = threading.Barrier(2, timeout=5)
+        sessions = {device_id: mock.Mock() for device_id in ("0", "1")}
+        for device_session in sessions.values():
+            device_session.run.side_effect = lambda *_: barrier.wait()
+        session = DeviceBalancedSession(sessions)
+
+        threads = [threading.Thread(target=session.run, args=(None, {})) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(s.run.call_count == 1 for s in sessions.values())
+
+    def test_utilization(self) -> None:
+        session = DeviceBalancedSession({"0": mock.Mock(), "1": mock.Mock()})
+
+        session.run(None, {})
+        utilization = session.utilization()
+
+        assert set(utilization) == {"0", "1"}
+        assert utilization["0"]["calls"] == 1
+        assert utilization["1"]["calls"] == 0
+        assert utilization["0"]["inFlight"] == 0
+
+    def test_makes_session_per_device(self, ort_session: mock.Mock, mocker: MockerFixture) -> None:
+        mocker.patch.object(settings, "multi_device", True)
+        mocker.patch.dict(os.environ, {"MACHINE_LEARNING_DEVICE_IDS": "0, 1"})
+        model_path = mock.MagicMock(spec=Path)
+        model_path.suffix = ".onnx"
+
+        session = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")._make_session(model_path)
+
+        assert isinstance(session, DeviceBalancedSession)
+        assert list(session.devices) == ["0", "1"]
+        assert ort_session.call_count == 2
+
+
 class TestCLIP:
     embedding = np.random.rand(512).astype(np.float32)
     cache_dir = Path("test_cache")
@@ -519,7 +944,53 @@ class TestCLIP:
         embedding = orjson.loads(embedding_str)
         assert isinstance(embedding, list)
         assert len(embedding) == clip_model_cfg["embed_dim"]
-        mocked.run.assert_called_once()
+        assert mocked.run.call_count == 2  # warm-up and the request
+
+    def test_image_output_options(
+        self,
+        pil_image: Image.Image,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_preprocess_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(OpenClipVisualEncoder, "download")
+        mocker.patch.object(OpenClipVisualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipVisualEncoder, "preprocess_cfg", clip_preprocess_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.run.return_value = [np.array([self.embedding])]
+        configure = mocker.patch.object(OpenClipVisualEncoder, "configure")
+
+        clip_encoder = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        result = clip_encoder.predict(pil_image, output={"dtype": "int8"})
+
+        assert isinstance(result, dict)
+        embedding = np.array(orjson.loads(result["embedding"]))
+        assert embedding.shape == (clip_model_cfg["embed_dim"],)
+        assert np.abs(embedding).max() == 127
+        np.testing.assert_allclose(embedding * result["scale"], self.embedding, atol=result["scale"])
+        configure.assert_not_called()
+
+    def test_image_packed_output(
+        self,
+        pil_image: Image.Image,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_preprocess_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(OpenClipVisualEncoder, "download")
+        mocker.patch.object(OpenClipVisualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipVisualEncoder, "preprocess_cfg", clip_preprocess_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.run.return_value = [np.array([self.embedding])]
+
+        clip_encoder = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        raw, packed = clip_encoder.infer(pil_image, packed=True)
+
+        assert packed.dtype == np.float32
+        np.testing.assert_array_equal(packed, self.embedding)
+        np.testing.assert_array_equal(raw, self.embedding)
+        with pytest.raises(InvalidOutputError):
+            clip_encoder.infer(pil_image, packed=True, output={"dtype": "int8"})
 
     def test_basic_text(
         self,
@@ -541,7 +1012,62 @@ class TestCLIP:
         embedding = orjson.loads(embedding_str)
         assert isinstance(embedding, list)
         assert len(embedding) == clip_model_cfg["embed_dim"]
+        assert mocked.run.call_count == 2  # warm-up and the request
+
+    def test_warms_up_visual_on_load(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_preprocess_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(OpenClipVisualEncoder, "download")
+        mocker.patch.object(OpenClipVisualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipVisualEncoder, "preprocess_cfg", clip_preprocess_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.run.return_value = [[self.embedding]]
+
+        clip_encoder = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder.load()
+
         mocked.run.assert_called_once()
+        assert mocked.run.call_args[0][1]["image"].shape == (1, 3, 224, 224)
+        assert clip_encoder.loaded
+        assert clip_encoder.warmup_time is not None
+
+    def test_loads_if_warmup_fails(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_preprocess_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(OpenClipVisualEncoder, "download")
+        mocker.patch.object(OpenClipVisualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipVisualEncoder, "preprocess_cfg", clip_preprocess_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.run.side_effect = RuntimeError("Failed to compile")
+
+        clip_encoder = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder.load()
+
+        assert clip_encoder.loaded
+        assert clip_encoder.warmup_time is None
+
+    def test_skips_warmup_if_disabled(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_preprocess_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(settings, "warmup", False)
+        mocker.patch.object(OpenClipVisualEncoder, "download")
+        mocker.patch.object(OpenClipVisualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipVisualEncoder, "preprocess_cfg", clip_preprocess_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+
+        clip_encoder = OpenClipVisualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder.load()
+
+        mocked.run.assert_not_called()
 
     def test_openclip_tokenizer(
         self,
@@ -568,6 +1094,123 @@ class TestCLIP:
         assert np.allclose(tokens["text"], np.array([mock_ids], dtype=np.int32), atol=0)
         mock_tokenizer.encode.assert_called_once_with("test search query")
 
+    def test_openclip_tokenizer_batch(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_tokenizer_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(OpenClipTextualEncoder, "download")
+        mocker.patch.object(OpenClipTextualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipTextualEncoder, "tokenizer_cfg", clip_tokenizer_cfg)
+        mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mock_tokenizer = mocker.patch("immich_ml.models.clip.textual.Tokenizer.from_file", autospec=True).return_value
+        mock_ids = [[randint(0, 50000) for _ in range(77)] for _ in range(3)]
+        mock_tokenizer.encode_batch.return_value = [SimpleNamespace(ids=ids) for ids in mock_ids]
+
+        clip_encoder = OpenClipTextualEncoder("nllb-clip-base-siglip__mrl", cache_dir="test_cache")
+        clip_encoder._load()
+        tokens = clip_encoder.tokenize_batch(["a   dog", "a cat", "a beach"], language="de")
+
+        assert tokens["text"].shape == (3, 77)
+        assert tokens["text"].dtype == np.int32
+        assert np.allclose(tokens["text"], np.array(mock_ids, dtype=np.int32), atol=0)
+        mock_tokenizer.encode_batch.assert_called_once_with(["deu_Latna dog", "deu_Latna cat", "deu_Latna beach"])
+        mock_tokenizer.encode.assert_not_called()
+
+    def test_text_batch_runs_in_chunks(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_tokenizer_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(settings, "max_batch_size", MaxBatchSize(clip_textual=2))
+        mocker.patch.object(OpenClipTextualEncoder, "download")
+        mocker.patch.object(OpenClipTextualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipTextualEncoder, "tokenizer_cfg", clip_tokenizer_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.get_inputs.return_value = [SimpleNamespace(name="text", shape=["batch", 77])]
+        mocked.run.side_effect = lambda _, tokens: [np.tile(tokens["text"][:, :1], (1, 4)).astype(np.float32)]
+        mock_tokenizer = mocker.patch("immich_ml.models.clip.textual.Tokenizer.from_file", autospec=True).return_value
+        mock_tokenizer.encode_batch.side_effect = lambda texts: [
+            SimpleNamespace(ids=[len(text)] * 77) for text in texts
+        ]
+
+        clip_encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder._load()
+        embeddings = clip_encoder.predict(["a", "ab", "abc", "abcd", "abcde"])
+
+        assert isinstance(embeddings, list)
+        assert [orjson.loads(embedding) for embedding in embeddings] == [[float(i)] * 4 for i in range(1, 6)]
+        # after the warm-up with a single text
+        assert [call.args[1]["text"].shape[0] for call in mocked.run.call_args_list[1:]] == [2, 2, 1]
+
+    def test_text_batch_copies_reused_outputs(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_tokenizer_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(settings, "max_batch_size", MaxBatchSize(clip_textual=2))
+        mocker.patch.object(OpenClipTextualEncoder, "download")
+        mocker.patch.object(OpenClipTextualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipTextualEncoder, "tokenizer_cfg", clip_tokenizer_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.get_inputs.return_value = [SimpleNamespace(name="text", shape=["batch", 77])]
+        # like a session that writes every run into the same preallocated output
+        output = np.zeros((2, 4), dtype=np.float32)
+
+        def run(_: Any, tokens: dict[str, NDArray[np.int32]]) -> list[NDArray[np.float32]]:
+            output[: len(tokens["text"])] = tokens["text"][:, :1]
+            return [output[: len(tokens["text"])]]
+
+        mocked.run.side_effect = run
+        mock_tokenizer = mocker.patch("immich_ml.models.clip.textual.Tokenizer.from_file", autospec=True).return_value
+        mock_tokenizer.encode_batch.side_effect = lambda texts: [
+            SimpleNamespace(ids=[len(text)] * 77) for text in texts
+        ]
+
+        clip_encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder.session = clip_encoder._load()
+        embeddings = clip_encoder.embed(["a", "ab", "abc", "abcd", "abcde"])
+
+        np.testing.assert_array_equal(embeddings[:, 0], [1, 2, 3, 4, 5])
+
+    def test_text_batch_uses_static_batch_size(
+        self,
+        mocker: MockerFixture,
+        clip_model_cfg: dict[str, Any],
+        clip_tokenizer_cfg: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        mocker.patch.object(settings, "max_batch_size", MaxBatchSize(clip_textual=16))
+        mocker.patch.object(OpenClipTextualEncoder, "download")
+        mocker.patch.object(OpenClipTextualEncoder, "model_cfg", clip_model_cfg)
+        mocker.patch.object(OpenClipTextualEncoder, "tokenizer_cfg", clip_tokenizer_cfg)
+        mocked = mocker.patch.object(InferenceModel, "_make_session", autospec=True).return_value
+        mocked.get_inputs.return_value = [SimpleNamespace(name="text", shape=[4, 77])]
+
+        def run(_: Any, tokens: dict[str, NDArray[np.int32]]) -> list[NDArray[np.float32]]:
+            assert tokens["text"].shape == (4, 77)
+            return [np.tile(tokens["text"][:, :1], (1, 4)).astype(np.float32)]
+
+        mocked.run.side_effect = run
+        mock_tokenizer = mocker.patch("immich_ml.models.clip.textual.Tokenizer.from_file", autospec=True).return_value
+        mock_tokenizer.encode.side_effect = lambda text: SimpleNamespace(ids=[len(text)] * 77)
+        mock_tokenizer.encode_batch.side_effect = lambda texts: [
+            SimpleNamespace(ids=[len(text)] * 77) for text in texts
+        ]
+
+        clip_encoder = OpenClipTextualEncoder("ViT-B-32__openai", cache_dir="test_cache")
+        clip_encoder.session = clip_encoder._load()
+        embeddings = clip_encoder.embed(["a", "ab", "abc", "abcd", "abcde", "abcdef"])
+        embedding = clip_encoder._predict("abc")
+
+        assert clip_encoder.batch_size == 4
+        # the remainder of 2 texts is padded to a full batch, with the padding dropped from the result
+        np.testing.assert_array_equal(embeddings, np.repeat(np.arange(1, 7, dtype=np.float32)[:, None], 4, axis=1))
+        np.testing.assert_array_equal(embedding, [3.0] * 4)
+        assert mocked.run.call_count == 3
+
     def test_openclip_tokenizer_canonicalizes_text(
         self,
         mocker: MockerFixture,
@@ -705,6 +1348,229 @@ class TestCLIP:
         assert np.allclose(tokens["attention_mask"], np.array([mock_attention_mask], dtype=np.int32), atol=0)
 
 
+class TestZeroShotClassifier:
+    label_embeddings = np.array([[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0]], dtype=np.float32)
+
+    @pytest.fixture
+    def classifier(self, mocker: MockerFixture, tmp_path: Path) -> ZeroShotClassifier:
+        mocker.patch.object(settings, "cache_folder", tmp_path)
+        mocker.patch.object(settings, "warmup", False)
+        mocker.patch.object(OpenClipTextualEncoder, "download")
+        mocker.patch.object(OpenClipTextualEncoder, "_load")
+        return ZeroShotClassifier("ViT-B-32__openai", cache_dir=tmp_path / "clip")
+
+    @pytest.fixture
+    def embed(self, classifier: ZeroShotClassifier, mocker: MockerFixture) -> mock.Mock:
+        embed: mock.Mock = mocker.patch.object(
+            classifier.encoder, "embed", side_effect=lambda texts: self.label_embeddings[: len(texts)]
+        )
+        return embed
+
+    def test_returns_top_k_labels(self, classifier: ZeroShotClassifier, embed: mock.Mock) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"], template="a photo of a {}."))
+
+        result = classifier.predict(
+            Image.new("RGB", (8, 8)), np.array([0.0, 0.6, 0.8], dtype=np.float32), labelSet="animals", topK=2
+        )
+
+        assert [classification["label"] for classification in result] == ["bird", "dog"]
+        assert result[0]["score"] == pytest.approx(0.8)
+        assert result[1]["score"] == pytest.approx(0.6)
+        embed.assert_called_once_with(["a photo of a cat.", "a photo of a dog.", "a photo of a bird."])
+
+    def test_caches_label_embeddings(
+        self, classifier: ZeroShotClassifier, embed: mock.Mock, mocker: MockerFixture
+    ) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"]))
+
+        classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="animals")
+        classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="animals")
+        embed.assert_called_once()
+        assert len(list(embeddings_dir("animals").glob("ViT-B-32__openai-*.npy"))) == 1
+
+        # e.g. another worker or after a restart
+        other = ZeroShotClassifier("ViT-B-32__openai", cache_dir=classifier.cache_dir)
+        other_embed = mocker.patch.object(other.encoder, "embed")
+        result = other.predict(None, np.array([0.0, 0.0, 1.0], dtype=np.float32), labelSet="animals", topK=1)
+
+        assert result == [{"label": "bird", "score": pytest.approx(1.0)}]
+        other_embed.assert_not_called()
+
+    def test_encodes_again_if_label_set_changes(self, classifier: ZeroShotClassifier, embed: mock.Mock) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"]))
+        classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="animals")
+
+        save_label_set("animals", LabelSet(labels=["fish", "horse"]))
+        os.utime(settings.cache_folder / "labels" / "animals.json", ns=(0, 0))
+        result = classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="animals", topK=5)
+
+        assert [classification["label"] for classification in result] == ["fish", "horse"]
+        assert embed.call_count == 2
+
+    def test_raises_if_label_set_not_found(self, classifier: ZeroShotClassifier) -> None:
+        with pytest.raises(LabelSetNotFoundError):
+            classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="missing")
+        with pytest.raises(LabelSetNotFoundError):
+            classifier.predict(None, np.array([1.0, 0.0, 0.0], dtype=np.float32), labelSet="../labels")
+
+    def test_zero_embedding_has_no_labels(self, classifier: ZeroShotClassifier, embed: mock.Mock) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"]))
+
+        result = classifier.predict(None, np.zeros(3, dtype=np.float32), labelSet="animals")
+
+        assert result == []
+
+    @pytest.mark.asyncio
+    async def test_uses_cached_textual_model(self, classifier: ZeroShotClassifier, mocker: MockerFixture) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"]))
+        session = mock.Mock()
+        session.run.return_value = [np.array([[1.0, 0.0, 0.0]], dtype=np.float32)]
+        visual = OpenClipVisualEncoder("ViT-B-32__openai", session=session)
+        mocker.patch.object(visual, "transform", return_value={"image": np.zeros((1, 3, 8, 8), dtype=np.float32)})
+        textual = OpenClipTextualEncoder("ViT-B-32__openai", session=mock.Mock())
+        embed = mocker.patch.object(textual, "embed", return_value=self.label_embeddings.copy())
+        load_encoder = mocker.patch.object(classifier.encoder, "load")
+        models = {
+            (ModelType.VISUAL, ModelTask.SEARCH): visual,
+            (ModelType.TEXTUAL, ModelTask.SEARCH): textual,
+            (ModelType.TEXTUAL, ModelTask.CLASSIFICATION): classifier,
+        }
+        get = mocker.patch.object(
+            main.model_cache, "get", side_effect=lambda name, *identity, **kwargs: models[identity]
+        )
+        entries = main.parse_entries(
+            {
+                ModelTask.SEARCH: {ModelType.VISUAL: {"modelName": "ViT-B-32__openai", "options": {}}},
+                ModelTask.CLASSIFICATION: {
+                    ModelType.TEXTUAL: {"modelName": "ViT-B-32__openai", "options": {"labelSet": "animals", "topK": 1}}
+                },
+            }
+        )
+
+        response = await main.run_inference(Image.new("RGB", (8, 8)), entries)
+
+        # the search model's text encoder is shared rather than the classifier loading its own
+        assert response[ModelTask.CLASSIFICATION] == [{"label": "cat", "score": pytest.approx(1.0)}]
+        get.assert_any_call("ViT-B-32__openai", ModelType.TEXTUAL, ModelTask.SEARCH, ttl=settings.model_ttl)
+        assert classifier.encoder is textual
+        embed.assert_called_once()
+        load_encoder.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("output", [{"dtype": "int8"}, {"dtype": "float16"}, {"projection": "pca"}])
+    async def test_classifies_full_embedding_with_visual_output(
+        self, classifier: ZeroShotClassifier, embed: mock.Mock, mocker: MockerFixture, output: dict[str, Any]
+    ) -> None:
+        save_label_set("animals", LabelSet(labels=["cat", "dog", "bird"]))
+        (settings.cache_folder / "projections").mkdir()
+        np.savez(settings.cache_folder / "projections" / "pca.npz", components=np.eye(2, 3, dtype=np.float32))
+        session = mock.Mock()
+        session.run.return_value = [np.array([[0.0, 0.6, 0.8]], dtype=np.float32)]
+        visual = OpenClipVisualEncoder("ViT-B-32__openai", session=session)
+        mocker.patch.object(visual, "transform", return_value={"image": np.zeros((1, 3, 8, 8), dtype=np.float32)})
+        classifier.loaded = classifier.encoder.loaded = True
+        models = {
+            (ModelType.VISUAL, ModelTask.SEARCH): visual,
+            (ModelType.TEXTUAL, ModelTask.SEARCH): classifier.encoder,
+            (ModelType.TEXTUAL, ModelTask.CLASSIFICATION): classifier,
+        }
+        mocker.patch.object(main.model_cache, "get", side_effect=lambda name, *identity, **kwargs: models[identity])
+        entries = main.parse_entries(
+            {
+                ModelTask.SEARCH: {ModelType.VISUAL: {"modelName": "ViT-B-32__openai", "options": {"output": output}}},
+                ModelTask.CLASSIFICATION: {
+                    ModelType.TEXTUAL: {"modelName": "ViT-B-32__openai", "options": {"labelSet": "animals", "topK": 1}}
+                },
+            }
+        )
+
+        response = await main.run_inference(Image.new("RGB", (8, 8)), entries)
+
+        assert response[ModelTask.CLASSIFICATION] == [{"label": "bird", "score": pytest.approx(0.8)}]
+        assert response[ModelTask.SEARCH] == visual.serialize(session.run.return_value[0][0], output=output)
+
+    def test_label_set_endpoints(self, deployed_app: TestClient, mocker: MockerFixture, tmp_path: Path) -> None:
+        mocker.patch.object(settings, "cache_folder", tmp_path)
+
+        response = deployed_app.put("http://localhost:3003/labels/animals", json={"labels": ["cat", "dog"]})
+        assert response.status_code == 200
+        assert response.json() == {"name": "animals", "labels": 2}
+        assert (tmp_path / "labels" / "animals.json").is_file()
+
+        assert deployed_app.put("http://localhost:3003/labels/a.b", json={"labels": ["cat"]}).status_code == 422
+        assert deployed_app.put("http://localhost:3003/labels/animals", json={"labels": []}).status_code == 422
+        response = deployed_app.put("http://localhost:3003/labels/animals", json={"labels": ["cat"], "template": "x"})
+        assert response.status_code == 422
+
+        assert deployed_app.delete("http://localhost:3003/labels/animals").status_code == 204
+        assert deployed_app.delete("http://localhost:3003/labels/animals").status_code == 404
+
+
+class TestEmbeddingOutput:
+    embeddings = np.array([[3.0, 4.0, 12.0, 0.0], [0.0, 0.0, 0.0, 2.0]], dtype=np.float32)
+
+    def test_returns_unchanged_by_default(self) -> None:
+        embeddings, scales = transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput())
+
+        np.testing.assert_array_equal(embeddings, self.embeddings)
+        assert scales is None
+
+    def test_casts_to_float16(self) -> None:
+        embeddings, scales = transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(dtype="float16"))
+
+        assert embeddings.dtype == np.float16
+        np.testing.assert_allclose(embeddings, self.embeddings)
+        assert scales is None
+
+    def test_truncates_and_normalizes_matryoshka_embeddings(self) -> None:
+        output = EmbeddingOutput(dimensions=2)
+
+        embeddings, _ = transform(self.embeddings, "nllb-clip-base-siglip__mrl", output)
+
+        np.testing.assert_allclose(embeddings, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_does_not_truncate_other_models(self) -> None:
+        with pytest.raises(InvalidOutputError):
+            transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(dimensions=2))
+        with pytest.raises(InvalidOutputError):
+            transform(self.embeddings, "nllb-clip-base-siglip__mrl", EmbeddingOutput(dimensions=8))
+
+    def test_projects_with_pca_file(self, mocker: MockerFixture, tmp_path: Path) -> None:
+        mocker.patch.object(settings, "cache_folder", tmp_path)
+        (tmp_path / "projections").mkdir()
+        components = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype=np.float32)
+        np.savez(tmp_path / "projections" / "pca.npz", components=components, mean=np.array([0.0, 0.0, 0.0, 1.0]))
+
+        embeddings, _ = transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(projection="pca"))
+
+        np.testing.assert_allclose(embeddings, [[3 / 10**0.5, -1 / 10**0.5], [0.0, 1.0]], rtol=1e-6)
+
+    def test_rejects_invalid_projections(self, mocker: MockerFixture, tmp_path: Path) -> None:
+        mocker.patch.object(settings, "cache_folder", tmp_path)
+        (tmp_path / "projections").mkdir()
+        np.savez(tmp_path / "projections" / "pca.npz", components=np.eye(2, 8))
+
+        with pytest.raises(InvalidOutputError, match="not found"):
+            transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(projection="missing"))
+        with pytest.raises(InvalidOutputError, match="Invalid projection name"):
+            transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(projection="../pca"))
+        with pytest.raises(InvalidOutputError, match="expects 8 dimensions"):
+            transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(projection="pca"))
+
+    def test_quantizes_to_int8_with_scale(self) -> None:
+        embeddings, scales = transform(self.embeddings, "ViT-B-32__openai", EmbeddingOutput(dtype="int8"))
+
+        assert embeddings.dtype == np.int8
+        assert scales is not None
+        np.testing.assert_array_equal(embeddings, [[32, 42, 127, 0], [0, 0, 0, 127]])
+        np.testing.assert_allclose(embeddings * scales[:, None], self.embeddings, atol=scales.max() / 2)
+
+    def test_rejects_invalid_options(self) -> None:
+        with pytest.raises(InvalidOutputError):
+            parse_output({"dtype": "int4"})
+        assert parse_output({}) is None
+
+
 class TestFaceRecognition:
     def test_set_min_score(self, snapshot_download: mock.Mock, ort_session: mock.Mock, path: mock.Mock) -> None:
         path.return_value.__truediv__.return_value.__truediv__.return_value.suffix = ".onnx"
@@ -775,6 +1641,25 @@ class TestFaceRecognition:
         assert isinstance(call_args[0][0], np.ndarray)
         assert call_args[0][0].shape == (112, 112, 3)
 
+    def test_recognition_quantizes_embeddings(self, cv_image: cv2.Mat, mocker: MockerFixture) -> None:
+        mocker.patch.object(FaceRecognizer, "load")
+        face_recognizer = FaceRecognizer("buffalo_s", min_score=0.0, cache_dir="test_cache")
+        faces = {
+            "boxes": np.random.rand(2, 4).astype(np.float32),
+            "landmarks": np.random.rand(2, 5, 2).astype(np.float32),
+            "scores": np.array([0.67] * 2).astype(np.float32),
+        }
+        face_recognizer.model = mock.Mock()
+        embeddings = np.random.rand(2, 512).astype(np.float32)
+        face_recognizer.model.get_feat.return_value = embeddings
+
+        result = face_recognizer.predict(cv_image, faces, output={"dtype": "int8"})
+
+        for face, expected in zip(result, embeddings):
+            embedding = np.array(orjson.loads(face["embedding"]))
+            assert embedding.max() == 127
+            np.testing.assert_allclose(embedding * face["scale"], expected, atol=face["scale"])
+
     def test_recognition_adds_batch_axis_for_ort(
         self, ort_session: mock.Mock, path: mock.Mock, mocker: MockerFixture
     ) -> None:
@@ -897,6 +1782,18 @@ class TestFaceRecognition:
 
         assert recognizer.batch_size is None
 
+    def test_warmup_covers_each_batch_size(self, mocker: MockerFixture) -> None:
+        mocker.patch.object(settings, "max_batch_size", MaxBatchSize(facial_recognition=3))
+        recognizer = FaceRecognizer("buffalo_l", cache_dir="test_cache", session=mock.Mock())
+
+        single = recognizer._warmup_inputs()
+        every = recognizer._warmup_inputs(all_batch_sizes=True)
+
+        assert [faces["landmarks"].shape[0] for _, faces in single] == [1]
+        assert [faces["landmarks"].shape[0] for _, faces in every] == [1, 2, 3]
+        image, faces = every[-1]
+        assert all(crop.shape == (112, 112, 3) for crop in recognizer._crop(image, faces))
+
 
 class TestOcr:
     def test_set_det_min_score(self, path: mock.Mock) -> None:
@@ -986,6 +1883,15 @@ class TestCache:
         )
         assert len(model_cache.cache._cache) == 2
 
+    async def test_loaded_models(self, mock_get_model: mock.Mock) -> None:
+        visual, textual = mock.Mock(loaded=True), mock.Mock(loaded=False)
+        mock_get_model.side_effect = [visual, textual]
+        model_cache = ModelCache()
+        await model_cache.get("test_model_name", ModelType.VISUAL, ModelTask.SEARCH)
+        await model_cache.get("test_model_name", ModelType.TEXTUAL, ModelTask.SEARCH)
+
+        assert model_cache.loaded_models() == [visual]
+
     @mock.patch("immich_ml.models.cache.OptimisticLock", autospec=True)
     async def test_model_ttl(self, mock_lock_cls: mock.Mock, mock_get_model: mock.Mock) -> None:
         model_cache = ModelCache()
@@ -1125,6 +2031,32 @@ class TestCache:
             any_order=True,
         )
 
+    async def test_preloads_models_concurrently(
+        self, monkeypatch: MonkeyPatch, mocker: MockerFixture, mock_get_model: mock.Mock
+    ) -> None:
+        preload = PreloadModelData(
+            clip=ClipSettings(textual="ViT-B-32__openai", visual="ViT-B-32__openai"),
+            facial_recognition=FacialRecognitionSettings(detection="buffalo_s"),
+        )
+        monkeypatch.setattr("immich_ml.main.model_cache", ModelCache())
+        mocker.patch.object(main.settings, "preload_parallelism", 2)
+        in_flight, max_in_flight = 0, 0
+
+        async def load(model: InferenceModel) -> InferenceModel:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return model
+
+        mock_load = mocker.patch.object(main, "load", side_effect=load)
+
+        await preload_models(preload)
+
+        assert mock_load.call_count == 3
+        assert max_in_flight == 2
+
 
 @pytest.mark.asyncio
 class TestLoad:
@@ -1197,6 +2129,580 @@ class TestLoad:
         )
         mock_model.model_format = ModelFormat.ONNX
 
+    @pytest.mark.parametrize(("model_format", "expected"), [(ModelFormat.ARMNN, 1), (ModelFormat.ONNX, 2)])
+    async def test_only_loads_onnx_models_concurrently(
+        self, model_format: ModelFormat, expected: int, mocker: MockerFixture
+    ) -> None:
+        executor = PriorityExecutor(2)
+        mocker.patch.object(main, "thread_pool", executor)
+        in_flight, max_in_flight = 0, 0
+        counter_lock = threading.Lock()
+
+        def load_model() -> None:
+            nonlocal in_flight, max_in_flight
+            with counter_lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.05)
+            with counter_lock:
+                in_flight -= 1
+
+        models = []
+        for _ in range(2):
+            mock_model = mock.Mock(spec=InferenceModel)
+            mock_model.model_format = model_format
+            mock_model.loaded = False
+            mock_model.load_attempts = 0
+            mock_model.load.side_effect = load_model
+            models.append(mock_model)
+
+        try:
+            await asyncio.gather(*[load(model) for model in models])
+        finally:
+            executor.shutdown()
+
+        assert max_in_flight == expected
+
+
+@pytest.mark.asyncio
+class TestAdmissionController:
+    async def test_yields_queue_wait(self) -> None:
+        admission = AdmissionController(1)
+
+        async with admission.admit("clip") as queue_wait:
+            assert queue_wait >= 0
+            assert admission.semaphore.locked()
+
+        assert not admission.semaphore.locked()
+
+    async def test_sheds_when_queue_full(self) -> None:
+        admission = AdmissionController(1, max_queued=1, retry_after_s=5)
+        release = asyncio.Event()
+
+        async def hold() -> None:
+            async with admission.admit("clip"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as e:
+            async with admission.admit("clip"):
+                pass
+        assert e.value.status_code == 503
+        assert e.value.headers == {"Retry-After": "5"}
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert admission.queued["clip"] == 0
+
+    async def test_queues_are_per_task(self) -> None:
+        admission = AdmissionController(1, max_queued=1)
+        release = asyncio.Event()
+
+        async def hold(task: str) -> float:
+            async with admission.admit(task) as queue_wait:
+                await release.wait()
+                return queue_wait
+
+        tasks = [asyncio.create_task(hold(task)) for task in ("clip", "clip", "facial-recognition")]
+        await asyncio.sleep(0)
+        assert admission.queued == {"clip": 1, "facial-recognition": 1}
+
+        release.set()
+        assert len(await asyncio.gather(*tasks)) == 3
+
+
+class TestPriorityExecutor:
+    def submit(self, executor: PriorityExecutor, priority: Priority, fn: Callable[[], Any]) -> Any:
+        token = request_priority.set(priority)
+        try:
+            return executor.submit(fn)
+        finally:
+            request_priority.reset(token)
+
+    def test_runs_interactive_first(self) -> None:
+        executor = PriorityExecutor(1)
+        started, release = threading.Event(), threading.Event()
+        order: list[str] = []
+
+        def block() -> None:
+            started.set()
+            release.wait()
+
+        self.submit(executor, Priority.BACKGROUND, block)
+        started.wait()
+        background = self.submit(executor, Priority.BACKGROUND, lambda: order.append("background"))
+        interactive = self.submit(executor, Priority.INTERACTIVE, lambda: order.append("interactive"))
+        release.set()
+        background.result(), interactive.result()
+
+        assert order == ["interactive", "background"]
+        executor.shutdown()
+
+    def test_reserved_worker_skips_background(self) -> None:
+        executor = PriorityExecutor(1, reserved_workers=1)
+        release = threading.Event()
+
+        blocked = [self.submit(executor, Priority.BACKGROUND, release.wait) for _ in range(2)]
+        interactive = self.submit(executor, Priority.INTERACTIVE, lambda: "search")
+
+        assert interactive.result(timeout=5) == "search"
+        assert not blocked[1].done()
+        release.set()
+        executor.shutdown()
+        assert all(future.done() for future in blocked)
+
+    def test_propagates_exception(self) -> None:
+        executor = PriorityExecutor(1)
+
+        future = executor.submit(lambda: 1 / 0)
+
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+        executor.shutdown()
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: None)
+
+
+@pytest.mark.asyncio
+class TestSingleFlight:
+    async def test_coalesces_concurrent_calls(self) -> None:
+        single_flight: SingleFlight[int] = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def func() -> int:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        results = [asyncio.create_task(single_flight.run(b"key", func)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*results) == [1, 1, 1]
+        assert not single_flight.calls
+        assert await single_flight.run(b"key", func) == 2
+
+    async def test_continues_if_first_caller_cancelled(self) -> None:
+        single_flight: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+
+        async def func() -> str:
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(single_flight.run(b"key", func))
+        second = asyncio.create_task(single_flight.run(b"key", func))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == "done"
+
+    async def test_cancelled_waiter_does_not_affect_others(self) -> None:
+        single_flight: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+
+        async def func() -> str:
+            await release.wait()
+            return "done"
+
+        waiters = [asyncio.create_task(single_flight.run(b"key", func)) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiters[1].cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert results[0] == results[2] == "done"
+        assert isinstance(results[1], asyncio.CancelledError)
+
+    async def test_completes_if_all_callers_cancelled(self) -> None:
+        single_flight: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+        finished = asyncio.Event()
+
+        async def func() -> str:
+            await release.wait()
+            finished.set()
+            return "done"
+
+        waiters = [asyncio.create_task(single_flight.run(b"key", func)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        release.set()
+
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        assert all(waiter.cancelled() for waiter in waiters)
+        assert not single_flight.calls
+
+    async def test_propagates_exception(self) -> None:
+        single_flight: SingleFlight[None] = SingleFlight()
+
+        async def func() -> None:
+            raise HTTPException(503)
+
+        with pytest.raises(HTTPException):
+            await single_flight.run(b"key", func)
+
+    async def test_predict_image_survives_cancelled_leader(self, mocker: MockerFixture) -> None:
+        mocker.patch.object(settings, "deduplicate_requests", True)
+        admission = AdmissionController(1)
+        mocker.patch.object(main, "admission", admission)
+        mock_run_inference = mocker.patch.object(main, "run_inference", return_value={"clip": "[0.0]"})
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, format="PNG")
+        entries: Any = ([{"name": "ViT-B-32__openai", "task": "clip", "type": "visual", "options": {}}], [])
+
+        # keeps the shared call waiting for admission until the leader is gone
+        await admission.semaphore.acquire()
+        leader_upload = BytesIO(buffer.getvalue())
+        leader = asyncio.create_task(main.predict_image(leader_upload, entries))
+        follower = asyncio.create_task(main.predict_image(BytesIO(buffer.getvalue()), entries))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        # like Starlette closing the leader's upload when its request ends
+        leader_upload.close()
+        admission.semaphore.release()
+
+        response, _ = await follower
+        assert response == {"clip": "[0.0]"}
+        mock_run_inference.assert_called_once()
+        assert leader.cancelled()
+
+    async def test_predict_image_deduplicates(self, mocker: MockerFixture) -> None:
+        release = asyncio.Event()
+
+        async def predict_image(*args: Any) -> tuple[dict[str, Any], float]:
+            await release.wait()
+            return {"clip": "[0.0]"}, 0.0
+
+        mock_predict = mocker.patch.object(main, "_predict_image", side_effect=predict_image)
+        entries: Any = ([{"name": "ViT-B-32__openai", "task": "clip", "type": "visual", "options": {}}], [])
+
+        results = [asyncio.create_task(main.predict_image(b"image", entries)) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        release.set()
+
+        assert (await asyncio.gather(*results))[0] == ({"clip": "[0.0]"}, 0.0)
+        mock_predict.assert_called_once()
+
+
+def test_hash_request() -> None:
+    entries = {"clip": {"visual": {"modelName": "ViT-B-32__openai"}}}
+    file = BytesIO(b"image")
+
+    assert hash_request(b"image", entries) == hash_request(file, entries)
+    assert file.tell() == 0
+    assert hash_request(b"image", entries) != hash_request(b"image", entries, 5, 4)
+    assert hash_request(b"image", entries) != hash_request(b"other", entries)
+
+
+def test_predict_reports_queue_wait(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(main, "admission", AdmissionController(1))
+    mocker.patch.object(main, "run_inference", return_value={"clip": "[0.0]"})
+    byte_image = BytesIO()
+    Image.new("RGB", (8, 8)).save(byte_image, format="jpeg")
+
+    response = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": json.dumps({"clip": {"visual": {"modelName": "ViT-B-32__openai"}}})},
+        files={"image": byte_image.getvalue()},
+    )
+
+    assert response.status_code == 200
+    assert float(response.headers["X-Queue-Wait-Ms"]) >= 0
+
+
+def test_predict_reports_server_timing(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(main, "admission", AdmissionController(1))
+    mocker.patch.object(main, "run_inference", return_value={"clip": "[0.0]"})
+    byte_image = BytesIO()
+    Image.new("RGB", (8, 8)).save(byte_image, format="jpeg")
+
+    response = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": json.dumps({"clip": {"visual": {"modelName": "ViT-B-32__openai"}}})},
+        files={"image": byte_image.getvalue()},
+    )
+
+    assert response.status_code == 200
+    spans = [span.split(";dur=") for span in response.headers["Server-Timing"].split(", ")]
+    assert [name for name, _ in spans] == ["parse", "queue", "decode", "total"]
+    assert all(float(duration) >= 0 for _, duration in spans)
+
+
+def test_predict_encodes_texts(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    run_inference = mocker.patch.object(main, "run_inference", return_value={"clip": ["[0.0]", "[1.0]"]})
+
+    response = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": json.dumps({"clip": {"textual": {"modelName": "ViT-B-32__openai"}}}), "texts": ["dog", "cat"]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"clip": ["[0.0]", "[1.0]"]}
+    assert run_inference.call_args.args[0] == ["dog", "cat"]
+
+
+def test_timing_splits_model_stages_around_inference() -> None:
+    timings = Timings()
+    token = request_timings.set(timings)
+    try:
+        with timing.model("clip.visual"):
+            time.sleep(0.01)
+            with timing.inference():
+                time.sleep(0.02)
+            with timing.inference():
+                time.sleep(0.02)
+            time.sleep(0.01)
+    finally:
+        request_timings.reset(token)
+
+    assert list(timings.spans) == ["clip.visual.preprocess", "clip.visual.infer", "clip.visual.postprocess"]
+    assert timings.spans["clip.visual.preprocess"] >= 10_000_000
+    assert timings.spans["clip.visual.infer"] >= 40_000_000
+    assert timings.spans["clip.visual.postprocess"] >= 10_000_000
+
+
+def test_predict_decodes_from_upload_file(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    # deduplicated calls read the upload first, as they may outlive the request
+    mocker.patch.object(settings, "deduplicate_requests", False)
+    decode = mocker.patch.object(main, "decode_pil", return_value=Image.new("RGB", (8, 8)))
+    mocker.patch.object(main, "run_inference", return_value={"clip": "[0.0]"})
+
+    response = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": json.dumps({"clip": {"visual": {"modelName": "ViT-B-32__openai"}}})},
+        files={"image": b"image"},
+    )
+
+    assert response.status_code == 200
+    decode.assert_called_once()
+    assert not isinstance(decode.call_args.args[0], bytes)
+
+
+class TestDecodeRaw:
+    def test_decodes_packed_rows(self) -> None:
+        pixels = np.random.randint(0, 256, (4, 5, 3), dtype=np.uint8)
+
+        image = decode_raw(pixels.tobytes(), 5, 4)
+
+        assert image.size == (5, 4)
+        assert np.array_equal(np.asarray(image), pixels)
+
+    def test_skips_row_padding(self) -> None:
+        pixels = np.random.randint(0, 256, (4, 5, 3), dtype=np.uint8)
+        padded = np.zeros((4, 16), dtype=np.uint8)
+        padded[:, :15] = pixels.reshape(4, 15)
+
+        image = decode_raw(BytesIO(padded.tobytes()), 5, 4, stride=16)
+
+        assert np.array_equal(np.asarray(image), pixels)
+
+    def test_raises_if_buffer_too_small(self) -> None:
+        with pytest.raises(ValueError):
+            decode_raw(bytes(59), 5, 4)
+
+
+def test_predict_accepts_raw_pixels(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    run_inference = mocker.patch.object(main, "run_inference", return_value={"clip": "[0.0]"})
+    entries = json.dumps({"clip": {"visual": {"modelName": "ViT-B-32__openai"}}})
+
+    response = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": entries, "width": "5", "height": "4"},
+        files={"image": bytes(60)},
+    )
+    invalid = deployed_app.post(
+        "http://localhost:3003/predict",
+        data={"entries": entries, "width": "5", "height": "5"},
+        files={"image": bytes(60)},
+    )
+
+    assert response.status_code == 200
+    assert run_inference.call_args.args[0].size == (5, 4)
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+class TestGrpc:
+    @pytest_asyncio.fixture
+    async def stub(self) -> AsyncIterator[Callable[..., Any]]:
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        server = await serve(f"localhost:{port}")
+        async with grpc.aio.insecure_channel(f"localhost:{port}") as channel:
+            yield lambda method, stream=False: (channel.stream_stream if stream else channel.unary_unary)(
+                f"/{SERVICE_NAME}/{method}",
+                request_serializer=PredictRequest.SerializeToString,
+                response_deserializer=PredictResponse.FromString,
+            )
+        await server.stop(None)
+
+    async def test_predict_text(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        run_inference = mocker.patch.object(
+            main, "run_inference", return_value={"clip": np.array([1.0, 2.0], dtype=np.float32)}
+        )
+        entry = ModelEntry(task="clip", type="textual", model_name="ViT-B-32__openai")
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=[entry], text="cat"))
+
+        assert response.id == "1"
+        assert np.array_equal(np.frombuffer(response.clip, dtype="<f4"), [1.0, 2.0])
+        run_inference.assert_called_once_with(
+            "cat", ([{"name": "ViT-B-32__openai", "task": "clip", "type": "textual", "options": {}}], []), packed=True
+        )
+
+    async def test_predict_stream(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        # with the types FaceDetector and FaceRecognizer return
+        box = dict(zip(["x1", "y1", "x2", "y2"], np.array([1.0, 2.0, 3.0, 4.0], dtype=np.float32)))
+        faces = [{"boundingBox": box, "embedding": np.array([0.5], dtype=np.float32), "score": np.float32(0.9)}]
+        mocker.patch.object(
+            main,
+            "predict_image",
+            return_value=({"facial-recognition": faces, "imageHeight": 8, "imageWidth": 6}, 0.0),
+        )
+        entry = ModelEntry(task="facial-recognition", type="detection", model_name="buffalo_l")
+        requests = [PredictRequest(id=str(i), entries=[entry], image=b"image") for i in range(3)]
+
+        responses = [response async for response in stub("PredictStream", stream=True)(iter(requests))]
+
+        assert sorted(response.id for response in responses) == ["0", "1", "2"]
+        assert responses[0].faces[0].bounding_box.x2 == 3
+        assert np.frombuffer(responses[0].faces[0].embedding, dtype="<f4").tolist() == [0.5]
+        assert (responses[0].image_height, responses[0].image_width) == (8, 6)
+
+    async def test_predict_classification(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        classification = [{"label": "dog", "score": 0.3}, {"label": "beach", "score": 0.2}]
+        predict_image = mocker.patch.object(
+            main,
+            "predict_image",
+            return_value=(
+                {
+                    "clip": np.array([1.0], dtype=np.float32),
+                    "classification": classification,
+                    "imageHeight": 8,
+                    "imageWidth": 6,
+                },
+                0.0,
+            ),
+        )
+        entries = [
+            ModelEntry(task="clip", type="visual", model_name="ViT-B-32__openai"),
+            ModelEntry(
+                task="classification", type="textual", model_name="ViT-B-32__openai", options='{"labelSet": "tags"}'
+            ),
+        ]
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=entries, image=b"image"))
+
+        assert not response.HasField("error")
+        assert [(c.label, round(c.score, 4)) for c in response.classification] == [("dog", 0.3), ("beach", 0.2)]
+        _, with_deps = predict_image.call_args.args[1]
+        assert with_deps[0]["task"] == "classification"
+
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    async def test_rejects_non_float32_output(
+        self, stub: Callable[..., Any], mocker: MockerFixture, dtype: str
+    ) -> None:
+        run_inference = mocker.patch.object(
+            main, "run_inference", return_value={"clip": np.array([1.0], dtype=np.float32)}
+        )
+        options = orjson.dumps({"output": {"dtype": dtype}}).decode()
+        entry = ModelEntry(task="clip", type="textual", model_name="ViT-B-32__openai", options=options)
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=[entry], text="cat"))
+
+        assert response.status_code == 400
+        assert response.error == f"Output dtype '{dtype}' is only supported over HTTP"
+        run_inference.assert_not_called()
+
+    @pytest.mark.parametrize("output", [{"dimensions": 2}, {"projection": "pca"}, {"dtype": "float32"}])
+    async def test_accepts_float32_output(
+        self, stub: Callable[..., Any], mocker: MockerFixture, output: dict[str, Any]
+    ) -> None:
+        run_inference = mocker.patch.object(
+            main, "run_inference", return_value={"clip": np.array([0.6, 0.8], dtype=np.float32)}
+        )
+        options = orjson.dumps({"output": output}).decode()
+        entry = ModelEntry(task="clip", type="textual", model_name="nllb-clip-base-siglip__mrl", options=options)
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=[entry], text="cat"))
+
+        assert not response.HasField("error")
+        assert np.frombuffer(response.clip, dtype="<f4").tolist() == pytest.approx([0.6, 0.8])
+        assert run_inference.call_args.args[1][0][0]["options"] == {"output": output}
+
+    async def test_rejects_invalid_output(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        mocker.patch.object(main, "run_inference", return_value={"clip": np.array([1.0], dtype=np.float32)})
+        options = orjson.dumps({"output": {"dtype": "int4"}}).decode()
+        entry = ModelEntry(task="clip", type="textual", model_name="ViT-B-32__openai", options=options)
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=[entry], text="cat"))
+
+        assert response.status_code == 422
+
+    async def test_rejects_invalid_priority(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        run_inference = mocker.patch.object(
+            main, "run_inference", return_value={"clip": np.array([1.0], dtype=np.float32)}
+        )
+        entry = ModelEntry(task="clip", type="textual", model_name="ViT-B-32__openai")
+
+        response = await stub("Predict")(PredictRequest(id="1", entries=[entry], text="cat", priority="urgent"))
+
+        assert response.status_code == 400
+        assert response.error == "Invalid priority 'urgent'"
+        run_inference.assert_not_called()
+
+    async def test_stream_reads_ahead_only_within_window(self, mocker: MockerFixture) -> None:
+        mocker.patch.object(main, "admission", AdmissionController(2, max_queued=1))
+        release = asyncio.Event()
+        read = 0
+
+        async def predict(request: PredictRequest) -> PredictResponse:
+            await release.wait()
+            return PredictResponse(id=request.id)
+
+        async def requests() -> AsyncIterator[PredictRequest]:
+            nonlocal read
+            for i in range(10):
+                read += 1
+                yield PredictRequest(id=str(i))
+
+        mocker.patch("immich_ml.rpc.server.predict", side_effect=predict)
+        stream = MachineLearningServicer().PredictStream(requests(), mock.Mock())
+        first = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+
+        assert read == 3
+        release.set()
+        responses = [await first] + [response async for response in stream]
+        assert sorted(int(response.id) for response in responses) == list(range(10))
+
+    async def test_reports_error_without_ending_stream(self, stub: Callable[..., Any], mocker: MockerFixture) -> None:
+        mocker.patch.object(main, "run_inference", return_value={"clip": np.array([1.0], dtype=np.float32)})
+        valid = ModelEntry(task="clip", type="textual", model_name="ViT-B-32__openai")
+        requests = [
+            PredictRequest(id="invalid", entries=[ModelEntry(task="unknown", type="textual")], text="cat"),
+            PredictRequest(id="valid", entries=[valid], text="cat"),
+        ]
+
+        responses = {r.id: r async for r in stub("PredictStream", stream=True)(iter(requests))}
+
+        assert responses["invalid"].status_code == 422
+        assert responses["invalid"].HasField("error")
+        assert not responses["valid"].HasField("error")
+
 
 def test_root_endpoint(deployed_app: TestClient) -> None:
     response = deployed_app.get("http://localhost:3003")
@@ -1213,6 +2719,150 @@ def test_ping_endpoint(deployed_app: TestClient) -> None:
     assert response.text == "pong"
 
 
+def test_preloads_before_fork_for_cpu(mocker: MockerFixture) -> None:
+    mocker.patch("onnxruntime.get_available_providers", return_value=["CPUExecutionProvider"])
+    mocker.patch("immich_ml.sessions.rknn.is_available", False)
+    mocker.patch("immich_ml.sessions.ann.loader.is_available", False)
+    mocker.patch.object(settings, "preload", PreloadModelData(clip=ClipSettings(textual="ViT-B-32__openai")))
+    mocker.patch.object(settings, "model_intra_op_threads", 0)
+    mocker.patch.object(settings, "model_inter_op_threads", 0)
+    preload_models = mocker.patch.object(main, "preload_models", autospec=True)
+    freeze = mocker.patch("immich_ml.main.gc.freeze")
+
+    main.preload_before_fork()
+
+    preload_models.assert_awaited_once_with(settings.preload)
+    freeze.assert_called_once()
+    assert settings.model_intra_op_threads == 1
+    assert settings.model_inter_op_threads == 1
+
+
+def test_does_not_preload_before_fork_for_gpu(mocker: MockerFixture) -> None:
+    mocker.patch("onnxruntime.get_available_providers", return_value=["CUDAExecutionProvider", "CPUExecutionProvider"])
+    mocker.patch.object(settings, "preload", PreloadModelData(clip=ClipSettings(textual="ViT-B-32__openai")))
+    preload_models = mocker.patch.object(main, "preload_models", autospec=True)
+
+    main.preload_before_fork()
+
+    preload_models.assert_not_called()
+
+
+def test_ready_endpoint(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(main, "ready", False)
+    not_ready = deployed_app.get("http://localhost:3003/ready")
+    mocker.patch.object(main, "ready", True)
+    ready = deployed_app.get("http://localhost:3003/ready")
+
+    assert not_ready.status_code == 503
+    assert ready.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_ready_endpoint_reports_preload_failure(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(main, "ready", False)
+    mocker.patch.object(main, "preload_error", None)
+    mocker.patch.object(main, "preload_models", side_effect=OSError("disk full"))
+
+    await main.preload_and_mark_ready(PreloadModelData(clip=ClipSettings(textual="ViT-B-32__openai")))
+    response = deployed_app.get("http://localhost:3003/ready")
+
+    assert not main.ready
+    assert response.status_code == 503
+    assert response.text == "failed to preload models: OSError: disk full"
+
+
+def test_devices_endpoint(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    model = OpenClipVisualEncoder("ViT-B-32__openai", session=DeviceBalancedSession({"0": mock.Mock()}))
+    mocker.patch.object(main.model_cache, "loaded_models", return_value=[model])
+
+    response = deployed_app.get("http://localhost:3003/devices")
+
+    assert response.status_code == 200
+    assert list(response.json()) == ["clip/visual/ViT-B-32__openai"]
+    assert response.json()["clip/visual/ViT-B-32__openai"]["0"]["calls"] == 0
+
+
+def test_metrics_endpoint(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    model = OpenClipVisualEncoder("ViT-B-32__openai", session=mock.Mock())
+    model.load_time, model.warmup_time = 1.5, 0.25
+    mocker.patch.object(main.model_cache, "loaded_models", return_value=[model])
+
+    response = deployed_app.get("http://localhost:3003/metrics")
+
+    assert response.status_code == 200
+    assert response.json() == {"clip/visual/ViT-B-32__openai": {"loadTimeMs": 1500.0, "warmupTimeMs": 250.0}}
+
+
+def test_profile_endpoint_is_disabled_by_default(deployed_app: TestClient) -> None:
+    response = deployed_app.post("http://localhost:3003/profile?duration_s=0.1")
+
+    assert response.status_code == 404
+
+
+def test_profile_endpoint_rejects_unloaded_models(deployed_app: TestClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(settings, "profiling", True)
+
+    response = deployed_app.post("http://localhost:3003/profile?duration_s=0.1&models=clip/visual/ViT-B-32__openai")
+
+    assert response.status_code == 422
+
+
+def test_profiler_combines_python_samples_and_ort_events(tmp_path: Path) -> None:
+    import onnx
+
+    graph = onnx.helper.make_graph(
+        [onnx.helper.make_node("Relu", ["x"], ["y"])],
+        "relu",
+        [onnx.helper.make_tensor_value_info("x", onnx.TensorProto.FLOAT, [1, 64])],
+        [onnx.helper.make_tensor_value_info("y", onnx.TensorProto.FLOAT, [1, 64])],
+    )
+    model = onnx.helper.make_model(graph, opset_imports=[onnx.helper.make_opsetid("", 17)], ir_version=8)
+    onnx.save(model, tmp_path / "model.onnx")
+    session = OrtSession(tmp_path / "model.onnx", providers=["CPUExecutionProvider"])
+    profiler = Profiler({"clip/visual/test": mock.Mock(session=session)}, interval_s=0.001)
+    stop = threading.Event()
+
+    def request() -> None:
+        while not stop.is_set():
+            session.run(None, {"x": np.ones((1, 64), dtype=np.float32)})
+
+    profiler.start()
+    thread = threading.Thread(target=request, name="request_0")
+    thread.start()
+    time.sleep(0.2)
+    stop.set()
+    thread.join()
+    profiler.stop()
+    trace = profiler.to_chrome_trace()["traceEvents"]
+    speedscope = profiler.to_speedscope()
+
+    assert any(event["ph"] == "B" and event["name"] == "OrtSession.run" for event in trace)
+    assert any(event["ph"] == "X" and event.get("cat") == "Node" for event in trace)
+    assert {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "ONNX Runtime: clip/visual/test"}} in trace
+    sampled = [profile for profile in speedscope["profiles"] if profile["type"] == "sampled"]
+    evented = [profile for profile in speedscope["profiles"] if profile["type"] == "evented"]
+    assert [profile["name"] for profile in sampled] == [f"request_0 ({thread.native_id})"]
+    assert evented
+    for profile in evented:
+        assert [event["at"] for event in profile["events"]] == sorted(event["at"] for event in profile["events"])
+
+
+def test_main_imports_models_lazily() -> None:
+    # a fresh interpreter, since the test session has already imported everything
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import immich_ml.main"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # lines are `import time: <self us> | <cumulative us> | <indented module name>`
+    imports = {line.split("|")[-1].strip() for line in result.stderr.splitlines()[1:]}
+
+    lazy = ["onnxruntime", "onnx", "insightface", "rapidocr", "tokenizers", "huggingface_hub", "immich_ml.models.base"]
+    assert [module for module in lazy if module in imports] == []
+
+
 @pytest.mark.skipif(
     not settings.test_full,
     reason="More time-consuming since it deploys the app and loads models.",